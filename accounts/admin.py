@@ -16,8 +16,8 @@ class FacultyAdmin(admin.ModelAdmin):
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
-    list_display = ['roll_number', 'name', 'department', 'section', 'face_enrolled']
-    list_filter = ['department', 'section', 'face_enrolled']
+    list_display = ['roll_number', 'name', 'department', 'section', 'face_enrolled', 'face_status']
+    list_filter = ['department', 'section', 'face_enrolled', 'face_status']
     search_fields = ['name', 'roll_number']
 
 @admin.register(Course)
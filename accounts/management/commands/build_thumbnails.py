@@ -0,0 +1,60 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from accounts.models import Student
+from accounts.thumbnails import store_thumbnails, thumbnail_name, thumbnail_sizes
+
+
+class Command(BaseCommand):
+    help = ('Make the list-view thumbnails of student photos saved before they existed '
+            '(new photos get theirs from the background enrollment job)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Re-render every thumbnail, e.g. after changing STUDENT_THUMBNAIL_QUALITY')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete thumbnails no student photo uses any more')
+
+    def handle(self, *args, **opts):
+        students = Student.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not opts['force']:
+            students = students.filter(photo_hash='')
+
+        started = time.monotonic()
+        made = failed = 0
+        photo_bytes = thumb_bytes = 0
+        edge = thumbnail_sizes().get('avatar')
+        for student in students.only('pk', 'photo').iterator(chunk_size=500):
+            key = store_thumbnails(student, force=opts['force'])
+            if key is None:
+                continue  # got another photo meanwhile, which has its own thumbnails
+            if not key:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'  {student.photo.name}: unreadable, left without thumbnails'))
+                continue
+            made += 1
+            if edge:
+                photo_bytes += student.photo.size
+                thumb_bytes += default_storage.size(thumbnail_name(key, edge, 'webp'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Thumbnails for {made} photos in {time.monotonic() - started:.1f}s'
+            + (f', {failed} unreadable' if failed else '') + '.'))
+        if thumb_bytes:
+            self.stdout.write(f'Average photo {photo_bytes / made / 1024:.1f} KB → avatar '
+                              f'{thumb_bytes / made / 1024:.1f} KB ({photo_bytes / thumb_bytes:.0f}× smaller)')
+        if opts['prune']:
+            self._prune()
+
+    def _prune(self):
+        if not default_storage.exists('thumbs'):
+            return
+        used = set(Student.objects.exclude(photo_hash='').values_list('photo_hash', flat=True))
+        removed = 0
+        for name in default_storage.listdir('thumbs')[1]:
+            if name.split('-', 1)[0] not in used:
+                default_storage.delete(f'thumbs/{name}')
+                removed += 1
+        self.stdout.write(f'{removed} unused thumbnails deleted')
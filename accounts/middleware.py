@@ -0,0 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_role
+
+
+class RoleMiddleware:
+    """Attach request.role and request.profile, resolved on first use."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: get_role(request.user)[0])
+        request.profile = SimpleLazyObject(lambda: get_role(request.user)[1])
+        return self.get_response(request)
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+def mark_enrolled_ready(apps, schema_editor):
+    """Faces enrolled before the background pipeline keep being recognized."""
+    Student = apps.get_model('accounts', 'Student')
+    Student.objects.filter(face_enrolled=True).exclude(photo='').exclude(photo__isnull=True).update(face_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_student_courses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='face_status',
+            field=models.CharField(blank=True, choices=[('', 'No photo'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed'), ('duplicate', 'Possible duplicate')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='face_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(mark_enrolled_ready, migrations.RunPython.noop),
+    ]
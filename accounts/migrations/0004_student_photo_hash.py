@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_student_face_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
@@ -60,6 +60,9 @@ class Faculty(models.Model):
 
 
 class Student(models.Model):
+    FACE_STATUS = [('', 'No photo'), ('pending', 'Pending'), ('ready', 'Ready'),
+                   ('failed', 'Failed'), ('duplicate', 'Possible duplicate')]
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=150)
     roll_number = models.CharField(max_length=20, unique=True)
@@ -76,12 +79,22 @@ class Student(models.Model):
 
     photo = models.ImageField(upload_to='students/', null=True, blank=True)
     face_enrolled = models.BooleanField(default=False)
+    # set by the background enrollment job (attendance/enrollment.py); recognition uses 'ready' faces only
+    face_status = models.CharField(max_length=10, choices=FACE_STATUS, blank=True, default='')
+    face_error = models.CharField(max_length=255, blank=True)
+    # names the list-view thumbnails of the photo (accounts/thumbnails.py)
+    photo_hash = models.CharField(max_length=16, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.roll_number} - {self.name}"
 
+    @property
+    def thumbnails(self):
+        from .thumbnails import thumbnail_urls
+        return thumbnail_urls(self.photo_hash)
+
     def attendance_percentage(self, course=None):
         from attendance.models import AttendanceRecord
         qs = AttendanceRecord.objects.filter(student=self)
@@ -0,0 +1,43 @@
+"""
+Role resolution for logged-in users.
+get_role() used to probe user.hod, user.faculty and user.student on every
+request; the result is now cached per user (Django cache, local memory by
+default) and dropped by accounts/signals.py when a profile changes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import HOD, Faculty, Student
+
+ROLE_MODELS = (('hod', HOD), ('faculty', Faculty), ('student', Student))
+
+
+def role_key(user_id):
+    return f'role:{user_id}'
+
+
+def resolve_role(user):
+    """Uncached lookup: (role, profile) with the profile's department loaded."""
+    for role, model in ROLE_MODELS:
+        profile = model.objects.select_related('department').filter(user_id=user.pk).first()
+        if profile is not None:
+            return role, profile
+    return 'unknown', None
+
+
+def get_role(user):
+    if not user.is_authenticated:
+        return 'unknown', None
+    cached = getattr(user, '_role_cache', None)
+    if cached is None:
+        cached = cache.get(role_key(user.pk))
+        if cached is None:
+            cached = resolve_role(user)
+            cache.set(role_key(user.pk), cached, getattr(settings, 'ROLE_CACHE_TIMEOUT', 300))
+        user._role_cache = cached
+    return cached
+
+
+def invalidate_role(user_id):
+    if user_id:
+        cache.delete(role_key(user_id))
@@ -0,0 +1,71 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import HOD, Faculty, Student
+from .roles import get_role, invalidate_role
+
+
+@receiver(user_logged_in)
+def resolve_role_at_login(sender, request, user, **kwargs):
+    invalidate_role(user.pk)
+    get_role(user)
+
+
+@receiver(pre_save, sender=HOD)
+@receiver(pre_save, sender=Faculty)
+def remember_profile_user(sender, instance, **kwargs):
+    """Keep the login a profile is detached from, so its cached role is dropped too."""
+    instance._old_user_id = None
+    if instance.pk:
+        instance._old_user_id = sender.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Student)
+def remember_old_student(sender, instance, **kwargs):
+    """
+    One read of the old row for everything a student save has to compare:
+    the login it is detached from (cached role), the section it leaves (its
+    roster is dropped too, attendance/signals.py), and whether the photo
+    needs thumbnails or the face a new enrollment. A new (or re-enabled, or
+    previously rejected) face is marked 'pending' in the same write, so
+    recognition never uses it before the background job
+    (attendance/enrollment.py) ran; that job also renders the thumbnails.
+    """
+    old = None
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).values(
+            'user_id', 'department_id', 'section', 'photo', 'photo_hash',
+            'face_enrolled', 'face_status', 'face_error').first()
+    instance._old_user_id = old['user_id'] if old else None
+    instance._old_roster = (old['department_id'], old['section']) if old else None
+
+    photo = str(instance.photo) if instance.photo else ''
+    same_photo = old is not None and instance.photo._committed and old['photo'] == photo
+    # the background job owns photo_hash; don't write back a stale copy
+    instance.photo_hash = old['photo_hash'] if photo and same_photo else ''
+    instance._make_thumbnails = bool(photo) and not instance.photo_hash
+
+    instance._enroll_face = False
+    if not photo:
+        instance.face_status, instance.face_error = '', ''
+    elif instance.face_enrolled and (old is None or (old['photo'], old['face_enrolled']) != (photo, True)
+                                     or old['face_status'] in ('', 'failed', 'duplicate')):
+        instance.face_status, instance.face_error = 'pending', ''
+        instance._enroll_face = True
+    elif old:
+        # the enrollment job owns these too
+        instance.face_status, instance.face_error = old['face_status'], old['face_error']
+
+
+@receiver(post_save, sender=HOD)
+@receiver(post_save, sender=Faculty)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=HOD)
+@receiver(post_delete, sender=Faculty)
+@receiver(post_delete, sender=Student)
+def drop_cached_role(sender, instance, **kwargs):
+    invalidate_role(instance.user_id)
+    old_user_id = getattr(instance, '_old_user_id', None)
+    if old_user_id != instance.user_id:
+        invalidate_role(old_user_id)
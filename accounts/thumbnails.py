@@ -0,0 +1,110 @@
+"""
+Student photo thumbnails for list views.
+Saving a Student with a new photo (accounts/signals.py) queues the
+background job of attendance/enrollment.py, which renders square,
+centre-cropped thumbnails at each STUDENT_THUMBNAIL_SIZES edge as WebP and
+as a JPEG fallback, named after a hash of the photo's bytes:
+thumbs/<photo_hash>-<edge>.<ext>. A changed photo gets new names, so the
+files never change once written and are served with a one-year immutable
+Cache-Control (core/urls.py). `manage.py build_thumbnails` backfills photos
+saved before this existed.
+"""
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+FORMATS = (('webp', 'WEBP'), ('jpeg', 'JPEG'))
+
+
+def thumbnail_sizes():
+    """{'avatar': 80, ...}: name -> square edge in px (about twice the CSS size, for HiDPI screens)."""
+    return getattr(settings, 'STUDENT_THUMBNAIL_SIZES', {'avatar': 80, 'card': 480})
+
+
+def photo_hash(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def thumbnail_name(key, edge, ext):
+    return f'thumbs/{key}-{edge}.{ext}'
+
+
+def thumbnail_urls(key):
+    """{'avatar': {'webp': url, 'jpeg': url}, ...} for a photo_hash; {} without one."""
+    if not key:
+        return {}
+    return {size: {ext: default_storage.url(thumbnail_name(key, edge, ext)) for ext, _ in FORMATS}
+            for size, edge in thumbnail_sizes().items()}
+
+
+def render(data, edge):
+    """{ext: encoded bytes} of one square thumbnail of the photo bytes."""
+    from PIL import Image, ImageOps
+
+    quality = getattr(settings, 'STUDENT_THUMBNAIL_QUALITY', 80)
+    with Image.open(io.BytesIO(data)) as im:
+        im.draft('RGB', (edge * 2, edge * 2))  # JPEG: decode at a reduced scale
+        im = ImageOps.exif_transpose(im).convert('RGB')
+        im = ImageOps.fit(im, (edge, edge), Image.Resampling.LANCZOS)
+    out = {}
+    for ext, fmt in FORMATS:
+        buf = io.BytesIO()
+        im.save(buf, fmt, quality=quality, **({'method': 4} if fmt == 'WEBP' else {'optimize': True}))
+        out[ext] = buf.getvalue()
+    return out
+
+
+def generate(data, force=False):
+    """
+    Write the thumbnails of the photo bytes that don't exist yet (all of them
+    with force) and return the photo_hash. Raises on an unreadable image.
+    """
+    key = photo_hash(data)
+    for edge in sorted(set(thumbnail_sizes().values())):
+        names = {ext: thumbnail_name(key, edge, ext) for ext, _ in FORMATS}
+        if not force and all(default_storage.exists(name) for name in names.values()):
+            continue
+        for ext, content in render(data, edge).items():
+            if default_storage.exists(names[ext]):
+                default_storage.delete(names[ext])
+            default_storage.save(names[ext], ContentFile(content))
+    return key
+
+
+def photo_bytes(photo):
+    """The bytes of an ImageField file, whether just uploaded or already in storage."""
+    if not photo._committed:
+        data = photo.file.read()
+        photo.file.seek(0)
+        return data
+    with photo.storage.open(photo.name, 'rb') as f:
+        return f.read()
+
+
+def thumbnails_for(photo, force=False):
+    """generate() for an ImageField file; '' (and a warning) when it can't be read."""
+    try:
+        return generate(photo_bytes(photo), force=force)
+    except Exception:
+        logger.warning('Could not make thumbnails of %s', photo.name, exc_info=True)
+        return ''
+
+
+def store_thumbnails(student, force=False):
+    """
+    thumbnails_for() the student's photo and save the photo_hash; None (and
+    nothing saved) when the student got another photo meanwhile.
+    """
+    from .models import Student
+
+    key = thumbnails_for(student.photo, force=force)
+    # update() so the save signals don't queue the same photo again
+    if not Student.objects.filter(pk=student.pk, photo=student.photo.name).update(photo_hash=key):
+        return None
+    return key
@@ -3,7 +3,7 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Q, Count
 from django.http import JsonResponse
 import json, base64, os
 from django.core.files.base import ContentFile
@@ -12,22 +12,8 @@ from django.conf import settings
 from .models import Department, HOD, Faculty, Student, Course
 from .forms import (LoginForm, FacultyForm, StudentForm,
                     FacultyUserForm, StudentUserForm, CourseForm, DepartmentForm)
-
-
-def get_role(user):
-    try:
-        return 'hod', user.hod
-    except Exception:
-        pass
-    try:
-        return 'faculty', user.faculty
-    except Exception:
-        pass
-    try:
-        return 'student', user.student
-    except Exception:
-        pass
-    return 'unknown', None
+from .roles import get_role
+from core.pagination import keyset_paginate
 
 
 # ── AUTH ──────────────────────────────────────────────────────────────────────
@@ -53,6 +39,7 @@ def logout_view(request):
 def dashboard(request):
     role, profile = get_role(request.user)
     from attendance.models import AttendanceSession, AttendanceRecord, Notification
+    from attendance.bitmaps import at_risk_students
     from datetime import date
 
     ctx = {'role': role, 'profile': profile, 'today': date.today()}
@@ -64,13 +51,16 @@ def dashboard(request):
             'total_sessions': AttendanceSession.objects.filter(course__department=profile.department).count(),
             'recent_faculty': Faculty.objects.filter(department=profile.department).order_by('-id')[:5],
             'departments': Department.objects.all(),
-            'low_attendance': Student.objects.filter(department=profile.department, is_active=True),
+            'low_attendance': at_risk_students(Student.objects.filter(department=profile.department, is_active=True)),
         })
 
     elif role == 'faculty':
         sessions = AttendanceSession.objects.filter(faculty=profile).order_by('-date', '-start_time')
         ctx.update({
-            'recent_sessions': sessions[:6],
+            'recent_sessions': sessions.select_related('course').annotate(
+                num_present=Count('attendancerecord', filter=Q(attendancerecord__status='present')),
+                num_absent=Count('attendancerecord', filter=Q(attendancerecord__status='absent')),
+            )[:6],
             'total_sessions': sessions.count(),
             'sessions_today': sessions.filter(date=date.today()).count(),
             'my_courses': profile.courses.all(),
@@ -78,15 +68,19 @@ def dashboard(request):
 
     elif role == 'student':
         records = AttendanceRecord.objects.filter(student=profile)
-        total = records.count()
-        present = records.filter(status='present').count()
+        counts = records.aggregate(
+            total=Count('id'),
+            present=Count('id', filter=Q(status='present')),
+            absent=Count('id', filter=Q(status='absent')),
+        )
+        total, present = counts['total'], counts['present']
         ctx.update({
             'total': total,
             'present': present,
-            'absent': records.filter(status='absent').count(),
+            'absent': counts['absent'],
             'percentage': round(present / total * 100, 1) if total else 0,
             'notifications': Notification.objects.filter(student=profile, is_read=False)[:5],
-            'recent_records': records.order_by('-session__date')[:10],
+            'recent_records': records.select_related('session__course').order_by('-session__date')[:10],
         })
 
     return render(request, 'accounts/dashboard.html', ctx)
@@ -169,8 +163,15 @@ def student_list(request):
     if section:
         students = students.filter(section=section)
 
+    page = keyset_paginate(request, students.annotate(
+        att_total=Count('attendancerecord'),
+        att_present=Count('attendancerecord', filter=Q(attendancerecord__status='present')),
+    ), ['roll_number'])
+    for s in page:
+        s.att_percentage = round(s.att_present / s.att_total * 100, 1) if s.att_total else 0.0
+
     return render(request, 'accounts/student_list.html', {
-        'students': students.order_by('roll_number'),
+        'students': page, 'page': page, 'student_total': students.count(),
         'q': q, 'section': section, 'role': role
     })
 
@@ -193,7 +194,10 @@ def add_student(request):
             ext = format.split('/')[-1]
             photo_file = ContentFile(base64.b64decode(imgstr), name=f'webcam_student.{ext}')
 
-        if student_form.is_valid():
+        problems = _face_photo_problems(photo_file or request.FILES.get('photo'))
+        if problems:
+            messages.error(request, f"Face photo rejected: {'; '.join(problems)}. Please retake it.")
+        elif student_form.is_valid():
             student = student_form.save(commit=False)
             student.department = profile.department
 
@@ -212,7 +216,10 @@ def add_student(request):
                 student.user = user
 
             student.save()
-            messages.success(request, f"Student {student.name} added with face enrolled!")
+            if student.face_status == 'pending':
+                messages.success(request, f"Student {student.name} added; face enrollment is running in the background.")
+            else:
+                messages.success(request, f"Student {student.name} added.")
             return redirect('student_list')
         else:
             messages.error(request, "Please fix the errors below.")
@@ -233,16 +240,24 @@ def edit_student(request, pk):
                                 instance=student, department=profile.department)
 
     if request.method == 'POST':
+        # an edit re-runs a held back enrollment; this skips its duplicate check
+        student._confirmed_face = bool(request.POST.get('confirm_duplicate'))
         webcam_data = request.POST.get('webcam_photo')
+        photo_file = None
         if webcam_data and webcam_data.startswith('data:image'):
             format, imgstr = webcam_data.split(';base64,')
             ext = format.split('/')[-1]
             photo_file = ContentFile(base64.b64decode(imgstr), name=f'webcam_{student.roll_number}.{ext}')
+
+        problems = _face_photo_problems(photo_file or request.FILES.get('photo'))
+        if problems:
+            messages.error(request, f"Face photo rejected: {'; '.join(problems)}. Please retake it.")
+        elif photo_file:
             student.photo = photo_file
             student.face_enrolled = True
             student.save()
 
-        if student_form.is_valid():
+        if not problems and student_form.is_valid():
             s = student_form.save(commit=False)
             if s.photo:
                 s.face_enrolled = True
@@ -259,30 +274,37 @@ def edit_student(request, pk):
 def student_detail(request, pk):
     role, profile = get_role(request.user)
     student = get_object_or_404(Student, pk=pk)
-    from attendance.models import AttendanceRecord, AttendanceSession
+    from attendance.models import AttendanceRecord, AttendanceBitmap
+    from attendance.bitmaps import course_summary, heatmap
     records = AttendanceRecord.objects.filter(student=student).select_related('session__course').order_by('-session__date')
-    total = records.count()
-    present = records.filter(status='present').count()
-    percentage = round(present / total * 100, 1) if total else 0
 
-    # Per-course stats
-    courses = Course.objects.filter(attendancesession__attendancerecord__student=student).distinct()
-    course_stats = []
-    for c in courses:
-        cr = records.filter(session__course=c)
-        ct = cr.count()
-        cp = cr.filter(status='present').count()
-        course_stats.append({'course': c, 'total': ct, 'present': cp,
-                              'percentage': round(cp / ct * 100, 1) if ct else 0})
+    # Per-course stats from the finalized-session bitmaps
+    bitmaps = list(AttendanceBitmap.objects.filter(student=student).select_related('course').order_by('course__code'))
+    course_stats = [course_summary(bm) for bm in bitmaps]
+    total = sum(cs['total'] for cs in course_stats)
+    present = sum(cs['present'] for cs in course_stats)
+    percentage = round(present / total * 100, 1) if total else 0
 
     return render(request, 'accounts/student_detail.html', {
         'student': student, 'records': records[:20],
         'total': total, 'present': present,
-        'absent': records.filter(status='absent').count(),
-        'percentage': percentage, 'course_stats': course_stats, 'role': role
+        'absent': sum(cs['absent'] for cs in course_stats),
+        'percentage': percentage, 'course_stats': course_stats,
+        'heatmap': heatmap(bitmaps)[-60:], 'role': role
     })
 
 
+def _face_photo_problems(photo):
+    """Quality problems of a new face photo (webcam capture or upload); [] without one."""
+    from attendance.quality import photo_problems
+
+    if not photo:
+        return []
+    data = photo.read()
+    photo.seek(0)
+    return photo_problems(data)
+
+
 # ── HOD: MANAGE DEPARTMENTS & COURSES ─────────────────────────────────────────
 
 @login_required
@@ -315,3 +337,18 @@ def manage_courses(request):
     return render(request, 'accounts/manage_courses.html', {
         'courses': courses, 'course_form': course_form
     })
+
+
+# ── STUDENT PHOTO THUMBNAILS ──────────────────────────────────────────────────
+
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+
+
+def serve_thumbnail(request, path):
+    """Development server for MEDIA_ROOT/thumbs: content-hashed names, so they are cached for a year."""
+    from django.utils.cache import patch_cache_control
+    from django.views.static import serve
+
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, 'thumbs'))
+    patch_cache_control(response, public=True, max_age=THUMBNAIL_MAX_AGE, immutable=True)
+    return response
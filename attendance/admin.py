@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import AttendanceSession, AttendanceRecord, Notification
+from .models import AttendanceSession, AttendanceRecord, Notification, FaceEmbedding, FaceSample, ThresholdCalibration, DailyRollup, AttendanceBitmap, EmbeddingVersion
 
 @admin.register(AttendanceSession)
 class SessionAdmin(admin.ModelAdmin):
-    list_display = ['course', 'faculty', 'date', 'section', 'mode', 'is_active']
-    list_filter = ['date', 'mode', 'is_active']
+    list_display = ['course', 'faculty', 'date', 'section', 'room', 'mode', 'is_active']
+    list_filter = ['date', 'mode', 'is_active', 'room']
 
 @admin.register(AttendanceRecord)
 class RecordAdmin(admin.ModelAdmin):
@@ -13,4 +13,37 @@ class RecordAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['student', 'notif_type', 'sent_at', 'is_read']
+    list_display = ['student', 'notif_type', 'sent_at', 'is_read', 'emailed_at']
+    list_filter = ['notif_type', 'is_read']
+
+@admin.register(FaceEmbedding)
+class FaceEmbeddingAdmin(admin.ModelAdmin):
+    list_display = ['student', 'model_name', 'photo_name', 'created_at']
+    list_filter = ['model_name']
+
+@admin.register(FaceSample)
+class FaceSampleAdmin(admin.ModelAdmin):
+    list_display = ['student', 'model_name', 'source', 'created_at']
+    list_filter = ['model_name']
+    search_fields = ['student__roll_number']
+
+@admin.register(ThresholdCalibration)
+class ThresholdCalibrationAdmin(admin.ModelAdmin):
+    list_display = ['model_name', 'department', 'section', 'threshold', 'target_far', 'frr', 'created_at']
+    list_filter = ['model_name', 'department']
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['course', 'section', 'date', 'present', 'late', 'absent', 'total']
+    list_filter = ['department', 'date']
+
+@admin.register(AttendanceBitmap)
+class AttendanceBitmapAdmin(admin.ModelAdmin):
+    list_display = ['student', 'course', 'sessions', 'updated_at']
+    list_filter = ['course']
+    search_fields = ['student__name', 'student__roll_number']
+
+@admin.register(EmbeddingVersion)
+class EmbeddingVersionAdmin(admin.ModelAdmin):
+    list_display = ['model_name', 'status', 'done', 'total', 'failed', 'finished_at', 'activated_at']
+    list_filter = ['status']
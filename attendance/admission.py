@@ -0,0 +1,141 @@
+"""
+Admission control for the recognition endpoints.
+Each worker process runs at most FACE_RECOGNITION_CONCURRENCY model
+pipelines at a time; up to FACE_RECOGNITION_QUEUE_DEPTH further requests
+wait (for at most FACE_RECOGNITION_QUEUE_TIMEOUT seconds) and the rest are
+turned away with 503. Each session may start one recognition per
+FACE_SESSION_MIN_INTERVAL seconds and endpoint, otherwise 429, so a faculty
+upload is not refused because the webcam just scanned. Both carry
+Retry-After, which the webcam page uses to slow its scan interval.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+
+class Overloaded(Exception):
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots = None
+        self._size = None
+        self.waiting = 0
+        self.running = 0
+
+    def _semaphore(self):
+        size = getattr(settings, 'FACE_RECOGNITION_CONCURRENCY', 2)
+        with self._lock:
+            if self._slots is None or self._size != size:
+                self._slots, self._size = threading.BoundedSemaphore(size), size
+            return self._slots
+
+    def _rate_limit(self, session_id, scope):
+        interval = getattr(settings, 'FACE_SESSION_MIN_INTERVAL', 2.0)
+        if not interval:
+            return
+        # add() is atomic: the key's expiry is the window, and only the request that creates it gets in
+        key = f'admission:session:{session_id}:{scope}'
+        now = time.time()
+        if not cache.add(key, now, timeout=math.ceil(interval)):
+            last = cache.get(key) or now
+            raise Overloaded('Scanning too fast for this session', 429,
+                             max(math.ceil(interval - (now - last)), 1))
+
+    def acquire(self, session_id, scope):
+        """
+        Take a pipeline slot for the session or raise Overloaded. Returns the
+        semaphore to release. `scope` names the endpoint, so each has its own
+        rate limit.
+        """
+        self._rate_limit(session_id, scope)
+        slots = self._semaphore()
+        if slots.acquire(blocking=False):
+            with self._lock:
+                self.running += 1
+            return slots
+
+        retry_after = getattr(settings, 'FACE_RECOGNITION_RETRY_AFTER', 5)
+        with self._lock:
+            if self.waiting >= getattr(settings, 'FACE_RECOGNITION_QUEUE_DEPTH', 8):
+                raise Overloaded('Recognition queue is full', 503, retry_after)
+            self.waiting += 1
+        try:
+            admitted = slots.acquire(timeout=getattr(settings, 'FACE_RECOGNITION_QUEUE_TIMEOUT', 10))
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not admitted:
+            raise Overloaded('Recognition is busy', 503, retry_after)
+        with self._lock:
+            self.running += 1
+        return slots
+
+    def release(self, slots):
+        with self._lock:
+            self.running -= 1
+        slots.release()
+
+
+admission = AdmissionController()
+
+
+class _ReleasingStream:
+    """Streaming content that gives the slot back when exhausted or closed (even if never started)."""
+
+    def __init__(self, content, slots):
+        self._content = iter(content)
+        self._slots = slots
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._content)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._slots is not None:
+            slots, self._slots = self._slots, None
+            admission.release(slots)
+
+
+def admission_controlled(view):
+    """
+    Run a recognition view (taking the session `pk`) inside a pipeline slot.
+    Streaming responses keep the slot until the stream is consumed or closed.
+    """
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        if request.method != 'POST':
+            return view(request, pk, *args, **kwargs)
+        try:
+            slots = admission.acquire(pk, scope=view.__name__)
+        except Overloaded as e:
+            response = JsonResponse({'error': str(e), 'retry_after': e.retry_after}, status=e.status)
+            response['Retry-After'] = str(e.retry_after)
+            return response
+        try:
+            response = view(request, pk, *args, **kwargs)
+        except BaseException:
+            admission.release(slots)
+            raise
+        if response.streaming:
+            response.streaming_content = _ReleasingStream(response.streaming_content, slots)
+        else:
+            admission.release(slots)
+        return response
+    return wrapper
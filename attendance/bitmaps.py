@@ -0,0 +1,221 @@
+"""
+Bitmap-encoded attendance history.
+Each AttendanceBitmap packs a student's sessions of one course into a
+present mask and a late mask (np.packbits, chronological), plus the date and
+session id of every bit, so percentages over date windows, absence streaks
+and calendar heatmaps are NumPy bit operations instead of AttendanceRecord
+scans. Finalizing a session sets just that session's bit (refresh_bitmaps);
+rebuild_bitmaps() recomputes everything from the finalized sessions' records.
+"""
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AttendanceRecord, AttendanceBitmap, AttendanceSession
+
+STREAK_ALERT = 3  # consecutive absences that flag a student
+
+
+def _pack(bits):
+    return np.packbits(np.asarray(bits, dtype=bool)).tobytes()
+
+
+def unpack(bitmap):
+    """(date ordinals, present mask, late mask) as NumPy arrays of length bitmap.sessions."""
+    n = bitmap.sessions
+    days = np.frombuffer(bytes(bitmap.days), dtype=np.int32)[:n]
+    present = np.unpackbits(np.frombuffer(bytes(bitmap.present), dtype=np.uint8), count=n).astype(bool)
+    late = np.unpackbits(np.frombuffer(bytes(bitmap.late), dtype=np.uint8), count=n).astype(bool)
+    return days, present, late
+
+
+def session_ids(bitmap):
+    """Session id of every bit, as an int64 array."""
+    return np.frombuffer(bytes(bitmap.session_ids), dtype=np.int64)[:bitmap.sessions]
+
+
+def _build(student_id, course_id, rows):
+    """rows: chronological (session id, date, status) triples."""
+    days = np.array([d.toordinal() for _, d, _ in rows], dtype=np.int32)
+    return AttendanceBitmap(
+        student_id=student_id, course_id=course_id, sessions=len(rows),
+        days=days.tobytes(),
+        session_ids=np.array([pk for pk, _, _ in rows], dtype=np.int64).tobytes(),
+        present=_pack([s == 'present' for _, _, s in rows]),
+        late=_pack([s == 'late' for _, _, s in rows]),
+    )
+
+
+def _store(records, replace=True):
+    """Build (and by default replace) the bitmaps of every (student, course) pair in `records`."""
+    groups = {}
+    for student_id, course_id, session_id, day, status in records.values_list(
+            'student_id', 'session__course_id', 'session_id', 'session__date', 'status'
+    ).order_by('student_id', 'session__course_id', 'session__date', 'session__start_time', 'session_id'):
+        groups.setdefault((student_id, course_id), []).append((session_id, day, status))
+
+    bitmaps = [_build(sid, cid, rows) for (sid, cid), rows in groups.items()]
+    with transaction.atomic():
+        for course_id in ({cid for _, cid in groups} if replace else ()):
+            AttendanceBitmap.objects.filter(
+                course_id=course_id, student_id__in=[sid for sid, cid in groups if cid == course_id]
+            ).delete()
+        AttendanceBitmap.objects.bulk_create(bitmaps, batch_size=500)
+    return len(bitmaps)
+
+
+def _earlier_same_day(session, bitmaps):
+    """Ids of the sessions on the bitmaps that share `session`'s date but come before it."""
+    day = session.date.toordinal()
+    candidates = set()
+    for bm in bitmaps:
+        days, ids = np.frombuffer(bytes(bm.days), dtype=np.int32)[:bm.sessions], session_ids(bm)
+        lo, hi = np.searchsorted(days, day, side='left'), np.searchsorted(days, day, side='right')
+        candidates.update(int(pk) for pk in ids[lo:hi] if pk != session.pk)
+    if not candidates:
+        return set()
+    return {pk for pk, start in AttendanceSession.objects.filter(id__in=candidates).values_list('id', 'start_time')
+            if (start, pk) < (session.start_time, session.pk)}
+
+
+def _set_bit(bitmap, session, status, earlier):
+    """Set the session's bit: in place if the bitmap has it, else inserted in chronological order."""
+    days, present, late = unpack(bitmap)
+    ids = session_ids(bitmap)
+    hit = np.flatnonzero(ids == session.pk)
+    if hit.size:
+        i = int(hit[0])
+        present, late = present.copy(), late.copy()
+    else:
+        day = session.date.toordinal()
+        lo, hi = np.searchsorted(days, day, side='left'), np.searchsorted(days, day, side='right')
+        i = int(lo) + sum(1 for pk in ids[lo:hi] if int(pk) in earlier)
+        days = np.insert(days, i, day)
+        ids = np.insert(ids, i, session.pk)
+        present, late = np.insert(present, i, False), np.insert(late, i, False)
+        bitmap.sessions += 1
+    present[i], late[i] = status == 'present', status == 'late'
+    bitmap.days = days.astype(np.int32).tobytes()
+    bitmap.session_ids = ids.astype(np.int64).tobytes()
+    bitmap.present, bitmap.late = _pack(present), _pack(late)
+    bitmap.updated_at = timezone.now()
+
+
+def refresh_bitmaps(session):
+    """
+    Set a finalized session's bit in the course bitmap of every student in
+    it, replacing it when the session was finalized before. Only the
+    session's own records are read, not the students' course history.
+    """
+    statuses = dict(AttendanceRecord.objects.filter(session=session).values_list('student_id', 'status'))
+    if not statuses:
+        return 0
+    with transaction.atomic():
+        bitmaps = list(AttendanceBitmap.objects.select_for_update().filter(
+            course_id=session.course_id, student_id__in=list(statuses)))
+        # bitmaps stored without session ids can't be patched; rebuild those from their records
+        legacy = {bm.student_id for bm in bitmaps if len(bytes(bm.session_ids)) != bm.sessions * 8}
+        if legacy:
+            _store(AttendanceRecord.objects.filter(session__course_id=session.course_id, session__is_active=False,
+                                                   student_id__in=legacy))
+        bitmaps = [bm for bm in bitmaps if bm.student_id not in legacy]
+
+        earlier = _earlier_same_day(session, bitmaps)
+        for bm in bitmaps:
+            _set_bit(bm, session, statuses[bm.student_id], earlier)
+        AttendanceBitmap.objects.bulk_update(
+            bitmaps, ['sessions', 'days', 'session_ids', 'present', 'late', 'updated_at'], batch_size=500)
+        have = {bm.student_id for bm in bitmaps} | legacy
+        AttendanceBitmap.objects.bulk_create(
+            [_build(sid, session.course_id, [(session.pk, session.date, status)])
+             for sid, status in statuses.items() if sid not in have], batch_size=500)
+    return len(statuses)
+
+
+def rebuild_bitmaps():
+    with transaction.atomic():
+        AttendanceBitmap.objects.all().delete()
+        return _store(AttendanceRecord.objects.filter(session__is_active=False), replace=False)
+
+
+def _window(days, start=None, end=None):
+    lo = 0 if start is None else np.searchsorted(days, start.toordinal(), side='left')
+    hi = len(days) if end is None else np.searchsorted(days, end.toordinal(), side='right')
+    return slice(lo, hi)
+
+
+def percentage(bitmap, start=None, end=None):
+    """Present % over sessions dated within [start, end] (either may be open)."""
+    days, present, _ = unpack(bitmap)
+    window = present[_window(days, start, end)]
+    return round(window.sum() / window.size * 100, 1) if window.size else 0.0
+
+
+def absence_streaks(bitmap):
+    """(longest, current) runs of consecutive absences — neither present nor late."""
+    _, present, late = unpack(bitmap)
+    absent = ~(present | late)
+    if not absent.any():
+        return 0, 0
+    edges = np.diff(np.concatenate(([0], absent.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    runs = ends - starts
+    current = int(runs[-1]) if ends[-1] == absent.size else 0
+    return int(runs.max()), current
+
+
+def course_summary(bitmap, start=None, end=None):
+    days, present, late = unpack(bitmap)
+    window = _window(days, start, end)
+    p, l, n = int(present[window].sum()), int(late[window].sum()), int(days[window].size)
+    longest, current = absence_streaks(bitmap)
+    return {
+        'course': bitmap.course, 'total': n, 'present': p, 'late': l, 'absent': n - p - l,
+        'percentage': round(p / n * 100, 1) if n else 0,
+        'longest_absence_streak': longest, 'current_absence_streak': current,
+    }
+
+
+def heatmap(bitmaps):
+    """[(date, present, late, absent)] per calendar day across the given bitmaps."""
+    all_days, all_present, all_late = [], [], []
+    for bm in bitmaps:
+        days, present, late = unpack(bm)
+        all_days.append(days)
+        all_present.append(present)
+        all_late.append(late)
+    if not all_days:
+        return []
+    days = np.concatenate(all_days)
+    present = np.concatenate(all_present)
+    late = np.concatenate(all_late)
+    uniq, idx = np.unique(days, return_inverse=True)
+    p = np.bincount(idx, weights=present, minlength=uniq.size).astype(int)
+    l = np.bincount(idx, weights=late, minlength=uniq.size).astype(int)
+    n = np.bincount(idx, minlength=uniq.size)
+    return [(date.fromordinal(int(d)), int(p[i]), int(l[i]), int(n[i] - p[i] - l[i]))
+            for i, d in enumerate(uniq)]
+
+
+def at_risk_students(students, threshold=75, streak=STREAK_ALERT):
+    """
+    Students below `threshold`% overall or currently absent `streak`+ sessions
+    in a row in any course, as [(student, percentage, worst current streak)].
+    """
+    totals = {}
+    for bm in AttendanceBitmap.objects.filter(student__in=students).select_related('student'):
+        _, present, _ = unpack(bm)
+        entry = totals.setdefault(bm.student_id, [bm.student, 0, 0, 0])
+        entry[1] += int(present.sum())
+        entry[2] += bm.sessions
+        entry[3] = max(entry[3], absence_streaks(bm)[1])
+
+    flagged = []
+    for student, present, total, current in totals.values():
+        pct = round(present / total * 100, 1) if total else 0.0
+        if pct < threshold or current >= streak:
+            flagged.append((student, pct, current))
+    flagged.sort(key=lambda row: (row[1], -row[2]))
+    return flagged
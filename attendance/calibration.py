@@ -0,0 +1,183 @@
+"""
+Threshold calibration for face recognition.
+Builds the impostor distance distribution from the embedding store (every
+pair of different enrolled students) and suggests the distance threshold
+that meets a target false-accept rate (FAR). The false-reject rate (FRR) is
+measured on genuine pairs: extra labelled photos of enrolled students
+(FaceSample, imported with `calibrate_thresholds --genuine-dir`) against
+their enrollment embeddings, under the configured metric. Recognition
+outcomes are not used, since they only exist below the old threshold.
+"""
+import os
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .embeddings import (ensure_embeddings, embedding_matrix, pairwise_distances,
+                         get_model_name, get_metric, from_bytes, to_bytes)
+from .preprocess import IMAGE_EXTENSIONS
+
+BLOCK_ROWS = 1024  # rows of the all-pairs matrix computed at a time
+MIN_TAIL = 10      # impostor pairs that must fall at or below the suggested threshold
+
+
+class InsufficientData(Exception):
+    """Too few students (impostor pairs) to suggest a threshold at the target FAR."""
+
+
+def min_impostor_pairs(target_far):
+    """Pairs needed for MIN_TAIL of them to be accepted at target_far."""
+    return int(np.ceil(MIN_TAIL / target_far))
+
+
+def get_threshold(department=None, section=None, model_name=None):
+    """
+    Threshold the matcher should use: the latest per-section calibration,
+    else the latest model-wide one, else FACE_RECOGNITION_THRESHOLD.
+    """
+    table = _calibrated(model_name or get_model_name(), get_metric())
+    if department is not None and section:
+        threshold = table.get((getattr(department, 'pk', department), section))
+        if threshold is not None:
+            return threshold
+    threshold = table.get((None, ''))
+    if threshold is not None:
+        return threshold
+    return getattr(settings, 'FACE_RECOGNITION_THRESHOLD', 0.4)
+
+
+def _thresholds_key(model_name, metric):
+    return f'thresholds:{model_name}:{metric}'
+
+
+def _calibrated(model_name, metric):
+    """
+    {(department id, section): latest threshold} of a model, (None, '') for
+    the model-wide one; one query per THRESHOLD_CACHE_TIMEOUT, not per request.
+    """
+    from .models import ThresholdCalibration
+
+    key = _thresholds_key(model_name, metric)
+    table = cache.get(key)
+    if table is None:
+        table = {}
+        rows = ThresholdCalibration.objects.filter(model_name=model_name, distance_metric=metric).order_by(
+            'created_at', 'pk').values_list('department_id', 'section', 'threshold')
+        for department_id, section, threshold in rows:
+            table[(department_id, section if department_id else '')] = threshold
+        cache.set(key, table, getattr(settings, 'THRESHOLD_CACHE_TIMEOUT', 30))
+    return table
+
+
+def impostor_distances(matrix, keep, metric=None):
+    """
+    All-pairs distances between different enrolled students, computed in
+    row blocks. Returns (smallest `keep` distances sorted, pair count, mean).
+    """
+    n = len(matrix)
+    smallest = np.empty(0, dtype=np.float32)
+    total, count = 0.0, 0
+    for r0 in range(0, n, BLOCK_ROWS):
+        r1 = min(r0 + BLOCK_ROWS, n)
+        block = pairwise_distances(matrix[r0:r1], matrix[r0:], metric)
+        # Keep only j > i so every unordered pair is counted once.
+        rows = np.arange(r1 - r0)[:, None]
+        cols = np.arange(n - r0)[None, :]
+        values = block[cols > rows]
+        total += float(values.sum())
+        count += values.size
+        smallest = np.concatenate([smallest, values.astype(np.float32)])
+        if smallest.size > keep:
+            smallest = np.partition(smallest, keep - 1)[:keep]
+    return np.sort(smallest), count, (total / count if count else 0.0)
+
+
+def import_samples(directory, model_name=None):
+    """
+    Embed the photos in `directory`/<roll number>/ as FaceSamples of those
+    students. Returns (photos embedded, photos skipped).
+    """
+    from accounts.models import Student
+    from .face_utils import represent_photo_path
+    from .models import FaceSample
+
+    model_name = model_name or get_model_name()
+    students = {s.roll_number: s for s in Student.objects.filter(roll_number__in=os.listdir(directory))}
+    done = skipped = 0
+    for roll, student in students.items():
+        folder = os.path.join(directory, roll)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            vector = represent_photo_path(os.path.join(folder, name), model_name)
+            if vector is None:
+                skipped += 1
+                continue
+            FaceSample.objects.update_or_create(student=student, model_name=model_name, source=f'{roll}/{name}',
+                                                defaults={'vector': to_bytes(vector)})
+            done += 1
+    return done, skipped
+
+
+def genuine_distances(ids, matrix, model_name, metric=None):
+    """Distance of every FaceSample of the students in `ids` to their enrollment embedding."""
+    from .models import FaceSample
+
+    row = {sid: i for i, sid in enumerate(ids)}
+    samples = FaceSample.objects.filter(student_id__in=ids, model_name=model_name).values_list('student_id', 'vector')
+    distances = [float(pairwise_distances(from_bytes(vector), matrix[row[sid]], metric)[0, 0])
+                 for sid, vector in samples.iterator()]
+    return np.asarray(distances, dtype=np.float32)
+
+
+def calibrate(students, target_far=0.001, model_name=None):
+    """
+    Suggest a threshold for `students` at `target_far`. Returns a dict of the
+    calibration stats; raises InsufficientData when the students give fewer
+    impostor pairs than min_impostor_pairs(target_far).
+    """
+    model_name = model_name or get_model_name()
+    metric = get_metric()
+    ids, matrix = embedding_matrix(ensure_embeddings(students, model_name))
+    n = len(ids)
+    pairs = n * (n - 1) // 2
+    needed = min_impostor_pairs(target_far)
+    if pairs < needed:
+        raise InsufficientData(f'{n} embedded students give {pairs} impostor pairs; FAR {target_far:g} '
+                               f'needs at least {needed} (about {int(np.ceil(np.sqrt(2 * needed)))} students)')
+
+    k = min(int(target_far * pairs), pairs - 1)
+    impostor, count, impostor_mean = impostor_distances(matrix, k + 1, metric)
+    # Accept iff distance <= threshold, so stop just below the k-th impostor.
+    threshold = float(np.nextafter(impostor[k], np.float32(-np.inf)))
+    achieved_far = float((impostor <= threshold).sum()) / count
+
+    genuine = genuine_distances(ids, matrix, model_name, metric)
+    frr = float((genuine > threshold).mean()) if genuine.size else None
+
+    return {
+        'model_name': model_name,
+        'distance_metric': metric,
+        'threshold': threshold,
+        'target_far': target_far,
+        'achieved_far': achieved_far,
+        'frr': frr,
+        'genuine_pairs': int(genuine.size),
+        'impostor_pairs': count,
+        'genuine_mean': float(genuine.mean()) if genuine.size else None,
+        'impostor_mean': impostor_mean,
+    }
+
+
+def save_calibration(result, department=None, section=''):
+    from .models import ThresholdCalibration
+
+    fields = {f: result[f] for f in (
+        'model_name', 'distance_metric', 'threshold', 'target_far',
+        'achieved_far', 'frr', 'genuine_pairs', 'impostor_pairs')}
+    calibration = ThresholdCalibration.objects.create(department=department, section=section, **fields)
+    cache.delete(_thresholds_key(calibration.model_name, calibration.distance_metric))
+    return calibration
@@ -0,0 +1,244 @@
+"""
+Continuous ingestion from fixed classroom cameras (`manage.py camera_ingest`).
+One producer thread per source (device index, stream URL, or a video file
+standing in for a camera) keeps reading frames so the capture buffer stays
+fresh, and every FACE_CAMERA_INTERVAL seconds offers the current frame to a
+bounded queue shared by the consumers, unless the scene has not changed
+(FACE_VIDEO_SCENE_CHANGE, at least every FACE_VIDEO_MAX_GAP seconds). When
+the queue is full the oldest frame is dropped, and consumers discard frames
+older than FACE_CAMERA_MAX_AGE, so a slow model sheds load instead of
+falling behind. Consumers look up the active face session of the source's
+room, recognize the frame (with video.VideoIngest's tracking) and mark
+students through the write coalescer, as the webcam page does.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def active_session(room):
+    """Today's active face/both session in the room (the latest one if several), or None."""
+    from django.utils import timezone
+    from .models import AttendanceSession
+
+    return (AttendanceSession.objects.filter(room=room, is_active=True, date=timezone.localdate(),
+                                             mode__in=('face', 'both'))
+            .select_related('course').order_by('-start_time', '-id').first())
+
+
+class CameraSource:
+    """A configured camera and its counters; `lock` keeps its frames to one consumer at a time."""
+
+    def __init__(self, room, source, realtime=True, loop=False):
+        self.room = room
+        self.source = int(source) if str(source).isdigit() else source
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.realtime = realtime
+        self.loop = loop
+        self.lock = threading.Lock()
+
+        self.session = None
+        self.ingest = None
+        self.roster_version = None
+        self.resolved_at = None
+
+        self.finished = False
+        self.connected = False
+        self.last_error = ''
+        self.read = self.offered = self.unchanged = self.dropped = self.stale = 0
+        self.processed = self.idle = self.marked = self.errors = 0
+
+    def __str__(self):
+        return f'{self.room} ({self.source})'
+
+
+class CameraIngest:
+    def __init__(self, sources, workers=None, queue_size=None, interval=None):
+        self.sources = sources
+        self.workers = workers or getattr(settings, 'FACE_CAMERA_WORKERS', 2)
+        self.interval = interval if interval is not None else getattr(settings, 'FACE_CAMERA_INTERVAL', 2.0)
+        self.max_age = getattr(settings, 'FACE_CAMERA_MAX_AGE', 10.0)
+        self.session_refresh = getattr(settings, 'FACE_CAMERA_SESSION_REFRESH', 30)
+        self.scene_change = getattr(settings, 'FACE_VIDEO_SCENE_CHANGE', 8.0)
+        self.max_gap = getattr(settings, 'FACE_VIDEO_MAX_GAP', 10.0)
+        self.queue = queue.Queue(maxsize=queue_size or getattr(settings, 'FACE_CAMERA_QUEUE_SIZE', 8))
+        self.stopping = threading.Event()
+        self.started = None
+        self._counter_lock = threading.Lock()
+        self._producers = []
+        self._consumers = []
+
+    # ── lifecycle ────────────────────────────────────────────────────────────
+
+    def start(self):
+        self.started = time.monotonic()
+        self._producers = [threading.Thread(target=self._produce, args=(src,), name=f'camera-{src.room}', daemon=True)
+                           for src in self.sources]
+        self._consumers = [threading.Thread(target=self._consume, name=f'camera-worker-{n}', daemon=True)
+                           for n in range(self.workers)]
+        for t in self._producers + self._consumers:
+            t.start()
+
+    @property
+    def done(self):
+        """Every source finished (files without loop) and every queued frame handled."""
+        return all(src.finished for src in self.sources) and self.queue.unfinished_tasks == 0
+
+    def stop(self, timeout=10):
+        from .coalescer import coalescer
+
+        self.stopping.set()
+        for t in self._producers + self._consumers:
+            t.join(timeout)
+        coalescer.flush()
+
+    # ── producers ────────────────────────────────────────────────────────────
+
+    def _produce(self, src):
+        import cv2
+        from .video import scene_thumbnail
+
+        failures = 0
+        while not self.stopping.is_set():
+            capture = cv2.VideoCapture(src.source)
+            if not capture.isOpened():
+                src.connected, src.last_error = False, 'cannot open source'
+                if src.is_file and not src.loop:
+                    break
+                failures += 1
+                self.stopping.wait(min(2 ** failures, 30))
+                continue
+            src.connected, failures = True, 0
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            opened, frames = time.monotonic(), 0
+            last_probe = last_offer = None
+            last_thumb = None
+            try:
+                while not self.stopping.is_set() and capture.grab():
+                    frames += 1
+                    src.read += 1
+                    if src.is_file and src.realtime:
+                        # play the file at its own frame rate, like a live camera
+                        ahead = frames / fps - (time.monotonic() - opened)
+                        if ahead > 0:
+                            self.stopping.wait(ahead)
+                    # files run on their own clock so --fast samples the same frames
+                    now = frames / fps if src.is_file else time.monotonic()
+                    if last_probe is not None and now - last_probe < self.interval:
+                        continue
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        continue
+                    last_probe = now
+                    thumb = scene_thumbnail(frame)
+                    if (last_thumb is not None and now - last_offer < self.max_gap
+                            and float(np.abs(thumb - last_thumb).mean()) < self.scene_change):
+                        src.unchanged += 1
+                        continue
+                    last_thumb, last_offer = thumb, now
+                    self._offer(src, frame, time.monotonic())
+            finally:
+                capture.release()
+                src.connected = False
+            if src.is_file and not src.loop:
+                break
+            if not self.stopping.is_set() and not src.is_file:
+                src.last_error = 'stream ended; reconnecting'
+                self.stopping.wait(1)
+        src.finished = True
+
+    def _offer(self, src, frame, captured):
+        """Queue a frame, dropping the oldest queued one (of any source) when the queue is full."""
+        src.offered += 1
+        while True:
+            try:
+                self.queue.put_nowait((src, frame, captured))
+                return
+            except queue.Full:
+                try:
+                    old_src, _, _ = self.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.queue.task_done()
+                with self._counter_lock:
+                    old_src.dropped += 1
+
+    # ── consumers ────────────────────────────────────────────────────────────
+
+    def _consume(self):
+        from django.db import close_old_connections
+
+        while not self.stopping.is_set():
+            try:
+                src, frame, captured = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if time.monotonic() - captured > self.max_age:
+                    with self._counter_lock:
+                        src.stale += 1
+                    continue
+                with src.lock:
+                    close_old_connections()
+                    try:
+                        self._recognize(src, frame)
+                    except Exception as e:
+                        src.errors += 1
+                        src.last_error = f'{type(e).__name__}: {e}'
+                        logger.exception('Camera %s: recognition failed', src)
+                    finally:
+                        close_old_connections()
+            finally:
+                self.queue.task_done()
+
+    def _resolve(self, src):
+        """Point the source at its room's active session, re-checked every FACE_CAMERA_SESSION_REFRESH seconds."""
+        from .roster import get_roster, roster_version
+        from .video import VideoIngest
+
+        now = time.monotonic()
+        if src.resolved_at is not None and now - src.resolved_at < self.session_refresh:
+            return
+        src.resolved_at = now
+        session = active_session(src.room)
+        if session is None:
+            src.session = src.ingest = None
+            return
+        version = roster_version(get_roster(session.course.department_id, session.section))
+        if src.session is None or session.pk != src.session.pk or version != src.roster_version:
+            src.ingest = VideoIngest.for_session(session)
+            src.session, src.roster_version = session, version
+
+    def _recognize(self, src, frame):
+        from .coalescer import coalescer
+
+        self._resolve(src)
+        if src.session is None:
+            src.idle += 1
+            return
+        recognized = src.ingest.sample(frame)
+        src.processed += 1
+        if recognized:
+            newly_marked, _ = coalescer.mark_present(src.session.pk, recognized, src.ingest.students)
+            src.marked += len(newly_marked)
+
+    # ── reporting ────────────────────────────────────────────────────────────
+
+    def stats(self):
+        elapsed = max(time.monotonic() - (self.started or time.monotonic()), 1e-6)
+        return [{
+            'room': src.room, 'source': str(src.source),
+            'session': str(src.session) if src.session else '',
+            'connected': src.connected, 'finished': src.finished,
+            'read_fps': round(src.read / elapsed, 1), 'processed_fps': round(src.processed / elapsed, 2),
+            'offered': src.offered, 'unchanged': src.unchanged, 'dropped': src.dropped, 'stale': src.stale,
+            'processed': src.processed, 'idle': src.idle, 'marked': src.marked,
+            'errors': src.errors, 'last_error': src.last_error,
+        } for src in self.sources]
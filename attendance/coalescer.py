@@ -0,0 +1,193 @@
+"""
+Buffered attendance writes for webcam face sessions.
+Recognized students are marked in per-session in-memory state and the
+webcam API answers from it; the pending marks of every session are written
+together in one transaction (bulk_update) every FACE_WRITE_FLUSH_INTERVAL
+seconds or once FACE_WRITE_BATCH_SIZE marks are waiting, so concurrent
+sessions share a few short write transactions instead of one per frame.
+Anything that reads a session's records back (finalize, reports, manual
+marking) calls flush() for it first.
+
+Every process has its own buffer (the web workers, the camera_ingest
+daemon), so a flush can arrive after another process finalized the session
+and sent its absence notifications. flush() therefore only writes marks of
+sessions that are still active, locking their rows so a finalize waits for a
+flush already under way, and drops the rest; finalizing views flush their
+own buffer first, then mark the session inactive, then notify.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class _SessionState:
+    def __init__(self, present):
+        self.present = present      # student ids present in DB or pending
+        self.pending = {}           # student_id -> confidence, not yet written
+        self.touched = time.monotonic()
+
+
+class WriteCoalescer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._sessions = {}
+        self._pending = 0
+        self._timer = None
+
+    @property
+    def interval(self):
+        return getattr(settings, 'FACE_WRITE_FLUSH_INTERVAL', 1.0)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'FACE_WRITE_BATCH_SIZE', 200)
+
+    def _state(self, session_id):
+        state = self._sessions.get(session_id)
+        if state is None:
+            from .models import AttendanceRecord
+            present = set(AttendanceRecord.objects.filter(
+                session_id=session_id, status='present').values_list('student_id', flat=True))
+            state = self._sessions.setdefault(session_id, _SessionState(present))
+        return state
+
+    def mark_present(self, session_id, recognized, students):
+        """
+        Buffer {student_id: confidence} as present for the session.
+        `students` is the roster's display dicts. Returns (newly marked
+        students, present count) from the in-memory state.
+        """
+        by_id = {s['id']: s for s in students}
+        newly_marked = []
+        with self._lock:
+            state = self._state(session_id)
+            state.touched = time.monotonic()
+            for student_id, confidence in recognized.items():
+                if student_id in state.present or student_id not in by_id:
+                    continue
+                state.present.add(student_id)
+                state.pending[student_id] = confidence
+                self._pending += 1
+                newly_marked.append({
+                    'student_id': student_id,
+                    'name': by_id[student_id]['name'],
+                    'roll': by_id[student_id]['roll_number'],
+                    'confidence': confidence,
+                })
+            total_present = len(state.present)
+            flush_now = self._pending >= self.batch_size
+            if self._pending and not flush_now:
+                self._schedule()
+
+        if flush_now:
+            self.flush()
+        return newly_marked, total_present
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def _take(self, session_id=None):
+        """Detach the pending marks to write: {session_id: {student_id: confidence}}."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            ids = [session_id] if session_id is not None else list(self._sessions)
+            batch = {}
+            for sid in ids:
+                state = self._sessions.get(sid)
+                if state is not None and state.pending:
+                    batch[sid], state.pending = state.pending, {}
+            self._pending -= sum(len(p) for p in batch.values())
+            return batch
+
+    def _restore(self, batch):
+        with self._lock:
+            for sid, pending in batch.items():
+                state = self._sessions.get(sid)
+                if state is not None:
+                    for student_id, confidence in pending.items():
+                        state.pending.setdefault(student_id, confidence)
+                        self._pending += 1
+            if self._pending:
+                self._schedule()
+
+    def flush(self, session_id=None):
+        """Write pending marks (of one session, or all) in one transaction; returns rows updated."""
+        from .models import AttendanceRecord, AttendanceSession
+
+        with self._flush_lock:
+            batch = self._take(session_id)
+            if not batch:
+                self._expire()
+                return 0
+            records = []
+            try:
+                with transaction.atomic():
+                    active = set(AttendanceSession.objects.select_for_update().filter(
+                        pk__in=list(batch), is_active=True).values_list('pk', flat=True))
+                    for sid, pending in batch.items():
+                        if sid not in active:
+                            continue
+                        for record in AttendanceRecord.objects.filter(
+                            session_id=sid, student_id__in=list(pending)
+                        ).exclude(status='present').only('id', 'student_id'):
+                            record.status = 'present'
+                            record.method = 'face'
+                            record.face_confidence = pending[record.student_id]
+                            records.append(record)
+                    AttendanceRecord.objects.bulk_update(records, ['status', 'method', 'face_confidence'], batch_size=500)
+            except Exception:
+                logger.exception('Attendance flush failed; %d marks kept for retry',
+                                 sum(len(p) for p in batch.values()))
+                self._restore(batch)
+                return 0
+            self._drop(set(batch) - active)
+            self._expire()
+            return len(records)
+
+    def _drop(self, session_ids):
+        """Forget finalized sessions whose marks arrived too late to be written."""
+        if not session_ids:
+            return
+        with self._lock:
+            for sid in session_ids:
+                state = self._sessions.pop(sid, None)
+                if state is not None:
+                    self._pending -= len(state.pending)
+        logger.warning('Dropped buffered marks of finalized sessions %s', sorted(session_ids))
+
+    def discard(self, session_id):
+        """Flush, then forget a session's state (its records may now change outside the buffer)."""
+        self.flush(session_id)
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None and not state.pending:
+                del self._sessions[session_id]
+
+    def _expire(self):
+        idle = getattr(settings, 'FACE_WRITE_STATE_TTL', 600)
+        cutoff = time.monotonic() - idle
+        with self._lock:
+            for sid in [sid for sid, s in self._sessions.items() if not s.pending and s.touched < cutoff]:
+                del self._sessions[sid]
+
+
+coalescer = WriteCoalescer()
+atexit.register(coalescer.flush)
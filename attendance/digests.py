@@ -0,0 +1,198 @@
+"""
+Daily parent email digests of absence notifications.
+Finalizing a session only stores Notification rows; they double as the
+outgoing queue. `manage.py send_digests` collects the unsent absences of
+students with a parent email, one digest per (parent email, day) — siblings
+sharing an address get one email — and sends them over a single SMTP
+connection that stays open for the whole run, reopening it and retrying with
+backoff when the server drops it. A digest covers the absences recorded
+since the previous NOTIFY_DIGEST_TIME and becomes due at the next one
+(absences recorded in the evening roll into the next day's digest), so
+every parent gets at most one email per day.
+Sent notifications are stamped in batches (a crash may resend a few digests,
+never lose one); addresses the server refuses are recorded and skipped.
+"""
+import smtplib
+import time
+from datetime import time as clock, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+MARK_EVERY = 100  # digests sent before their notifications are stamped
+PROGRESS_EVERY = 1000
+
+
+def _digest_time():
+    hour, minute = (int(part) for part in getattr(settings, 'NOTIFY_DIGEST_TIME', '18:00').split(':'))
+    return clock(hour, minute)
+
+
+def digest_cutoff(now=None, include_today=False):
+    """Notifications sent before this are due: the last NOTIFY_DIGEST_TIME that has passed (now with include_today)."""
+    now = timezone.localtime(now)
+    if include_today:
+        return now
+    at = _digest_time()
+    cutoff = now.replace(hour=at.hour, minute=at.minute, second=0, microsecond=0)
+    if now < cutoff:
+        cutoff -= timedelta(days=1)
+    return cutoff
+
+
+def digest_day(sent_at):
+    """The day whose digest carries a notification: the next NOTIFY_DIGEST_TIME after it was recorded."""
+    local = timezone.localtime(sent_at)
+    return local.date() + timedelta(days=local.time() >= _digest_time())
+
+
+def pending(cutoff=None):
+    """Unsent absence notifications of active students with a parent email."""
+    from .models import Notification
+
+    qs = Notification.objects.filter(notif_type='absence', emailed_at__isnull=True, email_error='',
+                                     student__is_active=True).exclude(student__parent_email='')
+    if cutoff is not None:
+        qs = qs.filter(sent_at__lt=cutoff)
+    return qs
+
+
+def digests(notifications):
+    """
+    Yield {'to', 'day', 'items': [(student name, roll number, message)],
+    'ids', 'oldest'} per parent email and digest_day(), streaming the queryset.
+    """
+    current = None
+    rows = (notifications.order_by('student__parent_email', 'sent_at', 'id')
+            .values_list('id', 'sent_at', 'message', 'student__name', 'student__roll_number',
+                         'student__parent_email'))
+    for pk, sent_at, message, name, roll, to in rows.iterator(chunk_size=2000):
+        day = digest_day(sent_at)
+        if current is None or (current['to'], current['day']) != (to, day):
+            if current is not None:
+                yield current
+            current = {'to': to, 'day': day, 'items': [], 'ids': [], 'oldest': sent_at}
+        current['items'].append((name, roll, message))
+        current['ids'].append(pk)
+    if current is not None:
+        yield current
+
+
+def render(digest):
+    students = {}
+    for name, roll, message in digest['items']:
+        students.setdefault((name, roll), []).append(message)
+    count = len(digest['items'])
+    lines = ['Dear Parent/Guardian,', '',
+             'The following absences were recorded since the previous digest:', '']
+    for (name, roll), messages in students.items():
+        lines.append(f'{name} ({roll})')
+        lines += [f'  - {message}' for message in messages]
+        lines.append('')
+    lines += ['Students need 75% attendance in every course.', '', '— LPU SmartAttend']
+    return EmailMessage(
+        subject=f"Attendance digest for {digest['day']:%d %b %Y}: {count} absence{'s' if count != 1 else ''}",
+        body='\n'.join(lines), to=[digest['to']])
+
+
+class PooledSender:
+    """One SMTP connection for a whole run; a dropped connection is reopened and the message retried."""
+
+    def __init__(self, retries=None, delay=None):
+        self.connection = get_connection(fail_silently=False)
+        self.retries = retries if retries is not None else getattr(settings, 'NOTIFY_EMAIL_RETRIES', 3)
+        self.delay = delay if delay is not None else getattr(settings, 'NOTIFY_EMAIL_RETRY_DELAY', 1.0)
+        self.opened = 0
+
+    @property
+    def reconnects(self):
+        return max(self.opened - 1, 0)
+
+    def send(self, message):
+        for attempt in range(self.retries + 1):
+            try:
+                if self.connection.open():
+                    self.opened += 1
+                self.connection.send_messages([message])
+                return
+            except smtplib.SMTPRecipientsRefused:
+                raise
+            except (smtplib.SMTPException, OSError):
+                self.connection.close()
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.delay * 2 ** attempt)
+
+    def close(self):
+        self.connection.close()
+
+
+def dispatch(now=None, include_today=False, limit=None, dry_run=False, progress=None):
+    """
+    Send the due digests. Returns stats: digests sent, notifications covered,
+    refused/failed digests, seconds, emails per second and lag (hours from
+    an absence being recorded to its digest going out, oldest and mean).
+    """
+    from .models import Notification
+
+    started = time.monotonic()
+    queue = pending(digest_cutoff(now, include_today))
+    stats = {'sent': 0, 'notifications': 0, 'refused': 0, 'failed': 0, 'reconnects': 0,
+             'max_lag_hours': 0.0, 'mean_lag_hours': 0.0}
+    lag_total = 0.0
+    sender = None if dry_run else PooledSender()
+    unmarked = []
+
+    def stamp():
+        if unmarked:
+            Notification.objects.filter(id__in=unmarked).update(emailed_at=timezone.now())
+            unmarked.clear()
+
+    try:
+        for digest in digests(queue):
+            if limit is not None and stats['sent'] >= limit:
+                break
+            message = render(digest)
+            if sender is not None:
+                try:
+                    sender.send(message)
+                except smtplib.SMTPRecipientsRefused as e:
+                    Notification.objects.filter(id__in=digest['ids']).update(
+                        email_error=f'Refused: {", ".join(e.recipients)}'[:255])
+                    stats['refused'] += 1
+                    continue
+                except (smtplib.SMTPException, OSError):
+                    stats['failed'] += 1  # stays queued for the next run
+                    continue
+                unmarked.extend(digest['ids'])
+            lag = (timezone.now() - digest['oldest']).total_seconds() / 3600
+            stats['max_lag_hours'] = max(stats['max_lag_hours'], lag)
+            lag_total += lag * len(digest['ids'])
+            stats['sent'] += 1
+            stats['notifications'] += len(digest['ids'])
+            if stats['sent'] % MARK_EVERY == 0:
+                stamp()
+            if progress and stats['sent'] % PROGRESS_EVERY == 0:
+                progress(dict(stats, seconds=time.monotonic() - started))
+    finally:
+        stamp()
+        if sender is not None:
+            stats['reconnects'] = sender.reconnects
+            sender.close()
+
+    elapsed = time.monotonic() - started
+    stats['seconds'] = elapsed
+    stats['per_second'] = stats['sent'] / elapsed if elapsed else 0.0
+    if stats['notifications']:
+        stats['mean_lag_hours'] = lag_total / stats['notifications']
+    return stats
+
+
+def queue_lag(now=None):
+    """(unsent absence notifications, hours since the oldest was recorded) right now."""
+    queue = pending()
+    oldest = queue.order_by('sent_at').values_list('sent_at', flat=True).first()
+    if oldest is None:
+        return 0, 0.0
+    return queue.count(), ((now or timezone.now()) - oldest).total_seconds() / 3600
@@ -0,0 +1,100 @@
+"""
+Duplicate-enrollment detection.
+The same face enrolled under two roll numbers (re-admissions, data-entry
+mistakes) makes recognition mark the wrong student. Both checks compare the
+stored embeddings instead of photos: find_duplicates() is one vectorized
+distance row of a new photo against every enrolled student (run by the
+enrollment job, attendance/enrollment.py), audit() the all-pairs matrix of
+the student body computed in row blocks.
+"""
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+
+from .calibration import BLOCK_ROWS, get_threshold
+from .embeddings import (ensure_embeddings, embedding_matrix, pairwise_distances, from_bytes, to_bytes,
+                         get_model_name, get_metric)
+
+
+def duplicate_threshold(model_name=None):
+    """FACE_DUPLICATE_THRESHOLD, else FACE_DUPLICATE_RATIO of the model-wide recognition threshold."""
+    threshold = getattr(settings, 'FACE_DUPLICATE_THRESHOLD', None)
+    if threshold is not None:
+        return threshold
+    return get_threshold(model_name=model_name) * getattr(settings, 'FACE_DUPLICATE_RATIO', 0.5)
+
+
+def stored_matrix(model_name=None, exclude=None):
+    """(ids, matrix) of the stored embeddings of recognized students' current photos."""
+    from .models import FaceEmbedding
+
+    qs = FaceEmbedding.objects.filter(
+        model_name=model_name or get_model_name(), student__is_active=True, student__face_enrolled=True,
+        student__face_status='ready', photo_name=F('student__photo'))
+    if exclude is not None:
+        qs = qs.exclude(student_id=exclude)
+    return embedding_matrix({sid: from_bytes(v) for sid, v in qs.values_list('student_id', 'vector')})
+
+
+def find_duplicates(vector, exclude=None, model_name=None, threshold=None, limit=5):
+    """[(Student, distance)] of the enrolled students within the duplicate threshold of vector, closest first."""
+    from accounts.models import Student
+
+    model_name = model_name or get_model_name()
+    threshold = threshold if threshold is not None else duplicate_threshold(model_name)
+    ids, matrix = stored_matrix(model_name, exclude)
+    if not ids:
+        return []
+    distances = pairwise_distances(vector, matrix)[0]
+    close = np.flatnonzero(distances < threshold)
+    close = close[np.argsort(distances[close])][:limit]
+    students = Student.objects.in_bulk([ids[i] for i in close])
+    return [(students[ids[i]], float(distances[i])) for i in close if ids[i] in students]
+
+
+def enrollment_vector(student, model_name=None):
+    """Embedding of the student's current photo, computed and stored if missing; None without a face."""
+    from .models import FaceEmbedding
+    from .face_utils import represent_photo
+
+    model_name = model_name or get_model_name()
+    stored = FaceEmbedding.objects.filter(student=student, model_name=model_name,
+                                          photo_name=str(student.photo)).values_list('vector', flat=True).first()
+    if stored is not None:
+        return from_bytes(stored)
+    vector = represent_photo(student, model_name)
+    if vector is not None:
+        FaceEmbedding.objects.update_or_create(
+            student=student, model_name=model_name,
+            defaults={'photo_name': str(student.photo), 'vector': to_bytes(vector)})
+    return vector
+
+
+def audit(model_name=None, threshold=None, progress=None):
+    """
+    Every pair of enrolled students closer than the duplicate threshold, as
+    ([(Student, Student, distance)] closest first, students compared).
+    Missing embeddings are computed and stored first.
+    """
+    from accounts.models import Student
+
+    model_name = model_name or get_model_name()
+    threshold = threshold if threshold is not None else duplicate_threshold(model_name)
+    students = list(Student.objects.filter(is_active=True, face_enrolled=True, face_status='ready')
+                    .exclude(photo='').select_related('department'))
+    ids, matrix = embedding_matrix(ensure_embeddings(students, model_name))
+    by_id = {s.id: s for s in students}
+    metric = get_metric()
+
+    pairs, n = [], len(ids)
+    for r0 in range(0, n, BLOCK_ROWS):
+        r1 = min(r0 + BLOCK_ROWS, n)
+        block = pairwise_distances(matrix[r0:r1], matrix[r0:], metric)
+        rows, cols = np.nonzero(block < threshold)
+        keep = cols > rows  # each unordered pair once, no self-pairs
+        for i, j in zip(rows[keep], cols[keep]):
+            pairs.append((by_id[ids[r0 + i]], by_id[ids[r0 + j]], float(block[i, j])))
+        if progress:
+            progress(r1, n)
+    pairs.sort(key=lambda p: p[2])
+    return pairs, n
@@ -0,0 +1,135 @@
+"""
+Face embedding store for LPU Smart Attendance.
+Each enrolled photo is embedded once per model and cached in FaceEmbedding,
+so recognition compares vectors instead of re-running DeepFace.verify.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+ACTIVE_KEY = 'embedding:active'
+
+
+def get_model_name():
+    """Model of the active embedding store; FACE_RECOGNITION_MODEL until `reembed` has swapped one in."""
+    if getattr(settings, 'FACE_EMBEDDER', 'deepface') == 'standin':
+        from .standin import MODEL_NAME
+        return MODEL_NAME
+    return active_model_name() or getattr(settings, 'FACE_RECOGNITION_MODEL', 'VGG-Face')
+
+
+def active_model_name():
+    """The active EmbeddingVersion's model ('' if none), cached for EMBEDDING_VERSION_CACHE_TIMEOUT."""
+    name = cache.get(ACTIVE_KEY)
+    if name is None:
+        from .models import EmbeddingVersion
+        try:
+            name = EmbeddingVersion.objects.filter(status='active').values_list('model_name', flat=True).first() or ''
+        except DatabaseError:
+            return ''  # table not migrated yet
+        cache.set(ACTIVE_KEY, name, getattr(settings, 'EMBEDDING_VERSION_CACHE_TIMEOUT', 30))
+    return name
+
+
+def get_metric():
+    return getattr(settings, 'FACE_RECOGNITION_DISTANCE', 'cosine')
+
+
+def to_bytes(vector):
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype=np.float32)
+
+
+def ensure_embeddings(students, model_name=None):
+    """
+    Return {student_id: vector} for every enrolled student whose face is
+    ready (attendance/enrollment.py). Missing or stale embeddings (photo
+    changed since it was computed, or a new model) are computed now and stored.
+    """
+    from .models import FaceEmbedding
+    from .face_utils import represent_photo
+
+    model_name = model_name or get_model_name()
+    students = [s for s in students if s.photo and s.face_enrolled and s.face_status == 'ready']
+    stored = {
+        e.student_id: e for e in FaceEmbedding.objects.filter(
+            student_id__in=[s.id for s in students], model_name=model_name)
+    }
+
+    vectors, computed = {}, []
+    for student in students:
+        emb = stored.get(student.id)
+        if emb is not None and emb.photo_name == str(student.photo):
+            vectors[student.id] = from_bytes(emb.vector)
+            continue
+        vector = represent_photo(student, model_name)
+        if vector is None:
+            continue
+        computed.append(FaceEmbedding(student=student, model_name=model_name,
+                                      photo_name=str(student.photo), vector=to_bytes(vector)))
+        vectors[student.id] = vector
+    if computed:
+        # One upsert; the caller is building the roster these vectors go into,
+        # so skipping the per-row post_save invalidation is safe.
+        FaceEmbedding.objects.bulk_create(
+            computed, batch_size=500, update_conflicts=True,
+            unique_fields=['student', 'model_name'], update_fields=['photo_name', 'vector', 'created_at'])
+    return vectors
+
+
+def embedding_matrix(vectors):
+    """Stack {student_id: vector} into (ids, float32 matrix)."""
+    ids = list(vectors.keys())
+    if not ids:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+    return ids, np.vstack([vectors[i] for i in ids]).astype(np.float32)
+
+
+def _l2_normalize(m):
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def pairwise_distances(a, b, metric=None):
+    """Vectorized (len(a) x len(b)) distance matrix for the DeepFace metrics."""
+    metric = metric or get_metric()
+    a = np.atleast_2d(np.asarray(a, dtype=np.float32))
+    b = np.atleast_2d(np.asarray(b, dtype=np.float32))
+    if metric == 'cosine':
+        return 1.0 - _l2_normalize(a) @ _l2_normalize(b).T
+    if metric == 'euclidean_l2':
+        a, b = _l2_normalize(a), _l2_normalize(b)
+    sq = (a * a).sum(1)[:, None] + (b * b).sum(1)[None, :] - 2.0 * (a @ b.T)
+    return np.sqrt(np.maximum(sq, 0.0))
+
+
+def assign_faces(face_vectors, ids, gallery, threshold, metric=None):
+    """
+    Assign each detected face to at most one student (and vice versa),
+    closest pairs first. Returns [(face index, student_id, distance)].
+    """
+    if not len(face_vectors) or not len(ids):
+        return []
+    dist = pairwise_distances(face_vectors, gallery, metric)
+    pairs, used_faces, used_ids = [], set(), set()
+    for flat in np.argsort(dist, axis=None):
+        f, s = divmod(int(flat), dist.shape[1])
+        d = float(dist[f, s])
+        if d > threshold:
+            break
+        if f in used_faces or ids[s] in used_ids:
+            continue
+        pairs.append((f, ids[s], d))
+        used_faces.add(f)
+        used_ids.add(ids[s])
+    return pairs
+
+
+def match_faces(face_vectors, ids, gallery, threshold, metric=None):
+    """Like assign_faces, as {student_id: distance}."""
+    return {sid: d for _, sid, d in assign_faces(face_vectors, ids, gallery, threshold, metric)}
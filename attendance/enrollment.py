@@ -0,0 +1,121 @@
+"""
+Background face enrollment.
+Saving a Student with a new photo sets face_status='pending' (see
+accounts/signals.py) and, once the transaction commits, hands the student
+to a small in-process thread pool, so the form answers at once while the
+model loads and runs. The job renders the photo's list-view thumbnails
+(accounts/thumbnails.py), embeds the photo into the active store,
+compares it with the rest of the student body (attendance/duplicates.py)
+and settles the status: 'ready', 'failed' or 'duplicate', with the reason in
+face_error. Recognition only uses 'ready' faces. With a recognition server
+configured (attendance/recognizer.py) the embedding step is handed to it,
+so the web process renders thumbnails but never loads the model.
+
+The pending students (and photos without a photo_hash) are the queue:
+`manage.py process_enrollments` picks up whatever a restart interrupted, and
+does all the work when FACE_ENROLL_BACKGROUND is off.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=getattr(settings, 'FACE_ENROLL_WORKERS', 1),
+                                       thread_name_prefix='enrollment')
+        return _pool
+
+
+def enqueue(student_id, check_duplicates=True, enroll=True, thumbnails=False):
+    """
+    Run make_thumbnails() and/or process() for the student in the background
+    after the current transaction commits.
+    """
+    if not getattr(settings, 'FACE_ENROLL_BACKGROUND', True):
+        return
+    transaction.on_commit(lambda: _executor().submit(_run, student_id, check_duplicates, enroll, thumbnails))
+
+
+def _run(student_id, check_duplicates, enroll, thumbnails):
+    from .recognizer_client import hand_off_enrollment
+
+    close_old_connections()
+    try:
+        # thumbnails first: they take milliseconds, the model seconds
+        if thumbnails:
+            make_thumbnails(student_id)
+        if enroll and not hand_off_enrollment(student_id, check_duplicates):
+            process(student_id, check_duplicates)
+    except Exception:
+        logger.exception('Enrollment of student %s failed', student_id)
+    finally:
+        close_old_connections()
+
+
+def make_thumbnails(student_id):
+    """
+    Render the student's photo thumbnails and store their photo_hash. Returns
+    the hash ('' for an unreadable photo), or None when the student is gone,
+    has no photo or got another photo meanwhile.
+    """
+    from accounts.models import Student
+    from accounts.thumbnails import store_thumbnails
+    from .roster import invalidate_roster
+
+    student = Student.objects.filter(pk=student_id).only('pk', 'photo', 'department_id', 'section').first()
+    if student is None or not student.photo:
+        return None
+    key = store_thumbnails(student)
+    if key is None:
+        return None
+    # the roster lists the thumbnails, and update() skips the post_save signal that drops it
+    invalidate_roster(student.department_id, student.section)
+    return key
+
+
+def process(student_id, check_duplicates=True):
+    """
+    Embed a pending student's photo and settle its face_status. Returns the
+    status set, or None when the student is gone, no longer pending or got
+    another photo meanwhile (that photo has its own job).
+    """
+    from accounts.models import Student
+    from .duplicates import enrollment_vector, find_duplicates
+    from .roster import invalidate_roster
+
+    student = Student.objects.filter(pk=student_id, face_status='pending').first()
+    if student is None or not student.photo:
+        return None
+
+    status, error = 'ready', ''
+    try:
+        vector = enrollment_vector(student)
+    except Exception as e:
+        logger.exception('Embedding the photo of %s failed', student)
+        vector, error = None, f'{type(e).__name__}: {e}'
+    if vector is None:
+        status, error = 'failed', error or 'No face could be embedded from the photo'
+    elif check_duplicates:
+        duplicates = find_duplicates(vector, exclude=student.pk)
+        if duplicates:
+            status = 'duplicate'
+            error = 'matches ' + ', '.join(f'{other.roll_number} ({other.name})' for other, _ in duplicates)
+
+    updated = Student.objects.filter(pk=student.pk, photo=str(student.photo), face_status='pending').update(
+        face_status=status, face_error=error[:255])
+    if not updated:
+        return None
+    # update() skips the post_save signal that drops the roster
+    invalidate_roster(student.department_id, student.section)
+    return status
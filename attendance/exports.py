@@ -0,0 +1,149 @@
+"""
+Streaming attendance register exports (CSV / XLSX).
+Rows are students, columns are sessions in date order. Records are read
+with .iterator() in student order and each row is written as soon as the
+student changes, so memory stays proportional to the number of sessions,
+not the number of records.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+from .models import AttendanceRecord
+
+CHUNK_SIZE = 2000
+STATUS_CODES = {'present': 'P', 'absent': 'A', 'late': 'L'}
+
+
+def register_rows(sessions, records):
+    """
+    Yield the header row, then one row per student:
+    roll number, name, one status code per session, present, total, %.
+    """
+    session_ids = sessions.values('id')
+    sessions = list(sessions.select_related('course').order_by('date', 'start_time', 'id'))
+    column = {s.id: i for i, s in enumerate(sessions)}
+    yield (['Roll No', 'Name'] +
+           [f"{s.course.code} {s.date} {s.start_time:%H:%M}" for s in sessions] +
+           ['Present', 'Total', 'Percentage'])
+
+    records = (records.filter(session__in=session_ids)
+               .select_related('student')
+               .only('status', 'session_id', 'student__name', 'student__roll_number')
+               .order_by('student__roll_number', 'student_id'))
+
+    student, cells = None, None
+
+    def finish():
+        present = sum(1 for c in cells if c == 'P')
+        total = sum(1 for c in cells if c)
+        pct = round(present / total * 100, 1) if total else 0
+        return [student.roll_number, student.name] + cells + [present, total, pct]
+
+    for record in records.iterator(chunk_size=CHUNK_SIZE):
+        if student is None or record.student_id != student.id:
+            if student is not None:
+                yield finish()
+            student, cells = record.student, [''] * len(sessions)
+        cells[column[record.session_id]] = STATUS_CODES.get(record.status, '')
+    if student is not None:
+        yield finish()
+
+
+class _Echo:
+    """File-like object that hands back what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_stream(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _Drain:
+    """Unseekable sink for ZipFile; the generator empties it after each write."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Register" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_stream(rows):
+    """Minimal single-sheet workbook written row by row into a streamed zip."""
+    sink = _Drain()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_PARTS.items():
+            zf.writestr(name, xml)
+        yield sink.take()
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for row in rows:
+                sheet.write(('<row>' + ''.join(_xlsx_cell(v) for v in row) + '</row>').encode())
+                chunk = sink.take()
+                if chunk:
+                    yield chunk
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.take()
+
+
+def register_response(sessions, filename, fmt='csv', records=None):
+    """StreamingHttpResponse with the register of `sessions` as CSV or XLSX."""
+    rows = register_rows(sessions, records if records is not None else AttendanceRecord.objects.all())
+    if fmt == 'xlsx':
+        response = StreamingHttpResponse(
+            _xlsx_stream(rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    else:
+        fmt = 'csv'
+        response = StreamingHttpResponse(_csv_stream(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
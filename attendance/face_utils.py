@@ -4,6 +4,7 @@ Handles: photo upload matching, webcam frame matching.
 """
 import os
 import base64
+import importlib.util
 import tempfile
 import numpy as np
 from django.conf import settings
@@ -64,71 +65,165 @@ def recognize_face_from_image(capture_image_path, students_queryset):
     return results
 
 
-def recognize_faces_bulk(capture_image_path, students_queryset):
-    """
-    Detect ALL faces in one image (group photo / classroom webcam shot)
-    and match each to enrolled students.
-    Returns dict: {student_id: confidence}
-    """
+def _standin():
+    """The stand-in embedder module when FACE_EMBEDDER = 'standin', else None."""
+    if getattr(settings, 'FACE_EMBEDDER', 'deepface') == 'standin':
+        from . import standin
+        return standin
+    return None
+
+
+def detector_available():
+    """Whether faces can be detected here (DeepFace installed, or the stand-in embedder)."""
+    if _standin():
+        return True
+    return importlib.util.find_spec('deepface') is not None
+
+
+def represent_face(face_bgr, model_name=None):
+    """Embed an already-cropped face (BGR uint8 array). Returns np.ndarray or None."""
+    standin = _standin()
+    if standin:
+        return standin.represent_face(face_bgr)
     try:
         from deepface import DeepFace
-        import cv2
     except ImportError:
-        return {}
+        return None
 
-    recognized = {}
-    model = getattr(settings, 'FACE_RECOGNITION_MODEL', 'VGG-Face')
-    metric = getattr(settings, 'FACE_RECOGNITION_DISTANCE', 'cosine')
+    from .embeddings import get_model_name
+    try:
+        reps = DeepFace.represent(
+            img_path=face_bgr,
+            model_name=model_name or get_model_name(),
+            detector_backend='skip',
+            enforce_detection=False
+        )
+    except Exception:
+        return None
+    if not reps:
+        return None
+    return np.asarray(reps[0]['embedding'], dtype=np.float32)
+
+
+def represent_photo(student, model_name=None):
+    """Embed a student's enrolled photo. Returns np.ndarray or None."""
+    return represent_photo_path(os.path.join(settings.MEDIA_ROOT, str(student.photo)), model_name)
+
+
+def represent_photo_path(db_path, model_name=None):
+    """Embed the face in an enrolled photo file. Returns np.ndarray or None."""
+    if not os.path.exists(db_path):
+        return None
+    standin = _standin()
+    if standin:
+        return standin.represent_path(db_path)
+
+    try:
+        from deepface import DeepFace
+    except ImportError:
+        return None
 
+    from .embeddings import get_model_name
     try:
-        # Detect all faces in the capture
-        face_objs = DeepFace.extract_faces(
-            img_path=capture_image_path,
+        reps = DeepFace.represent(
+            img_path=db_path,
+            model_name=model_name or get_model_name(),
             enforce_detection=False
         )
     except Exception:
+        return None
+    if not reps:
+        return None
+    # Reference photos hold one face; keep the largest detection if not.
+    best = max(reps, key=lambda r: r.get('facial_area', {}).get('w', 0) * r.get('facial_area', {}).get('h', 0))
+    return np.asarray(best['embedding'], dtype=np.float32)
+
+
+def detect_faces(img):
+    """Run DeepFace detection on a path or BGR array. Returns its face dicts."""
+    standin = _standin()
+    if standin:
+        return standin.detect_faces(img)
+    try:
+        from deepface import DeepFace
+    except ImportError:
+        return []
+    try:
+        return DeepFace.extract_faces(img_path=img, enforce_detection=False)
+    except Exception:
+        return []
+
+
+def match_face_vectors(face_vectors, gallery, threshold=None):
+    """
+    Match face embeddings to enrolled students.
+    `gallery` is (student_ids, embedding matrix), e.g. from the section roster.
+    Returns {student_id: confidence}.
+    """
+    from .embeddings import match_faces
+    from .calibration import get_threshold
+
+    if not face_vectors:
         return {}
+    ids, gallery = gallery
+    if threshold is None:
+        threshold = get_threshold()
+    matched = match_faces(np.vstack(face_vectors), ids, gallery, threshold)
+    return {sid: round((1 - d) * 100, 1) for sid, d in matched.items()}
+
+
+def detect_face_areas(prepared, tiled=None):
+    """Facial areas in prepared.image coordinates, tiled for panoramas whose faces are small."""
+    from .tiling import use_tiling, needs_tiling, detect_tiled
+
+    mode = use_tiling(tiled)
+    if mode is True:
+        return detect_tiled(prepared, detect_faces)
+    # enforce_detection=False reports the whole image with confidence 0 when it finds no face
+    areas = [f['facial_area'] for f in detect_faces(prepared.image) if f.get('facial_area') and f.get('confidence')]
+    if mode == 'auto' and needs_tiling(prepared, areas):
+        return detect_tiled(prepared, detect_faces)
+    return areas
 
-    for face_obj in face_objs:
-        face_img = face_obj.get('face')
-        if face_img is None:
-            continue
 
-        # Save face crop to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-            import cv2
-            face_bgr = (face_img * 255).astype(np.uint8)
-            face_bgr = cv2.cvtColor(face_bgr, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(tmp.name, face_bgr)
-            tmp_path = tmp.name
-
-        # Match this face against all students
-        for student in students_queryset:
-            if not student.photo or not student.face_enrolled:
-                continue
-            if student.id in recognized:
-                continue
-
-            db_path = os.path.join(settings.MEDIA_ROOT, str(student.photo))
-            if not os.path.exists(db_path):
-                continue
-
-            try:
-                res = DeepFace.verify(
-                    img1_path=tmp_path,
-                    img2_path=db_path,
-                    model_name=model,
-                    distance_metric=metric,
-                    enforce_detection=False
-                )
-                if res['verified']:
-                    recognized[student.id] = round((1 - res['distance']) * 100, 1)
-            except Exception:
-                continue
-
-        os.unlink(tmp_path)
-
-    return recognized
+def recognize_faces_bulk(capture, gallery, threshold=None, tiled=None):
+    """
+    Detect ALL faces in one image (group photo / classroom webcam shot)
+    and match each to enrolled students.
+    `capture` is a file path or a preprocess.PreparedImage; detection runs
+    on the downsized image (or its tiles) and each face is embedded once
+    from a sharper crop.
+    Returns dict: {student_id: confidence}
+    """
+    from .preprocess import PreparedImage, prepare_path
+
+    prepared = capture if isinstance(capture, PreparedImage) else prepare_path(capture)
+    return match_face_vectors(embed_capture(prepared, tiled), gallery, threshold)
+
+
+def embed_capture(prepared, tiled=None):
+    """Detect faces in a PreparedImage and embed each one. Returns a list of vectors."""
+    return embed_areas(prepared, detect_face_areas(prepared, tiled))[0]
+
+
+def embed_areas(prepared, areas):
+    """
+    Embed the given facial areas of a PreparedImage. Returns (vectors,
+    rejected): crops failing the quality gate (attendance/quality.py) are
+    skipped without running the model and counted in `rejected`, so the
+    caller can ask for a rescan.
+    """
+    from .quality import passes
+
+    face_vectors, rejected = [], 0
+    for area, crop in zip(areas, prepared.face_crops(areas)):
+        if not passes(crop, area, prepared):
+            rejected += 1
+            continue
+        vector = represent_face(crop)
+        if vector is not None:
+            face_vectors.append(vector)
+    return face_vectors, rejected
 
 
 def verify_single_student(capture_path, student):
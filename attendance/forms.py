@@ -6,13 +6,14 @@ from accounts.models import Course
 class SessionForm(forms.ModelForm):
     class Meta:
         model = AttendanceSession
-        fields = ['course', 'date', 'section', 'start_time', 'mode']
+        fields = ['course', 'date', 'section', 'start_time', 'mode', 'room']
         widgets = {
             'course': forms.Select(attrs={'class': 'form-control'}),
             'date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'section': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. A'}),
             'start_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
             'mode': forms.Select(attrs={'class': 'form-control'}),
+            'room': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. 34-201 (optional)'}),
         }
 
     def __init__(self, *args, faculty=None, **kwargs):
@@ -0,0 +1,52 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from attendance.duplicates import audit, duplicate_threshold
+from attendance.embeddings import get_model_name
+
+
+class Command(BaseCommand):
+    help = 'List pairs of enrolled students whose faces match (the same person under two roll numbers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='Distance below which a pair is reported (default FACE_DUPLICATE_THRESHOLD, '
+                                 'else FACE_DUPLICATE_RATIO of the recognition threshold)')
+        parser.add_argument('--model', default=None, help='Embedding store (default the active one)')
+        parser.add_argument('--csv', metavar='PATH', help='Also write the pairs to a CSV file')
+        parser.add_argument('--limit', type=int, default=50, help='Pairs printed (default 50; the CSV has all)')
+
+    def handle(self, *args, **opts):
+        model = opts['model'] or get_model_name()
+        threshold = opts['threshold'] if opts['threshold'] is not None else duplicate_threshold(model)
+        if threshold <= 0:
+            raise CommandError('--threshold must be positive')
+
+        started = time.monotonic()
+        pairs, n = audit(model, threshold)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{model}: compared {n} enrolled students ({n * (n - 1) // 2} pairs) '
+                          f'at distance < {threshold:.4f} in {elapsed:.2f}s')
+
+        for a, b, d in pairs[:max(opts['limit'], 0)]:
+            self.stdout.write(f'  {d:.4f}  {_label(a)}  ↔  {_label(b)}')
+        if len(pairs) > opts['limit']:
+            self.stdout.write(f'  … {len(pairs) - opts["limit"]} more')
+
+        if opts['csv']:
+            with open(opts['csv'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['distance', 'roll_number_a', 'name_a', 'roll_number_b', 'name_b'])
+                for a, b, d in pairs:
+                    writer.writerow([f'{d:.4f}', a.roll_number, a.name, b.roll_number, b.name])
+
+        if pairs:
+            self.stdout.write(self.style.WARNING(f'{len(pairs)} suspicious pairs; check their photos and records.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ No duplicate enrollments found.'))
+
+
+def _label(student):
+    dept = student.department.code if student.department else '—'
+    return f'{student.roll_number} {student.name} ({dept}-{student.section})'
@@ -0,0 +1,59 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import Student
+from attendance.calibration import InsufficientData, calibrate, import_samples, save_calibration
+
+
+class Command(BaseCommand):
+    help = 'Suggest face recognition thresholds at a target false-accept rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--far', type=float, default=0.001,
+                            help='Target false-accept rate (default 0.001)')
+        parser.add_argument('--model', default=None,
+                            help='Recognition model (default FACE_RECOGNITION_MODEL)')
+        parser.add_argument('--per-section', action='store_true',
+                            help='Also calibrate every department/section separately')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Print suggestions without storing them')
+        parser.add_argument('--genuine-dir', default=None,
+                            help='Folder of extra photos per student (<dir>/<roll number>/*.jpg) to embed '
+                                 'as genuine pairs for the false-reject rate; kept for later runs')
+
+    def handle(self, *args, **opts):
+        if opts['genuine_dir']:
+            if not os.path.isdir(opts['genuine_dir']):
+                raise CommandError(f"{opts['genuine_dir']} is not a directory")
+            done, skipped = import_samples(opts['genuine_dir'], model_name=opts['model'])
+            self.stdout.write(f'{done} genuine photos embedded, {skipped} without a usable face')
+
+        students = Student.objects.filter(is_active=True, face_enrolled=True).select_related('department')
+
+        scopes = [(None, '', list(students))]
+        if opts['per_section']:
+            groups = {}
+            for s in students:
+                if s.department_id:
+                    groups.setdefault((s.department, s.section), []).append(s)
+            scopes += [(dept, section, members) for (dept, section), members in groups.items()]
+
+        for dept, section, members in scopes:
+            label = f"{dept.code}-{section}" if dept else 'all students'
+            try:
+                result = calibrate(members, target_far=opts['far'], model_name=opts['model'])
+            except InsufficientData as e:
+                self.stdout.write(self.style.WARNING(f"{label}: {e}, skipped"))
+                continue
+
+            frr = f"{result['frr']:.2%}" if result['frr'] is not None else 'n/a (no --genuine-dir photos)'
+            self.stdout.write(
+                f"{label}: threshold={result['threshold']:.4f} "
+                f"FAR={result['achieved_far']:.4%} FRR={frr} "
+                f"(impostor pairs={result['impostor_pairs']}, genuine={result['genuine_pairs']})"
+            )
+            if not opts['dry_run']:
+                save_calibration(result, department=dept, section=section)
+
+        if not opts['dry_run']:
+            self.stdout.write(self.style.SUCCESS('✅ Calibration stored; recognition uses it from now on.'))
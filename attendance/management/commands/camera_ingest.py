@@ -0,0 +1,77 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.cameras import CameraIngest, CameraSource
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = ('Mark attendance from fixed classroom cameras without a browser: each source (device index, '
+            'stream URL or video file) feeds the active face session of its room')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--camera', action='append', default=[], metavar='ROOM=SOURCE',
+                            help='Room and its source, e.g. 34-201=0 or 34-202=rtsp://… '
+                                 '(repeatable; default FACE_CAMERAS)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Recognition threads shared by all cameras (default FACE_CAMERA_WORKERS)')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between frames offered per camera (default FACE_CAMERA_INTERVAL)')
+        parser.add_argument('--queue', type=int, default=None,
+                            help='Frames waiting for recognition before the oldest is dropped '
+                                 '(default FACE_CAMERA_QUEUE_SIZE)')
+        parser.add_argument('--fast', action='store_true',
+                            help='Read video file sources as fast as possible instead of at their frame rate')
+        parser.add_argument('--loop', action='store_true', help='Restart video file sources when they end')
+        parser.add_argument('--report', type=float, default=30, help='Seconds between status lines (default 30)')
+
+    def handle(self, *args, **opts):
+        cameras = dict(getattr(settings, 'FACE_CAMERAS', {}))
+        if opts['camera']:
+            cameras = {}
+            for spec in opts['camera']:
+                room, sep, source = spec.partition('=')
+                if not sep or not room or not source:
+                    raise CommandError(f'--camera expects ROOM=SOURCE, got {spec!r}')
+                cameras[room] = source
+        if not cameras:
+            raise CommandError('No cameras: pass --camera ROOM=SOURCE or set FACE_CAMERAS')
+
+        sources = [CameraSource(room, source, realtime=not opts['fast'], loop=opts['loop'])
+                   for room, source in cameras.items()]
+        ingest = CameraIngest(sources, workers=opts['workers'], queue_size=opts['queue'],
+                              interval=opts['interval'])
+        signal.signal(signal.SIGTERM, _stop)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Watching {len(sources)} camera(s) with {ingest.workers} recognition worker(s): '
+            + ', '.join(str(s) for s in sources)))
+        ingest.start()
+        last_report = time.monotonic()
+        try:
+            while not ingest.done:
+                time.sleep(0.2)
+                if time.monotonic() - last_report >= opts['report']:
+                    last_report = time.monotonic()
+                    self._report(ingest)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping…')
+        finally:
+            ingest.stop()
+        self._report(ingest)
+
+    def _report(self, ingest):
+        for s in ingest.stats():
+            state = 'finished' if s['finished'] else 'connected' if s['connected'] else 'disconnected'
+            self.stdout.write(
+                f"  {s['room']:<10} {state:<12} {s['session'] or 'no active session':<32} "
+                f"read {s['read_fps']:.1f} fps · recognized {s['processed']} ({s['processed_fps']:.2f}/s) · "
+                f"unchanged {s['unchanged']} · dropped {s['dropped']} · stale {s['stale']} · "
+                f"idle {s['idle']} · marked {s['marked']} · errors {s['errors']}")
+            if s['errors'] and s['last_error']:
+                self.stdout.write(self.style.WARNING(f"    last error: {s['last_error']}"))
@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.models import AttendanceSession
+from attendance.preprocess import ImageRejected
+from attendance.video import ingest_video
+
+
+class Command(BaseCommand):
+    help = ('Recognize the students in a recorded lecture and mark them present in a session. '
+            'The video is stream-decoded and sampled on scene changes, so any length fits in memory')
+
+    def add_arguments(self, parser):
+        parser.add_argument('session', type=int, help='AttendanceSession id')
+        parser.add_argument('video', help='Path to the video file (anything OpenCV can decode)')
+        parser.add_argument('--tiled', choices=('auto', 'yes', 'no'), default='auto',
+                            help='Tiled detection for wide lecture-hall shots (default auto)')
+
+    def handle(self, *args, **opts):
+        try:
+            session = AttendanceSession.objects.select_related('course').get(pk=opts['session'])
+        except AttendanceSession.DoesNotExist:
+            raise CommandError(f"No session {opts['session']}")
+        if not os.path.isfile(opts['video']):
+            raise CommandError(f"No such file: {opts['video']}")
+        tiled = {'yes': True, 'no': False}.get(opts['tiled'])
+
+        self.stdout.write(f'Ingesting {opts["video"]} into {session}…')
+        try:
+            newly_marked, stats = ingest_video(opts['video'], session, tiled=tiled, progress=self._progress)
+        except ImageRejected as e:
+            raise CommandError(str(e))
+
+        for r in newly_marked:
+            self.stdout.write(f"  {r['roll']:<12} {r['name']:<30} {r['confidence']}%")
+        self.stdout.write(f"  {stats['frames']} frames ({stats['duration']:.0f}s of video) in {stats['seconds']:.1f}s "
+                          f"= {stats['fps']:.1f} fps; {stats['probed']} probed, {stats['sampled']} sampled, "
+                          f"{stats['faces']} faces, {stats['embedded']} embedded")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats['recognized']} student(s) recognized, {len(newly_marked)} newly marked present."))
+
+    def _progress(self, stats):
+        where = f"{stats['position']:.0f}s / {stats['duration']:.0f}s" if stats['duration'] else f"{stats['position']:.0f}s"
+        self.stdout.write(f"  {where} · {stats['fps']:.1f} fps · {stats['sampled']} sampled · "
+                          f"{stats['recognized']} recognized")
@@ -0,0 +1,309 @@
+import base64
+import random
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from accounts.models import Department, Course, Faculty, Student
+from attendance.models import AttendanceSession, AttendanceRecord
+
+DEPT_CODE = 'LOADTEST'
+COURSE_CODE = 'LT-101'
+SLOW_WRITE = 0.1  # seconds; a write statement slower than this waited for the lock
+
+
+class _Metrics:
+    """Request latencies and DB write timings shared by the simulated clients."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []    # (endpoint, status, seconds)
+        self.writes = []      # seconds per write statement
+        self.locked = 0       # 'database is locked' errors
+        self.shown = {}       # session pk -> student ids put in front of the camera
+        self.uploaded = 0     # frame bytes sent to the recognize API
+
+    def request(self, endpoint, status, seconds):
+        with self.lock:
+            self.requests.append((endpoint, status, seconds))
+
+    def sent(self, size):
+        with self.lock:
+            self.uploaded += size
+
+    def probe(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook timing BEGIN/INSERT/UPDATE/DELETE."""
+        write = sql.lstrip()[:6].upper() in ('BEGIN ', 'INSERT', 'UPDATE', 'DELETE')
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except Exception as e:
+            if 'locked' in str(e):
+                with self.lock:
+                    self.locked += 1
+            raise
+        finally:
+            if write:
+                with self.lock:
+                    self.writes.append(time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = ('Simulate K concurrent webcam classrooms (create session, POST frames to the recognize '
+            'API, poll stats, finalize) with the stand-in embedder and report throughput, latency '
+            'percentiles, error rates and DB lock waits')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', default='1,5,20',
+                            help='Comma-separated concurrent session counts, one scenario each (default 1,5,20)')
+        parser.add_argument('--students', type=int, default=40, help='Students per section (default 40)')
+        parser.add_argument('--frames', type=int, default=10, help='Frames each session sends (default 10)')
+        parser.add_argument('--faces', type=int, default=6, help='Faces per frame (default 6)')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between frames of one session, as the webcam page (default 5)')
+        parser.add_argument('--upload', choices=('binary', 'json'), default='binary',
+                            help='Send frames as raw JPEG bodies (the webcam page) or base64 JSON (older pages)')
+        parser.add_argument('--db', default=None,
+                            help='SQLite file to run against (default: a throwaway file in a temporary folder)')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Run against the configured database instead: seeds and afterwards deletes '
+                                 f'a {DEPT_CODE} department in it')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated data afterwards')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **opts):
+        try:
+            scenarios = [int(k) for k in opts['sessions'].split(',') if k.strip()]
+        except ValueError:
+            raise CommandError('--sessions must be comma-separated integers')
+        if not scenarios or min(scenarios) < 1:
+            raise CommandError('--sessions needs at least one positive count')
+        if opts['in_place'] and opts['db']:
+            raise CommandError('--in-place and --db exclude each other')
+        scratch = None if opts['in_place'] else tempfile.mkdtemp(prefix='smartattend-loadtest-')
+        try:
+            if scratch:
+                self._use_database(opts['db'] or os.path.join(scratch, 'loadtest.sqlite3'))
+            # photos go to the scratch folder too, never into the real MEDIA_ROOT
+            with override_settings(**({'MEDIA_ROOT': scratch} if scratch else {})):
+                self._scenarios(scenarios, opts)
+        finally:
+            if scratch:
+                connections['default'].close()
+                if opts['keep']:
+                    self.stdout.write(f'Kept {scratch}')
+                else:
+                    shutil.rmtree(scratch, ignore_errors=True)
+
+    def _scenarios(self, scenarios, opts):
+        self.rng = random.Random(opts['seed'])
+        metrics_hook = {}
+
+        def on_connect(sender, connection, **kwargs):
+            probe = metrics_hook.get('probe')
+            if probe and probe not in connection.execute_wrappers:
+                connection.execute_wrappers.append(probe)
+
+        connection_created.connect(on_connect, weak=False)
+        with override_settings(FACE_EMBEDDER='standin'):
+            sections = self._setup(max(scenarios), opts['students'])
+            try:
+                for k in scenarios:
+                    metrics = _Metrics()
+                    metrics_hook['probe'] = metrics.probe
+                    connections.close_all()
+                    elapsed = self._run(k, sections, metrics, opts)
+                    metrics_hook.pop('probe')
+                    connections.close_all()
+                    self._report(k, elapsed, metrics)
+            finally:
+                connection_created.disconnect(on_connect)
+                if not opts['keep']:
+                    self._teardown()
+
+    # ── setup ────────────────────────────────────────────────────────────────
+
+    def _use_database(self, path):
+        if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The load test runs on a throwaway SQLite database; '
+                               'with another backend use --in-place on a test database')
+        connections['default'].close()
+        settings.DATABASES['default']['NAME'] = path
+        connections['default'].settings_dict['NAME'] = path
+        call_command('migrate', verbosity=0)
+        self.stdout.write(f'Using database {path}')
+
+    def _setup(self, sessions, per_section):
+        import cv2
+        from attendance.standin import face_pattern
+
+        self._teardown()
+        if Course.objects.filter(code=COURSE_CODE).exists():
+            raise CommandError(f'A course {COURSE_CODE} already exists outside the {DEPT_CODE} department')
+        dept = Department.objects.create(name='Load Test', code=DEPT_CODE)
+        course = Course.objects.create(name='Load Test Course', code=COURSE_CODE, department=dept)
+
+        sections = []
+        for n in range(1, sessions + 1):
+            user = User.objects.create_user(f'loadtest-{n}', password=None)
+            faculty = Faculty.objects.create(user=user, name=f'Load Faculty {n}',
+                                             employee_id=f'LT-F{n}', email='', department=dept)
+            faculty.courses.add(course)
+            section = f'L{n}'
+            students = []
+            for i in range(per_section):
+                roll = f'LT{n:03d}{i:04d}'
+                _, png = cv2.imencode('.png', face_pattern(roll))
+                student = Student(name=f'Load Student {roll}', roll_number=roll, email='',
+                                  department=dept, section=section, face_enrolled=True, face_status='ready')
+                student.photo.save(f'loadtest_{roll}.png', ContentFile(png.tobytes()), save=False)
+                students.append(student)
+            Student.objects.bulk_create(students)
+            ids = dict(Student.objects.filter(section=section, department=dept).values_list('roll_number', 'id'))
+            sections.append({'user': user, 'course': course, 'section': section,
+                             'students': [(ids[s.roll_number], s.roll_number) for s in students]})
+        self.stdout.write(f'Set up {sessions} section(s) × {per_section} students')
+        return sections
+
+    def _teardown(self):
+        """Delete what _setup created, and only that: everything hangs off the LOADTEST department."""
+        for student in Student.objects.filter(department__code=DEPT_CODE):
+            if student.photo:
+                student.photo.delete(save=False)
+        AttendanceSession.objects.filter(course__department__code=DEPT_CODE).delete()
+        Student.objects.filter(department__code=DEPT_CODE).delete()
+        User.objects.filter(username__startswith='loadtest-', faculty__department__code=DEPT_CODE).delete()
+        Course.objects.filter(department__code=DEPT_CODE).delete()
+        Department.objects.filter(code=DEPT_CODE).delete()
+
+    # ── simulation ───────────────────────────────────────────────────────────
+
+    def _frame(self, roster, faces):
+        """JPEG bytes with `faces` stand-in faces on a dark background, plus their ids."""
+        import cv2
+        from attendance.standin import face_pattern
+
+        chosen = self.rng.sample(roster, min(faces, len(roster)))
+        cols = 4
+        rows = -(-len(chosen) // cols)
+        canvas = np.zeros((max(rows, 1) * 192 + 64, cols * 192 + 64, 3), np.uint8)
+        for i, (_, roll) in enumerate(chosen):
+            y, x = 64 + (i // cols) * 192, 64 + (i % cols) * 192
+            canvas[y:y + 128, x:x + 128] = face_pattern(roll)
+        _, jpeg = cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return jpeg.tobytes(), [sid for sid, _ in chosen]
+
+    def _timed(self, metrics, endpoint, call):
+        started = time.perf_counter()
+        try:
+            response = call()
+        except Exception:
+            metrics.request(endpoint, 'exception', time.perf_counter() - started)
+            return None
+        metrics.request(endpoint, response.status_code, time.perf_counter() - started)
+        return response
+
+    def _classroom(self, spec, metrics, opts):
+        client = Client()
+        client.force_login(spec['user'])
+        try:
+            response = self._timed(metrics, 'create', lambda: client.post(reverse('create_session'), {
+                'course': spec['course'].pk, 'date': date.today().isoformat(), 'section': spec['section'],
+                'start_time': datetime.now().strftime('%H:%M'), 'mode': 'face',
+            }))
+            match = response and re.search(r'/sessions/(\d+)/', response.get('Location', ''))
+            if not match:
+                return
+            pk = int(match.group(1))
+            self._timed(metrics, 'page', lambda: client.get(reverse('face_attendance', args=[pk])))
+
+            shown = set()
+            for _ in range(opts['frames']):
+                image, ids = self._frame(spec['students'], opts['faces'])
+                if opts['upload'] == 'json':
+                    body = {'image': 'data:image/jpeg;base64,' + base64.b64encode(image).decode()}
+                    content_type = 'application/json'
+                else:
+                    body, content_type = image, 'image/jpeg'
+                metrics.sent(len(body['image']) if isinstance(body, dict) else len(body))
+                response = self._timed(metrics, 'recognize', lambda: client.post(
+                    reverse('api_recognize_face', args=[pk]), body, content_type=content_type))
+                delay = opts['interval']
+                if response is not None and response.status_code in (429, 503):
+                    delay = max(delay, float(response.get('Retry-After') or delay))
+                elif response is not None and response.status_code == 200:
+                    shown.update(ids)
+                self._timed(metrics, 'stats', lambda: client.get(reverse('api_session_stats', args=[pk])))
+                time.sleep(delay * self.rng.uniform(0.9, 1.1))
+
+            self._timed(metrics, 'finalize', lambda: client.post(reverse('finalize_face_session', args=[pk])))
+            with metrics.lock:
+                metrics.shown[pk] = shown
+        finally:
+            connections.close_all()
+
+    def _run(self, k, sections, metrics, opts):
+        threads = [threading.Thread(target=self._classroom, args=(spec, metrics, opts))
+                   for spec in sections[:k]]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+            time.sleep(self.rng.uniform(0, 0.05))
+        for t in threads:
+            t.join()
+        return time.perf_counter() - started
+
+    # ── report ───────────────────────────────────────────────────────────────
+
+    def _report(self, k, elapsed, metrics):
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Scenario: {k} concurrent session(s), {elapsed:.1f}s'))
+        total = len(metrics.requests)
+        frames = sum(1 for e, s, _ in metrics.requests if e == 'recognize' and s == 200)
+        self.stdout.write(f'  throughput: {total / elapsed:.1f} req/s, {frames / elapsed:.2f} frames/s recognized')
+        sent = sum(1 for e, _, _ in metrics.requests if e == 'recognize')
+        if sent:
+            self.stdout.write(f'  upload: {metrics.uploaded / sent / 1024:.1f} KiB per frame')
+
+        self.stdout.write(f"  {'endpoint':<10} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                          f"{'shed':>7} {'errors':>7}  statuses")
+        for endpoint in ('create', 'page', 'recognize', 'stats', 'finalize'):
+            rows = [(s, t) for e, s, t in metrics.requests if e == endpoint]
+            if not rows:
+                continue
+            ms = np.array([t for _, t in rows]) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            # 429/503 are the admission controller shedding load; anything else >= 400 is an error
+            shed = sum(1 for s, _ in rows if s in (429, 503))
+            errors = sum(1 for s, _ in rows if s == 'exception' or (s >= 400 and s not in (429, 503)))
+            statuses = {}
+            for s, _ in rows:
+                statuses[s] = statuses.get(s, 0) + 1
+            self.stdout.write(f'  {endpoint:<10} {len(rows):>6} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} '
+                              f'{shed / len(rows):>7.1%} {errors / len(rows):>7.1%}  {statuses}')
+
+        writes = np.array(metrics.writes) * 1000 if metrics.writes else np.zeros(1)
+        slow = int((writes >= SLOW_WRITE * 1000).sum())
+        self.stdout.write(f'  db writes: {len(metrics.writes)}, p99 {np.percentile(writes, 99):.1f} ms, '
+                          f'max {writes.max():.1f} ms, lock waits (>{SLOW_WRITE * 1000:.0f} ms) {slow}, '
+                          f'"database is locked" errors {metrics.locked}')
+
+        shown = sum(len(ids) for ids in metrics.shown.values())
+        if shown:
+            present = sum(AttendanceRecord.objects.filter(session_id=pk, student_id__in=ids, status='present').count()
+                          for pk, ids in metrics.shown.items())
+            self.stdout.write(f'  marked present: {present}/{shown} students shown ({present / shown:.1%})')
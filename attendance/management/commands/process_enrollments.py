@@ -0,0 +1,63 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from accounts.models import Student
+from attendance.enrollment import make_thumbnails, process
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = ('Embed the photos of students whose face enrollment is pending and render missing photo '
+            'thumbnails (left over by a restart, or all of them when FACE_ENROLL_BACKGROUND is off)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Also retry enrollments that failed (not the ones held as duplicates)")
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new pending students')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between polls with --loop (default 5)')
+
+    def handle(self, *args, **opts):
+        if opts['retry_failed']:
+            updated = Student.objects.filter(face_status='failed', face_enrolled=True).update(
+                face_status='pending', face_error='')
+            self.stdout.write(f'{updated} failed enrollments queued again')
+
+        signal.signal(signal.SIGTERM, _stop)
+
+        counts, thumbnails = {}, 0
+        unreadable = set()  # photos without thumbnails are retried once per run, not once per poll
+        started = time.monotonic()
+        try:
+            while True:
+                photos = list(Student.objects.exclude(photo='').exclude(photo__isnull=True)
+                              .filter(photo_hash='').exclude(pk__in=unreadable).values_list('pk', flat=True))
+                for pk in photos:
+                    key = make_thumbnails(pk)
+                    thumbnails += bool(key)
+                    if key == '':
+                        unreadable.add(pk)
+                        self.stdout.write(self.style.WARNING(f'  student {pk}: photo unreadable, no thumbnails'))
+                pending = list(Student.objects.filter(face_status='pending').order_by('pk')
+                               .values_list('pk', flat=True))
+                for pk in pending:
+                    status = process(pk)
+                    if status:
+                        counts[status] = counts.get(status, 0) + 1
+                        self.stdout.write(f'  student {pk}: {status}')
+                if not opts['loop']:
+                    break
+                time.sleep(opts['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        done = sum(counts.values())
+        elapsed = time.monotonic() - started
+        summary = ', '.join(f'{n} {status}' for status, n in sorted(counts.items())) or 'nothing pending'
+        self.stdout.write(self.style.SUCCESS(f'✅ {done} enrollments processed in {elapsed:.1f}s ({summary}).'))
+        if thumbnails:
+            self.stdout.write(f'Thumbnails made for {thumbnails} photos')
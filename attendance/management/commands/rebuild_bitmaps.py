@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from attendance.bitmaps import rebuild_bitmaps
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-student, per-course attendance bitmaps from AttendanceRecord'
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_bitmaps()
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {count} attendance bitmaps.'))
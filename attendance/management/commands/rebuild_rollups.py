@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from attendance.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily attendance rollups used by HOD analytics'
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {count} daily rollup rows.'))
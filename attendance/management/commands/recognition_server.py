@@ -0,0 +1,78 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.embeddings import get_model_name
+from attendance.recognizer import RecognitionServer, parse_address
+from attendance.recognizer_client import RecognitionClient, RecognizerUnavailable
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt  # unwinds serve_forever() in this thread; shutdown() would deadlock
+
+
+class Command(BaseCommand):
+    help = ('Run the recognition server shared by all web workers: it owns the face model (in a '
+            'process pool), the section embedding index and the result cache. Point the web '
+            'workers at it with FACE_RECOGNIZER_ADDRESS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=None,
+                            help='unix:/path/to.sock or host:port (default FACE_RECOGNIZER_ADDRESS)')
+        parser.add_argument('--processes', type=int, default=2,
+                            help='Model processes (default 2; each loads its own model)')
+        parser.add_argument('--threads', type=int, default=None,
+                            help='Images in flight across all connections (default 4 per process)')
+        parser.add_argument('--no-warmup', action='store_true', help='Load the model on the first request instead')
+        parser.add_argument('--ping', action='store_true', help='Ask a running server for its status and exit')
+        parser.add_argument('--allow-remote', action='store_true',
+                            help='Listen on a non-loopback TCP address. The protocol is unauthenticated: '
+                                 'anyone who can connect can run recognition against any section, so only '
+                                 'do this on a private network behind a firewall')
+
+    def handle(self, *args, **opts):
+        address = opts['address'] or getattr(settings, 'FACE_RECOGNIZER_ADDRESS', '')
+        if not address:
+            raise CommandError('No address: pass --address or set FACE_RECOGNIZER_ADDRESS')
+        try:
+            parse_address(address)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if opts['ping']:
+            try:
+                status = RecognitionClient(address, timeout=5).ping()
+            except (OSError, RecognizerUnavailable) as e:
+                raise CommandError(f'No recognition server at {address}: {e}')
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {address}: {status['model']}, {status['processes']} process(es), "
+                f"{status['served']} images served (pid {status['pid']})"))
+            return
+
+        server = RecognitionServer(address, processes=max(opts['processes'], 1), threads=opts['threads'],
+                                   allow_remote=opts['allow_remote'])
+        try:
+            sock = server.start()
+        except PermissionError as e:
+            server.close()
+            raise CommandError(f'{e} (--allow-remote)')
+        except OSError as e:
+            server.close()
+            raise CommandError(f'Cannot listen on {address}: {e}')
+        signal.signal(signal.SIGTERM, _stop)
+        try:
+            if not opts['no_warmup']:
+                started = time.monotonic()
+                self.stdout.write(f'Loading {get_model_name()} in {server.processes} process(es)…')
+                server.warm_up()
+                self.stdout.write(f'  ready in {time.monotonic() - started:.1f}s')
+            self.stdout.write(self.style.SUCCESS(f'✅ Recognition server listening on {address}'))
+            sock.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.server_close()
+            server.close()
+            self.stdout.write(f'Stopped after {server.served} images.')
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from attendance.embeddings import get_model_name
+from attendance.models import EmbeddingVersion, ThresholdCalibration
+from attendance.reembed import build, activate
+
+
+class Command(BaseCommand):
+    help = ('Re-embed every enrolled photo with another recognition model next to the active store, '
+            'then swap it in atomically (recognition keeps serving from the old store meanwhile)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help='Model to build, e.g. Facenet512')
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Embedding processes (default 2; each loads its own model)')
+        parser.add_argument('--batch', type=int, default=50,
+                            help='Embeddings written per checkpoint (default 50)')
+        parser.add_argument('--max-failures', type=int, default=0,
+                            help='Photos allowed to fail before the swap is refused (default 0)')
+        parser.add_argument('--no-activate', action='store_true',
+                            help='Build the store but leave the active one in place')
+        parser.add_argument('--activate-only', action='store_true',
+                            help='Swap in an already built (or retired) store, e.g. to roll back')
+        parser.add_argument('--status', action='store_true', help='List the embedding stores and exit')
+
+    def handle(self, *args, **opts):
+        if opts['status']:
+            self.stdout.write(f'Active model: {get_model_name()}')
+            for v in EmbeddingVersion.objects.order_by('-started_at'):
+                self.stdout.write(f'  {v.model_name:<16} {v.status:<9} {v.done}/{v.total} embedded, '
+                                  f'{v.failed} failed, finished {v.finished_at or "—"}')
+            return
+
+        model = opts['model']
+        if not model:
+            raise CommandError('--model is required')
+
+        if not opts['activate_only']:
+            self.stdout.write(f'Building {model} embeddings next to the active {get_model_name()} store…')
+            version = build(model, workers=max(opts['workers'], 1), batch_size=max(opts['batch'], 1),
+                            progress=self._progress)
+            self.stdout.write(f'{model}: {version.done}/{version.total} embedded, {version.failed} failed')
+            if opts['no_activate']:
+                self.stdout.write(self.style.SUCCESS(f'✅ {model} store is {version.status}; '
+                                                     f'swap it in with --activate-only.'))
+                return
+            if version.failed > opts['max_failures']:
+                raise CommandError(f'{version.failed} photos failed (limit {opts["max_failures"]}); '
+                                   f'the active store was left in place. Fix them and re-run, '
+                                   f'or raise --max-failures.')
+
+        try:
+            activate(model)
+        except EmbeddingVersion.DoesNotExist:
+            raise CommandError(f'No {model} store has been built')
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'✅ {model} is now the active embedding store.'))
+        if not ThresholdCalibration.objects.filter(model_name=model).exists():
+            self.stdout.write(self.style.WARNING(
+                f'No calibrated threshold for {model}; run `manage.py calibrate_thresholds --model {model}`.'))
+
+    def _progress(self, version, rate):
+        left = version.total - version.done - version.failed
+        eta = f'{left / rate:.0f}s' if rate else '—'
+        pct = (version.done + version.failed) / version.total * 100 if version.total else 100
+        self.stdout.write(f'  {version.done + version.failed}/{version.total} ({pct:.1f}%) · '
+                          f'{rate:.1f} photos/s · ETA {eta} · {version.failed} failed')
@@ -0,0 +1,59 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from attendance.digests import dispatch, queue_lag
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = ('Email parents one digest per day of their children\'s absences, over one pooled SMTP connection. '
+            'Try it locally with `python -m aiosmtpd -n -l localhost:1025` (pip install aiosmtpd).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sending whatever became due every --interval seconds')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between runs with --loop (default NOTIFY_DIGEST_INTERVAL)')
+        parser.add_argument('--include-today', action='store_true',
+                            help='Also send the absences recorded since the last NOTIFY_DIGEST_TIME')
+        parser.add_argument('--limit', type=int, default=None, help='Digests sent per run at most')
+        parser.add_argument('--dry-run', action='store_true', help='Build the digests without sending them')
+
+    def handle(self, *args, **opts):
+        interval = opts['interval'] or getattr(settings, 'NOTIFY_DIGEST_INTERVAL', 300)
+        signal.signal(signal.SIGTERM, _stop)
+        try:
+            while True:
+                self._run(opts)
+                if not opts['loop']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
+
+    def _run(self, opts):
+        queued, oldest = queue_lag()
+        self.stdout.write(f'{queued} absences queued, oldest recorded {oldest:.1f}h ago; '
+                          f'sending to {getattr(settings, "EMAIL_HOST", "localhost")}:'
+                          f'{getattr(settings, "EMAIL_PORT", 25)}…')
+        stats = dispatch(include_today=opts['include_today'], limit=opts['limit'],
+                         dry_run=opts['dry_run'], progress=self._progress)
+        verb = 'built' if opts['dry_run'] else 'sent'
+        self.stdout.write(f"{stats['sent']} digests {verb} ({stats['notifications']} absences) in "
+                          f"{stats['seconds']:.2f}s · {stats['per_second']:.1f} emails/s · "
+                          f"lag max {stats['max_lag_hours']:.1f}h, mean {stats['mean_lag_hours']:.1f}h · "
+                          f"{stats['reconnects']} reconnects")
+        if stats['failed'] or stats['refused']:
+            self.stdout.write(self.style.WARNING(
+                f"{stats['failed']} digests failed (kept for the next run), {stats['refused']} refused by the server."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Digests {verb}.'))
+
+    def _progress(self, stats):
+        self.stdout.write(f"  {stats['sent']} digests · {stats['sent'] / max(stats['seconds'], 1e-6):.1f} emails/s")
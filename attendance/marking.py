@@ -0,0 +1,40 @@
+"""
+Direct (unbuffered) attendance writes shared by the recognition views and
+the ingestion commands. Webcam marks go through coalescer.py instead.
+"""
+from django.db import transaction
+
+from .coalescer import coalescer
+from .models import AttendanceRecord
+
+
+def ensure_records(session, students):
+    """Create the missing (absent) records of the roster students in one write."""
+    existing = set(AttendanceRecord.objects.filter(session=session).values_list('student_id', flat=True))
+    missing = [AttendanceRecord(session=session, student_id=s['id'], status='absent')
+               for s in students if s['id'] not in existing]
+    if missing:
+        AttendanceRecord.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def apply_face_matches(session, recognized):
+    """Mark {student_id: confidence} present in one write; returns the newly marked students."""
+    coalescer.flush(session.pk)
+    records = AttendanceRecord.objects.filter(
+        session=session, student_id__in=list(recognized)
+    ).exclude(status='present').select_related('student')
+
+    newly_marked = []
+    for record in records:
+        record.status = 'present'
+        record.method = 'face'
+        record.face_confidence = recognized[record.student_id]
+        newly_marked.append({
+            'student_id': record.student_id,
+            'name': record.student.name,
+            'roll': record.student.roll_number,
+            'confidence': record.face_confidence
+        })
+    with transaction.atomic():
+        AttendanceRecord.objects.bulk_update(records, ['status', 'method', 'face_confidence'])
+    return newly_marked
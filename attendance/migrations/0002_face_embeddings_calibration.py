@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_student_courses'),
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThresholdCalibration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50)),
+                ('distance_metric', models.CharField(max_length=20)),
+                ('section', models.CharField(blank=True, max_length=10)),
+                ('threshold', models.FloatField()),
+                ('target_far', models.FloatField()),
+                ('achieved_far', models.FloatField()),
+                ('frr', models.FloatField(blank=True, null=True)),
+                ('genuine_pairs', models.IntegerField(default=0)),
+                ('impostor_pairs', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.department')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FaceEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50)),
+                ('photo_name', models.CharField(max_length=255)),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.student')),
+            ],
+            options={
+                'unique_together': {('student', 'model_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_student_courses'),
+        ('attendance', '0002_face_embeddings_calibration'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['date', 'start_time', 'id'], name='attendance__date_53ccec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['student', 'sent_at', 'id'], name='attendance__student_9faacc_idx'),
+        ),
+    ]
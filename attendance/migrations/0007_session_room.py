@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_student_courses'),
+        ('attendance', '0006_embedding_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancesession',
+            name='room',
+            field=models.CharField(blank=True, default='', help_text='Classroom whose fixed camera (FACE_CAMERAS) marks this session', max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['room', 'date'], name='attendance__room_b2277c_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_student_face_status'),
+        ('attendance', '0007_session_room'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='email_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['emailed_at', 'sent_at'], name='attendance__emailed_d112b3_idx'),
+        ),
+    ]
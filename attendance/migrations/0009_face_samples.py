@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_student_photo_hash'),
+        ('attendance', '0008_notification_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50)),
+                ('source', models.CharField(max_length=255)),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.student')),
+            ],
+            options={
+                'unique_together': {('student', 'model_name', 'source')},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:05
+
+import numpy as np
+from django.db import migrations, models
+
+
+def build_bitmaps(apps, schema_editor):
+    """
+    (Re)build every attendance bitmap from the records, with session ids, so
+    history shows up right after deploy instead of after `rebuild_bitmaps`.
+    """
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceBitmap = apps.get_model('attendance', 'AttendanceBitmap')
+
+    def bitmap(key, rows):
+        return AttendanceBitmap(
+            student_id=key[0], course_id=key[1], sessions=len(rows),
+            days=np.array([d.toordinal() for _, d, _ in rows], dtype=np.int32).tobytes(),
+            session_ids=np.array([pk for pk, _, _ in rows], dtype=np.int64).tobytes(),
+            present=np.packbits(np.array([s == 'present' for _, _, s in rows], dtype=bool)).tobytes(),
+            late=np.packbits(np.array([s == 'late' for _, _, s in rows], dtype=bool)).tobytes(),
+        )
+
+    AttendanceBitmap.objects.all().delete()
+    batch, key, rows = [], None, []
+    records = AttendanceRecord.objects.filter(session__is_active=False).values_list(
+        'student_id', 'session__course_id', 'session_id', 'session__date', 'status'
+    ).order_by('student_id', 'session__course_id', 'session__date', 'session__start_time', 'session_id')
+    for student_id, course_id, session_id, day, status in records.iterator(chunk_size=5000):
+        if (student_id, course_id) != key:
+            if rows:
+                batch.append(bitmap(key, rows))
+            key, rows = (student_id, course_id), []
+        rows.append((session_id, day, status))
+        if len(batch) >= 500:
+            AttendanceBitmap.objects.bulk_create(batch)
+            batch = []
+    if rows:
+        batch.append(bitmap(key, rows))
+    AttendanceBitmap.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_face_samples'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancebitmap',
+            name='session_ids',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_student_photo_hash'),
+        ('attendance', '0010_bitmap_session_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=10)),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.department')),
+            ],
+            options={
+                'unique_together': {('department', 'section')},
+            },
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from accounts.models import Student, Faculty, Course
+from accounts.models import Student, Faculty, Course, Department
 
 
 class AttendanceSession(models.Model):
@@ -12,8 +12,14 @@ class AttendanceSession(models.Model):
     is_active = models.BooleanField(default=True)
     mode = models.CharField(max_length=20, default='manual',
                             choices=[('manual', 'Manual'), ('face', 'Face Recognition'), ('both', 'Both')])
+    room = models.CharField(max_length=30, blank=True, default='',
+                            help_text='Classroom whose fixed camera (FACE_CAMERAS) marks this session')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['date', 'start_time', 'id']),
+                   models.Index(fields=['room', 'date'])]
+
     def __str__(self):
         return f"{self.course.code} | {self.date} | Sec-{self.section}"
 
@@ -35,6 +41,19 @@ class AttendanceSession(models.Model):
             return 0
         return round(self.present_count() / total * 100, 1)
 
+    def status_counts(self):
+        """All the counts above (plus face/manual marked) in one aggregate query."""
+        counts = self.attendancerecord_set.aggregate(
+            total=models.Count('id'),
+            present=models.Count('id', filter=models.Q(status='present')),
+            absent=models.Count('id', filter=models.Q(status='absent')),
+            late=models.Count('id', filter=models.Q(status='late')),
+            face_marked=models.Count('id', filter=models.Q(method='face')),
+            manual_marked=models.Count('id', filter=models.Q(method='manual')),
+        )
+        counts['percentage'] = round(counts['present'] / counts['total'] * 100, 1) if counts['total'] else 0
+        return counts
+
 
 class AttendanceRecord(models.Model):
     STATUS = [('present', 'Present'), ('absent', 'Absent'), ('late', 'Late')]
@@ -61,6 +80,145 @@ class Notification(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
     notif_type = models.CharField(max_length=30, default='absence')
+    # parent email digest (attendance/digests.py): null until sent
+    emailed_at = models.DateTimeField(null=True, blank=True)
+    email_error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['student', 'sent_at', 'id']),
+                   models.Index(fields=['emailed_at', 'sent_at'])]
 
     def __str__(self):
         return f"→ {self.student.name}: {self.message[:40]}"
+
+
+class FaceEmbedding(models.Model):
+    """Embedding of a student's enrolled photo, computed once per model."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    model_name = models.CharField(max_length=50)
+    photo_name = models.CharField(max_length=255)
+    vector = models.BinaryField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'model_name')
+
+    def __str__(self):
+        return f"{self.student.roll_number} | {self.model_name}"
+
+
+class FaceSample(models.Model):
+    """
+    Embedding of an extra photo of an enrolled student (`calibrate_thresholds
+    --genuine-dir`), used only for the genuine distances of threshold calibration.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    model_name = models.CharField(max_length=50)
+    source = models.CharField(max_length=255)
+    vector = models.BinaryField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'model_name', 'source')
+
+    def __str__(self):
+        return f"{self.student.roll_number} | {self.model_name} | {self.source}"
+
+
+class ThresholdCalibration(models.Model):
+    """Distance threshold suggested by calibrate_thresholds for one model (and optionally one section)."""
+    model_name = models.CharField(max_length=50)
+    distance_metric = models.CharField(max_length=20)
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True)
+    section = models.CharField(max_length=10, blank=True)
+    threshold = models.FloatField()
+    target_far = models.FloatField()
+    achieved_far = models.FloatField()
+    frr = models.FloatField(null=True, blank=True)
+    genuine_pairs = models.IntegerField(default=0)
+    impostor_pairs = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        scope = f"{self.department.code}-{self.section}" if self.department_id else 'global'
+        return f"{self.model_name} | {scope} | {self.threshold:.4f}"
+
+
+class DailyRollup(models.Model):
+    """Per-day attendance totals of one course section, kept current when sessions are finalized."""
+    department = models.ForeignKey(Department, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    section = models.CharField(max_length=10)
+    date = models.DateField()
+    present = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('course', 'section', 'date')
+        indexes = [models.Index(fields=['department', 'date'])]
+
+    def __str__(self):
+        return f"{self.course.code} | Sec-{self.section} | {self.date}"
+
+
+class AttendanceBitmap(models.Model):
+    """
+    Attendance history of one student in one course, one bit per session in
+    chronological order. `days` holds each session's date ordinal (int32),
+    `session_ids` its id (int64).
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    sessions = models.IntegerField(default=0)
+    days = models.BinaryField()
+    session_ids = models.BinaryField(default=b'')
+    present = models.BinaryField()
+    late = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'course')
+
+    def __str__(self):
+        return f"{self.student.roll_number} | {self.course.code} | {self.sessions} sessions"
+
+
+class EmbeddingVersion(models.Model):
+    """
+    One embedding store (all FaceEmbedding rows of a model). Exactly one is
+    'active' and serves recognition; `manage.py reembed` builds another next
+    to it and swaps it in once complete.
+    """
+    STATUS = [('building', 'Building'), ('ready', 'Ready'), ('active', 'Active'), ('retired', 'Retired')]
+
+    model_name = models.CharField(max_length=50, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS, default='building')
+    total = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    activated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.model_name} ({self.status}) {self.done}/{self.total}"
+
+
+class RosterRevision(models.Model):
+    """
+    Change counter of one (department, section) roster. Cached rosters are
+    keyed by it, so a change made in any process (web worker, enrollment
+    worker, re-embed) retires every process's cached copy.
+    """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True)
+    section = models.CharField(max_length=10)
+    revision = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('department', 'section')
+
+    def __str__(self):
+        return f"{self.department_id} | Sec-{self.section} | r{self.revision}"
@@ -0,0 +1,177 @@
+"""
+Image ingestion for face recognition.
+Uploads are read with a size cap, decoded at reduced resolution for
+detection (cv2.IMREAD_REDUCED_*), EXIF-oriented, and only the detected face
+regions are re-decoded at the resolution the embedding model needs.
+"""
+import io
+import numpy as np
+from django.conf import settings
+
+_REDUCTIONS = (8, 4, 2, 1)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')  # file names worth decoding
+
+
+class ImageRejected(ValueError):
+    """Upload refused before decoding; `status` is the HTTP code to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+    def __reduce__(self):
+        # keep `status` when raised in a worker process
+        return type(self), (str(self), self.status)
+
+
+def _limit(name, default):
+    return getattr(settings, name, default)
+
+
+def read_upload(uploaded_file):
+    """Stream an UploadedFile into memory, refusing it once it exceeds FACE_UPLOAD_MAX_BYTES."""
+    max_bytes = _limit('FACE_UPLOAD_MAX_BYTES', 25 * 1024 * 1024)
+    if uploaded_file.size and uploaded_file.size > max_bytes:
+        raise ImageRejected(f'Photo exceeds {max_bytes // (1024 * 1024)} MB', status=413)
+    buf = bytearray()
+    for chunk in uploaded_file.chunks():
+        buf.extend(chunk)
+        if len(buf) > max_bytes:
+            raise ImageRejected(f'Photo exceeds {max_bytes // (1024 * 1024)} MB', status=413)
+    return bytes(buf)
+
+
+def read_body(request):
+    """
+    Read a raw image request body (Content-Type image/*) into one buffer
+    sized from Content-Length, refusing it above FACE_UPLOAD_MAX_BYTES.
+    """
+    max_bytes = _limit('FACE_UPLOAD_MAX_BYTES', 25 * 1024 * 1024)
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        raise ImageRejected('Bad Content-Length')
+    if length > max_bytes:
+        raise ImageRejected(f'Photo exceeds {max_bytes // (1024 * 1024)} MB', status=413)
+    buf = bytearray(length)
+    view, got = memoryview(buf), 0
+    while got < length:
+        chunk = request.read(min(length - got, 64 * 1024))
+        if not chunk:
+            raise ImageRejected('Incomplete image upload')
+        view[got:got + len(chunk)] = chunk
+        got += len(chunk)
+    return buf
+
+
+def _read_header(data):
+    """(width, height, exif orientation) from the image header, without decoding pixels."""
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            return im.width, im.height, im.getexif().get(0x0112, 1)
+    except Image.DecompressionBombError:
+        # PIL refuses headers past twice its own pixel limit before FACE_UPLOAD_MAX_PIXELS is checked
+        raise ImageRejected('Photo has too many pixels', status=413)
+    except Exception:
+        raise ImageRejected('Unreadable image')
+
+
+def _orient(img, orientation):
+    import cv2
+    if orientation == 2:
+        return cv2.flip(img, 1)
+    if orientation == 3:
+        return cv2.rotate(img, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(img, 0)
+    if orientation == 5:
+        return cv2.transpose(img)
+    if orientation == 6:
+        return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(img), -1)
+    if orientation == 8:
+        return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return img
+
+
+class PreparedImage:
+    """
+    A decoded capture: `image` is the oriented detection-size BGR array,
+    and face_crops() goes back to the source bytes for sharper face regions.
+    """
+
+    def __init__(self, data):
+        max_pixels = _limit('FACE_UPLOAD_MAX_PIXELS', 60_000_000)
+        max_edge = _limit('FACE_DETECTION_MAX_EDGE', 1600)
+
+        self.data = data
+        self.width, self.height, self.orientation = _read_header(data)
+        if self.width * self.height > max_pixels:
+            raise ImageRejected(f'Photo exceeds {max_pixels // 1_000_000} MP', status=413)
+
+        self.image = self.decode_at_most(max_edge)
+        if self.image is None:
+            raise ImageRejected('Unreadable image')
+
+    def decode_at_most(self, max_edge):
+        """Oriented BGR decode whose long edge is capped at `max_edge`."""
+        import cv2
+        long_edge = max(self.width, self.height)
+        factor = next(r for r in _REDUCTIONS if r == 1 or long_edge / r >= max_edge)
+        img = self._decode(factor)
+        if img is not None and max(img.shape[:2]) > max_edge:
+            scale = max_edge / max(img.shape[:2])
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return img
+
+    def _decode(self, factor):
+        import cv2
+        flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[factor]
+        img = cv2.imdecode(np.frombuffer(self.data, np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        return None if img is None else _orient(img, self.orientation)
+
+    @property
+    def scale(self):
+        """Detection-image pixels per source pixel."""
+        return max(self.image.shape[:2]) / max(self.width, self.height)
+
+    def face_crops(self, areas, margin=0.15):
+        """
+        Crop each facial_area (detection-image coords) from an image decoded
+        just sharp enough that the smallest face has FACE_CROP_MIN_SIDE pixels.
+        """
+        if not areas:
+            return []
+        min_side = _limit('FACE_CROP_MIN_SIDE', 160)
+        smallest = min(min(a['w'], a['h']) for a in areas) or 1
+        source_side = smallest / self.scale
+
+        if smallest >= min_side:
+            img = self.image
+        else:
+            factor = next(r for r in _REDUCTIONS if r == 1 or source_side / r >= min_side)
+            img = self._decode(factor)
+        fy = img.shape[0] / self.image.shape[0]
+        fx = img.shape[1] / self.image.shape[1]
+
+        crops = []
+        for a in areas:
+            mx, my = a['w'] * margin, a['h'] * margin
+            x0 = max(int((a['x'] - mx) * fx), 0)
+            y0 = max(int((a['y'] - my) * fy), 0)
+            x1 = min(int((a['x'] + a['w'] + mx) * fx), img.shape[1])
+            y1 = min(int((a['y'] + a['h'] + my) * fy), img.shape[0])
+            crops.append(img[y0:y1, x0:x1].copy())
+        return crops
+
+
+def prepare_upload(uploaded_file):
+    return PreparedImage(read_upload(uploaded_file))
+
+
+def prepare_path(path):
+    with open(path, 'rb') as f:
+        return PreparedImage(f.read())
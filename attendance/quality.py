@@ -0,0 +1,143 @@
+"""
+Face quality gate.
+Cheap measures of a face crop — sharpness (variance of the Laplacian at a
+fixed size), face size, brightness and, when the detector returned eye and
+nose landmarks, head pose. Recognition drops crops that fail them before
+the expensive embedding step; enrollment rejects reference photos that fail
+them (with stricter size limits), since a bad reference costs a rescan on
+every session afterwards.
+"""
+import math
+
+from django.conf import settings
+
+_SIDE = 112  # faces are measured at this size, so sharpness does not depend on resolution
+
+
+def _gray(img):
+    import cv2
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def _point(value):
+    if value is None or len(value) < 2:
+        return None
+    return float(value[0]), float(value[1])
+
+
+def head_pose(area):
+    """
+    (yaw, roll) from a facial area's landmarks, or None without both eyes.
+    Yaw is the nose's horizontal offset from the eyes' midpoint (the box
+    centre without a nose landmark) as a fraction of the eye distance; roll
+    the tilt of the eye line in degrees.
+    """
+    left, right = _point(area.get('left_eye')), _point(area.get('right_eye'))
+    if not left or not right:
+        return None
+    dx, dy = right[0] - left[0], right[1] - left[1]
+    distance = math.hypot(dx, dy)
+    if not distance:
+        return None
+    roll = abs(math.degrees(math.atan2(dy, dx)))
+    roll = min(roll, 180 - roll)  # the detector may name the eyes from either side
+    middle = (left[0] + right[0]) / 2
+    nose = _point(area.get('nose'))
+    if nose:
+        yaw = abs(nose[0] - middle) / distance
+    else:
+        yaw = abs(middle - (area['x'] + area['w'] / 2)) / distance
+    return yaw, roll
+
+
+def _face_region(crop, area, shape, margin):
+    """The facial area inside a face_crops() crop, whose margin may have been clipped at the image edges."""
+    mx, my = area['w'] * margin, area['h'] * margin
+    x0, y0 = max(area['x'] - mx, 0), max(area['y'] - my, 0)
+    x1 = min(area['x'] + area['w'] + mx, shape[1])
+    y1 = min(area['y'] + area['h'] + my, shape[0])
+    if x1 <= x0 or y1 <= y0:
+        return crop[:0, :0]
+    fx, fy = crop.shape[1] / (x1 - x0), crop.shape[0] / (y1 - y0)
+    return crop[int((area['y'] - y0) * fy):int((area['y'] + area['h'] - y0) * fy),
+                int((area['x'] - x0) * fx):int((area['x'] + area['w'] - x0) * fx)]
+
+
+def measure(crop, area, prepared, margin=0.15):
+    """
+    Quality measures of a face crop cut by prepared.face_crops() for the
+    facial area: {'side' (source pixels), 'sharpness', 'brightness', 'yaw',
+    'roll'}; yaw and roll are None without landmarks.
+    """
+    import cv2
+
+    face = _gray(_face_region(crop, area, prepared.image.shape, margin))
+    pose = head_pose(area)
+    side = int(min(area['w'], area['h']) / prepared.scale)
+    if not face.size:
+        return {'side': side, 'sharpness': 0.0, 'brightness': 0.0, 'yaw': None, 'roll': None}
+    small = cv2.resize(face, (_SIDE, _SIDE), interpolation=cv2.INTER_AREA)
+    return {
+        'side': side,
+        'sharpness': float(cv2.Laplacian(small, cv2.CV_64F).var()),
+        'brightness': float(small.mean()),
+        'yaw': pose[0] if pose else None,
+        'roll': pose[1] if pose else None,
+    }
+
+
+def problems(measures, min_side=None):
+    """Human-readable reasons the measured face is unusable ([] when it passes)."""
+    min_side = min_side or getattr(settings, 'FACE_QUALITY_MIN_SIDE', 40)
+    low, high = getattr(settings, 'FACE_QUALITY_BRIGHTNESS', (40, 220))
+    found = []
+    if measures['side'] < min_side:
+        found.append(f"face too small ({measures['side']}px, need {min_side}px)")
+    if measures['sharpness'] < getattr(settings, 'FACE_QUALITY_MIN_SHARPNESS', 25.0):
+        found.append('too blurry')
+    if measures['brightness'] < low:
+        found.append('too dark')
+    elif measures['brightness'] > high:
+        found.append('overexposed')
+    if measures['yaw'] is not None and measures['yaw'] > getattr(settings, 'FACE_QUALITY_MAX_YAW', 0.35):
+        found.append('face turned sideways')
+    if measures['roll'] is not None and measures['roll'] > getattr(settings, 'FACE_QUALITY_MAX_ROLL', 25):
+        found.append('head tilted')
+    return found
+
+
+def passes(crop, area, prepared):
+    """Whether a recognition crop is worth embedding (always True with FACE_QUALITY_GATE off)."""
+    if not getattr(settings, 'FACE_QUALITY_GATE', True):
+        return True
+    return not problems(measure(crop, area, prepared))
+
+
+def photo_problems(data):
+    """
+    Reasons the image bytes are unusable as an enrollment photo: exactly one
+    clear, frontal face of at least FACE_QUALITY_ENROLL_MIN_SIDE pixels.
+    [] when it passes, or when no face detector is installed to tell.
+    """
+    from .face_utils import detect_faces, detector_available
+    from .preprocess import ImageRejected, PreparedImage
+
+    if not detector_available():
+        return []
+    try:
+        prepared = PreparedImage(bytes(data))
+    except ImageRejected as e:
+        return [str(e)]
+    # enforce_detection=False reports the whole image with confidence 0 when it finds no face
+    areas = [f['facial_area'] for f in detect_faces(prepared.image) if f.get('facial_area') and f.get('confidence')]
+    if not areas:
+        return ['no face found']
+    areas.sort(key=lambda a: a['w'] * a['h'], reverse=True)
+    largest = areas[0]['w'] * areas[0]['h']
+    # a small face in the background is fine; a second face of similar size is not
+    if len(areas) > 1 and areas[1]['w'] * areas[1]['h'] >= largest / 4:
+        return [f'{len(areas)} faces in the photo']
+    crop = prepared.face_crops(areas[:1])[0]
+    return problems(measure(crop, areas[0], prepared),
+                    min_side=getattr(settings, 'FACE_QUALITY_ENROLL_MIN_SIDE', 112))
+
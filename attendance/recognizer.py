@@ -0,0 +1,414 @@
+"""
+Standalone recognition server shared by all web workers.
+`manage.py recognition_server` runs one per host: it owns the face model
+(in a process pool, one copy per worker process), the per-section embedding
+index and the result cache, so web workers stay small and the model is
+loaded once instead of once per worker. Webcam frames and uploads are
+recognized here, batch photos and video frames detected and embedded here,
+and new enrollment photos embedded here. attendance/recognizer_client.py is
+the web side.
+
+Wire format (both directions): a fixed header
+    magic 'SA' · version u8 · op u8 · request id u32 · meta length u16 · payload length u32
+followed by `meta` (compact JSON) and the raw payload. A RECOGNIZE request
+carries a batch: meta {'items': [{dept, section, model, version, threshold,
+tiled, size}, ...]} with the image bytes concatenated in the payload; the
+reply has meta {'items': [{n, cached, rejected} | {error, status?}, ...]} and the
+matches packed as (student id u32, confidence f32) records.
+
+One image per request:
+    DETECT  meta {model, tiled} → {areas}
+    EMBED   meta {model, tiled} → {n, dim, rejected, cached} + n float32 vectors
+            meta {model, areas} → {n, dim, index} + a vector per embedded area
+    ENROLL  meta {student, check_duplicates} → {queued}, answered before the job runs
+
+The protocol has no authentication: anyone who can connect can read any
+section's roster matches and make the server run the model. It listens on a
+unix socket (0660, so only the web workers' user and group) or a loopback
+TCP port; other TCP addresses need allow_remote and a private network.
+
+Model imports stay inside functions: pool workers may be spawned (Windows)
+and import this module before Django is set up.
+"""
+import ipaddress
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MAGIC = b'SA'
+PROTOCOL_VERSION = 1
+OP_PING, OP_RECOGNIZE, OP_DETECT, OP_EMBED, OP_ENROLL, OP_ERROR = 1, 2, 3, 4, 5, 255
+HEADER = struct.Struct('>2sBBIHI')
+MATCH = struct.Struct('>If')
+MAX_PAYLOAD = 256 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class ProtocolError(ConnectionError):
+    pass
+
+
+# ── wire format ──────────────────────────────────────────────────────────────
+
+def parse_address(address):
+    """'unix:/path/to.sock' → (AF_UNIX, path); 'host:port' → (AF_INET, (host, port))."""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[5:]
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f'Bad recognizer address {address!r}; use unix:/path or host:port')
+    return socket.AF_INET, (host, int(port))
+
+
+def is_local(address):
+    """True for a unix socket or a TCP address on a loopback interface."""
+    family, target = parse_address(address)
+    if family == socket.AF_UNIX:
+        return True
+    try:
+        infos = socket.getaddrinfo(target[0], target[1], type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0]).is_loopback for info in infos)
+
+
+def send_frame(sock, op, request_id, meta, payload=b''):
+    meta = json.dumps(meta, separators=(',', ':')).encode()
+    sock.sendall(HEADER.pack(MAGIC, PROTOCOL_VERSION, op, request_id, len(meta), len(payload)) + meta)
+    if payload:
+        sock.sendall(payload)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view, got = memoryview(buf), 0
+    while got < n:
+        chunk = sock.recv_into(view[got:], n - got)
+        if not chunk:
+            raise ConnectionError('Connection closed mid-frame')
+        got += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock):
+    """(op, request id, meta, payload), or None when the peer closed the connection between frames."""
+    first = sock.recv(HEADER.size)
+    if not first:
+        return None
+    head = first if len(first) == HEADER.size else first + _recv_exact(sock, HEADER.size - len(first))
+    magic, version, op, request_id, meta_len, payload_len = HEADER.unpack(head)
+    if magic != MAGIC or version != PROTOCOL_VERSION:
+        raise ProtocolError('Not a recognition server frame (or protocol version mismatch)')
+    if payload_len > MAX_PAYLOAD:
+        raise ProtocolError(f'Payload of {payload_len} bytes exceeds the limit')
+    meta = json.loads(_recv_exact(sock, meta_len)) if meta_len else {}
+    payload = _recv_exact(sock, payload_len) if payload_len else b''
+    return op, request_id, meta, payload
+
+
+def pack_matches(recognized):
+    return b''.join(MATCH.pack(sid, conf) for sid, conf in recognized.items())
+
+
+def unpack_matches(data, offset, n):
+    """{student_id: confidence} from n records at offset; confidences rounded as the views report them."""
+    return {sid: round(conf, 1) for sid, conf in
+            (MATCH.unpack_from(data, offset + i * MATCH.size) for i in range(n))}
+
+
+# ── server ───────────────────────────────────────────────────────────────────
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _detect_and_embed(data, tiled):
+    from .result_cache import detect_and_embed
+    return detect_and_embed(data, tiled)
+
+
+def _build_roster(department_id, section):
+    """In a pool worker: embedding missing photos runs the model, which the server process never loads."""
+    from django.db import close_old_connections
+    from .roster import build_roster
+
+    close_old_connections()
+    try:
+        return build_roster(department_id, section)
+    finally:
+        close_old_connections()
+
+
+def _plain(value):
+    """JSON-safe copy of a facial area: detectors hand back numpy scalars and tuples."""
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value.tolist() if hasattr(value, 'tolist') else value
+
+
+def _detect(data, tiled):
+    from .face_utils import detect_face_areas
+    from .preprocess import PreparedImage
+
+    return [_plain(area) for area in detect_face_areas(PreparedImage(data), tiled)]
+
+
+def _embed_areas(data, areas):
+    """Per area: its vector, or None when the quality gate or the model rejected it."""
+    from .face_utils import embed_areas
+    from .preprocess import PreparedImage
+
+    prepared = PreparedImage(data)
+    return [vectors[0] if vectors else None for vectors in (embed_areas(prepared, [area])[0] for area in areas)]
+
+
+def _enroll(student_id, check_duplicates):
+    from django.db import close_old_connections
+    from .enrollment import process
+
+    close_old_connections()
+    try:
+        return process(student_id, check_duplicates)
+    finally:
+        close_old_connections()
+
+
+def _log_enrollment(student_id, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Enrollment of student %s failed', student_id, exc_info=future.exception())
+
+
+class _Index:
+    """
+    Per-(department, section) rosters, rebuilt when a client reports a newer
+    version. Builds run through `build` (the process pool); concurrent misses
+    of one section wait for the same build.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.RLock()  # a build that is already done runs its callback right away
+        self._rosters = {}
+        self._building = {}
+
+    def get(self, department_id, section, version):
+        from .roster import roster_version
+
+        key = (department_id, section)
+        with self._lock:
+            roster = self._rosters.get(key)
+            if roster is not None and not (version and roster_version(roster) != version):
+                return roster
+            future = self._building.get(key)
+            if future is None:
+                future = self._building[key] = self._build(department_id, section)
+                future.add_done_callback(lambda f: self._done(key, f))
+        return future.result()
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._building.get(key) is future:
+                del self._building[key]
+                if future.exception() is None:
+                    self._rosters[key] = future.result()
+
+    def clear(self):
+        with self._lock:
+            self._rosters.clear()
+            self._building.clear()
+
+
+class RecognitionServer:
+    def __init__(self, address, processes=2, threads=None, allow_remote=False):
+        self.address = address
+        self.processes = processes
+        self.allow_remote = allow_remote
+        self.index = _Index(lambda department_id, section: self.pool.submit(_build_roster, department_id, section))
+        self.pool = None
+        # items of all open connections waiting for (or matching) a pool result
+        self.items = ThreadPoolExecutor(max_workers=threads or processes * 4,
+                                        thread_name_prefix='recognizer-item')
+        self.model = None
+        self.served = 0
+
+    def _compute(self, data, tiled):
+        return self.pool.submit(_detect_and_embed, data, tiled).result()
+
+    def _item(self, item, data):
+        from django.db import close_old_connections
+        from .embeddings import get_model_name
+        from .preprocess import ImageRejected
+        from .result_cache import recognition_cache
+
+        close_old_connections()
+        try:
+            model = get_model_name()
+            if model != self.model:
+                # the active embedding store was swapped (manage.py reembed)
+                self.model = model
+                self.index.clear()
+            if item.get('model') and item['model'] != model:
+                return {'error': f'Server recognizes with {model}, not {item["model"]}', 'status': 409}, b''
+            roster = self.index.get(item['dept'], item['section'], item.get('version'))
+            recognized, cached, rejected = recognition_cache.recognize(
+                data, roster, item['threshold'], tiled=item.get('tiled'), compute=self._compute)
+            return {'n': len(recognized), 'cached': cached, 'rejected': rejected}, pack_matches(recognized)
+        except ImageRejected as e:
+            return {'error': str(e), 'status': e.status}, b''
+        except Exception as e:
+            return {'error': f'{type(e).__name__}: {e}'}, b''
+        finally:
+            close_old_connections()
+
+    def recognize(self, meta, payload):
+        jobs, offset = [], 0
+        for item in meta.get('items', []):
+            size = item['size']
+            if offset + size > len(payload):
+                raise ProtocolError('Item sizes exceed the payload')
+            jobs.append(self.items.submit(self._item, item, payload[offset:offset + size]))
+            offset += size
+        results = [job.result() for job in jobs]
+        self.served += len(results)
+        return {'items': [r for r, _ in results]}, b''.join(m for _, m in results)
+
+    def faces(self, op, meta, payload):
+        """DETECT or EMBED one image (batch photos, video frames); the web side matches the vectors."""
+        import numpy as np
+        from django.db import close_old_connections
+        from .embeddings import get_model_name
+        from .preprocess import ImageRejected
+        from .result_cache import recognition_cache
+
+        close_old_connections()
+        try:
+            model = get_model_name()
+            if meta.get('model') and meta['model'] != model:
+                return {'error': f'Server recognizes with {model}, not {meta["model"]}', 'status': 409}, b''
+            if op == OP_DETECT:
+                return {'areas': self.pool.submit(_detect, payload, meta.get('tiled')).result()}, b''
+            if meta.get('areas') is not None:
+                embedded = self.pool.submit(_embed_areas, payload, meta['areas']).result()
+                index = [i for i, vector in enumerate(embedded) if vector is not None]
+                vectors, reply = [embedded[i] for i in index], {'index': index}
+            else:
+                _, entry, cached = recognition_cache.embeddings(payload, meta.get('tiled'), compute=self._compute)
+                vectors, reply = entry.vectors, {'rejected': entry.rejected, 'cached': cached}
+        except ImageRejected as e:
+            return {'error': str(e), 'status': e.status}, b''
+        except Exception as e:
+            return {'error': f'{type(e).__name__}: {e}'}, b''
+        finally:
+            close_old_connections()
+        self.served += 1
+        reply.update(n=len(vectors), dim=len(vectors[0]) if vectors else 0)
+        return reply, b''.join(np.asarray(v, dtype=np.float32).tobytes() for v in vectors)
+
+    def enroll(self, meta):
+        """Queue a pending student's enrollment in the pool and answer at once."""
+        student_id = meta['student']
+        future = self.pool.submit(_enroll, student_id, meta.get('check_duplicates', True))
+        future.add_done_callback(lambda f: _log_enrollment(student_id, f))
+        return {'queued': True}, b''
+
+    def dispatch(self, op, meta, payload):
+        from .embeddings import get_model_name
+
+        if op == OP_PING:
+            return {'ok': True, 'model': get_model_name(), 'processes': self.processes,
+                    'served': self.served, 'pid': os.getpid()}, b''
+        if op == OP_RECOGNIZE:
+            return self.recognize(meta, payload)
+        if op in (OP_DETECT, OP_EMBED):
+            return self.faces(op, meta, payload)
+        if op == OP_ENROLL:
+            return self.enroll(meta)
+        raise ProtocolError(f'Unknown op {op}')
+
+    def _server(self):
+        family, address = parse_address(self.address)
+        app = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        frame = recv_frame(self.request)
+                    except (ConnectionError, ProtocolError, OSError):
+                        return
+                    if frame is None:
+                        return
+                    op, request_id, meta, payload = frame
+                    try:
+                        reply_meta, reply = app.dispatch(op, meta, payload)
+                    except ProtocolError as e:
+                        send_frame(self.request, OP_ERROR, request_id, {'error': str(e)})
+                        return
+                    send_frame(self.request, op, request_id, reply_meta, reply)
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    probe.connect(address)
+                except OSError:
+                    os.unlink(address)  # stale socket of a previous run
+                else:
+                    raise OSError(f'Another recognition server is listening on {address}')
+                finally:
+                    probe.close()
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        server_class.daemon_threads = True
+        server_class.allow_reuse_address = True
+        server = server_class(address, Handler)
+        if family == socket.AF_UNIX:
+            os.chmod(address, 0o660)
+        return server
+
+    def start(self):
+        """Bind the socket and start the process pool; returns the socketserver to serve_forever()."""
+        from django.db import connections
+
+        if not self.allow_remote and not is_local(self.address):
+            raise PermissionError(f'{self.address} is not a unix socket or loopback address; the protocol has '
+                                  f'no authentication, so binding it needs allow_remote on a trusted network')
+
+        connections.close_all()  # forked workers must not share the parent's DB handles
+        self.pool = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'),))
+        return self._server()
+
+    def warm_up(self):
+        """Load the model in every pool process before the first request arrives."""
+        import cv2
+        import numpy as np
+
+        _, blank = cv2.imencode('.jpg', np.zeros((64, 64, 3), np.uint8))
+        jobs = [self.pool.submit(_detect_and_embed, blank.tobytes(), False) for _ in range(self.processes)]
+        for job in jobs:
+            try:
+                job.result()
+            except Exception:
+                pass
+
+    def close(self):
+        self.items.shutdown(wait=False)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)
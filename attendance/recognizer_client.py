@@ -0,0 +1,352 @@
+"""
+Web-worker side of the recognition server (attendance/recognizer.py).
+recognize() sends the image to the server at FACE_RECOGNIZER_ADDRESS and
+falls back to in-process recognition when none is configured, it cannot be
+reached or it does not answer within FACE_RECOGNIZER_TIMEOUT seconds.
+Concurrent requests of a worker's threads are batched: the first one waits
+FACE_RECOGNIZER_BATCH_WINDOW seconds for company and they travel as one
+frame, up to FACE_RECOGNIZER_BATCH_SIZE images.
+
+Batch photos (embed_image), video frames (ServerFaces) and enrollments
+(hand_off_enrollment) go one per request on a connection of their own, so a
+slow panorama does not hold up the webcam batches; they wait up to
+FACE_RECOGNIZER_JOB_TIMEOUT seconds and fall back the same way.
+"""
+import itertools
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from .recognizer import (OP_PING, OP_RECOGNIZE, OP_DETECT, OP_EMBED, OP_ENROLL, OP_ERROR,
+                         parse_address, recv_frame, send_frame, unpack_matches, MATCH)
+from .video import LocalFaces
+
+
+class RecognizerUnavailable(Exception):
+    pass
+
+
+class RecognitionClient:
+    def __init__(self, address, timeout=5.0, batch_window=0.005, batch_size=16, job_timeout=60.0):
+        self.address = address
+        self.timeout = timeout
+        self.job_timeout = job_timeout
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self._pending = queue.Queue()
+        self._sock = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._down_until = 0.0
+        self.batches = 0
+        self.fallbacks = 0
+
+    # ── connection ───────────────────────────────────────────────────────────
+
+    def _connect(self):
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _call(self, op, meta, payload=b''):
+        """One request/reply on the persistent connection, reconnecting once if it went stale."""
+        for attempt in (0, 1):
+            if self._sock is None:
+                self._sock = self._connect()
+            request_id = next(self._ids) & 0xFFFFFFFF
+            try:
+                send_frame(self._sock, op, request_id, meta, payload)
+                frame = recv_frame(self._sock)
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+                continue
+            if frame is None or frame[1] != request_id:
+                self._close()
+                if attempt:
+                    raise ConnectionError('Recognition server closed the connection')
+                continue
+            reply_op, _, reply_meta, reply = frame
+            if reply_op == OP_ERROR:
+                raise ConnectionError(reply_meta.get('error', 'Recognition server error'))
+            return reply_meta, reply
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def ping(self):
+        with self._lock:
+            meta, _ = self._call(OP_PING, {})
+        return meta
+
+    # ── single-image jobs ────────────────────────────────────────────────────
+
+    def _request(self, op, meta, payload=b''):
+        """One request on a connection of its own; raises RecognizerUnavailable or the item's error."""
+        if time.monotonic() < self._down_until:
+            raise RecognizerUnavailable('Recognition server was unreachable recently')
+        try:
+            sock = self._connect()
+        except OSError as e:
+            self._down_until = time.monotonic() + getattr(settings, 'FACE_RECOGNIZER_RETRY_INTERVAL', 10)
+            raise RecognizerUnavailable(str(e))
+        try:
+            sock.settimeout(self.job_timeout)
+            send_frame(sock, op, 0, meta, payload)
+            frame = recv_frame(sock)
+        except OSError as e:
+            raise RecognizerUnavailable(str(e))
+        finally:
+            sock.close()
+        if frame is None:
+            raise RecognizerUnavailable('Recognition server closed the connection')
+        reply_op, _, reply_meta, reply = frame
+        if reply_op == OP_ERROR:
+            raise RecognizerUnavailable(reply_meta.get('error', 'Recognition server error'))
+        if 'error' in reply_meta:
+            raise _item_error(reply_meta)
+        return reply_meta, reply
+
+    @staticmethod
+    def _vectors(meta, reply):
+        import numpy as np
+        return list(np.frombuffer(reply, dtype=np.float32).reshape(meta['n'], meta['dim']).copy())
+
+    def detect(self, data, tiled=None):
+        """Facial areas of the image bytes (in their detection-image coordinates)."""
+        from .embeddings import get_model_name
+        meta, _ = self._request(OP_DETECT, {'model': get_model_name(), 'tiled': tiled}, data)
+        return meta['areas']
+
+    def embed(self, data, tiled=None):
+        """(vectors, faces rejected for quality, cached) of every face in the image bytes."""
+        from .embeddings import get_model_name
+        meta, reply = self._request(OP_EMBED, {'model': get_model_name(), 'tiled': tiled}, data)
+        return self._vectors(meta, reply), meta['rejected'], meta['cached']
+
+    def embed_areas(self, data, areas):
+        """Per facial area of the image bytes: its vector, or None when it was rejected."""
+        from .embeddings import get_model_name
+        meta, reply = self._request(OP_EMBED, {'model': get_model_name(), 'areas': areas}, data)
+        embedded = [None] * len(areas)
+        for i, vector in zip(meta['index'], self._vectors(meta, reply)):
+            embedded[i] = vector
+        return embedded
+
+    def enroll(self, student_id, check_duplicates=True):
+        self._request(OP_ENROLL, {'student': student_id, 'check_duplicates': check_duplicates})
+
+    # ── batching ─────────────────────────────────────────────────────────────
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='recognizer-client', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=left))
+                except queue.Empty:
+                    break
+            batch = [b for b in batch if b[2].set_running_or_notify_cancel()]
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch):
+        items = [item for item, _, _ in batch]
+        try:
+            with self._lock:
+                meta, reply = self._call(OP_RECOGNIZE, {'items': items}, b''.join(data for _, data, _ in batch))
+        except OSError as e:
+            self._down_until = time.monotonic() + getattr(settings, 'FACE_RECOGNIZER_RETRY_INTERVAL', 10)
+            for _, _, future in batch:
+                future.set_exception(RecognizerUnavailable(str(e)))
+            return
+        self.batches += 1
+        offset = 0
+        for (_, _, future), result in zip(batch, meta.get('items', [])):
+            if 'error' in result:
+                future.set_exception(_item_error(result))
+                continue
+            future.set_result((unpack_matches(reply, offset, result['n']), result['cached'],
+                               result.get('rejected', 0)))
+            offset += result['n'] * MATCH.size
+        for _, _, future in batch[len(meta.get('items', [])):]:
+            future.set_exception(RecognizerUnavailable('Recognition server dropped part of the batch'))
+
+    def recognize(self, data, item):
+        """(recognized, cached, rejected) from the server for the image bytes; raises RecognizerUnavailable."""
+        if time.monotonic() < self._down_until:
+            raise RecognizerUnavailable('Recognition server was unreachable recently')
+        self._ensure_thread()
+        future = Future()
+        self._pending.put((dict(item, size=len(data)), data, future))
+        try:
+            # a full batch can take a whole socket timeout to send plus one to answer
+            return future.result(timeout=self.timeout * 2 + self.batch_window)
+        except FutureTimeout:
+            future.cancel()
+            raise RecognizerUnavailable('Recognition server timed out')
+
+
+def _item_error(result):
+    from .preprocess import ImageRejected
+
+    if result.get('status') == 409:
+        return RecognizerUnavailable(result['error'])  # model mismatch: recognize in-process
+    if result.get('status'):
+        return ImageRejected(result['error'], result['status'])
+    return RuntimeError(result['error'])
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(address=None):
+    address = address or getattr(settings, 'FACE_RECOGNIZER_ADDRESS', '')
+    with _clients_lock:
+        client = _clients.get(address)
+        if client is None:
+            client = _clients[address] = RecognitionClient(
+                address,
+                timeout=getattr(settings, 'FACE_RECOGNIZER_TIMEOUT', 5.0),
+                batch_window=getattr(settings, 'FACE_RECOGNIZER_BATCH_WINDOW', 0.005),
+                batch_size=getattr(settings, 'FACE_RECOGNIZER_BATCH_SIZE', 16),
+                job_timeout=getattr(settings, 'FACE_RECOGNIZER_JOB_TIMEOUT', 60.0),
+            )
+        return client
+
+
+def recognize(data, roster, threshold, department_id, section, tiled=None):
+    """
+    {student_id: confidence} for the image bytes against the section roster,
+    from the recognition server when configured. Returns (recognized, cached,
+    faces rejected for quality).
+    """
+    from .embeddings import get_model_name
+    from .result_cache import recognition_cache
+    from .roster import roster_version
+
+    if getattr(settings, 'FACE_RECOGNIZER_ADDRESS', ''):
+        client = get_client()
+        try:
+            return client.recognize(data, {
+                'dept': department_id, 'section': section, 'model': get_model_name(),
+                'version': roster_version(roster), 'threshold': threshold, 'tiled': tiled,
+            })
+        except RecognizerUnavailable:
+            if not getattr(settings, 'FACE_RECOGNIZER_FALLBACK', True):
+                raise
+            client.fallbacks += 1
+    return recognition_cache.recognize(data, roster, threshold, tiled=tiled)
+
+
+def embed_image(data, tiled=None):
+    """
+    (face vectors, faces rejected for quality) of the image bytes, from the
+    recognition server when configured. Batch uploads match the vectors of
+    all their photos together.
+    """
+    from .result_cache import recognition_cache
+
+    if getattr(settings, 'FACE_RECOGNIZER_ADDRESS', ''):
+        client = get_client()
+        try:
+            vectors, rejected, _ = client.embed(data, tiled)
+            return vectors, rejected
+        except RecognizerUnavailable:
+            if not getattr(settings, 'FACE_RECOGNIZER_FALLBACK', True):
+                raise
+            client.fallbacks += 1
+    _, entry, _ = recognition_cache.embeddings(data, tiled)
+    return entry.vectors, entry.rejected
+
+
+class ServerFaces(LocalFaces):
+    """Video frames detected and embedded on the recognition server, JPEG-encoded once per frame."""
+
+    def __init__(self, client, tiled=None):
+        super().__init__(tiled)
+        self.client = client
+
+    @staticmethod
+    def _jpeg(prepared):
+        import cv2
+        if getattr(prepared, 'jpeg', None) is None:
+            _, encoded = cv2.imencode('.jpg', prepared.frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            prepared.jpeg = encoded.tobytes()
+        return prepared.jpeg
+
+    def detect(self, prepared):
+        try:
+            return self.client.detect(self._jpeg(prepared), self.tiled)
+        except RecognizerUnavailable:
+            if not getattr(settings, 'FACE_RECOGNIZER_FALLBACK', True):
+                raise
+            self.client.fallbacks += 1
+        return super().detect(prepared)
+
+    def embed(self, prepared, areas):
+        if not areas:
+            return []
+        try:
+            return self.client.embed_areas(self._jpeg(prepared), areas)
+        except RecognizerUnavailable:
+            if not getattr(settings, 'FACE_RECOGNIZER_FALLBACK', True):
+                raise
+            self.client.fallbacks += 1
+        return super().embed(prepared, areas)
+
+
+def video_faces(tiled=None):
+    """Where video frames are detected and embedded: the recognition server when configured."""
+    if getattr(settings, 'FACE_RECOGNIZER_ADDRESS', ''):
+        return ServerFaces(get_client(), tiled)
+    return LocalFaces(tiled)
+
+
+def hand_off_enrollment(student_id, check_duplicates=True):
+    """
+    Queue a pending enrollment on the recognition server. False when the
+    caller should embed the photo itself: no server is configured, or it is
+    unreachable and FACE_RECOGNIZER_FALLBACK allows that. Without fallback
+    the student stays pending for `manage.py process_enrollments`.
+    """
+    if not getattr(settings, 'FACE_RECOGNIZER_ADDRESS', ''):
+        return False
+    client = get_client()
+    try:
+        client.enroll(student_id, check_duplicates)
+        return True
+    except RecognizerUnavailable:
+        if not getattr(settings, 'FACE_RECOGNIZER_FALLBACK', True):
+            return True
+        client.fallbacks += 1
+        return False
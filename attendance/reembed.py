@@ -0,0 +1,146 @@
+"""
+Zero-downtime re-embedding for a recognition model change.
+The new model's FaceEmbedding rows are computed in a process pool next to
+the active store and checkpointed in batches, so an interrupted run resumes
+where it stopped. Recognition keeps using the active EmbeddingVersion until
+activate() swaps the new one in with a single transaction.
+
+Model imports stay inside functions: pool workers may be spawned (Windows)
+and import this module before Django is set up.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _embed(job):
+    """(student_id, photo_name, vector bytes or None, error) for one photo; runs in a worker."""
+    from django.conf import settings
+    from .embeddings import to_bytes
+    from .face_utils import represent_photo_path
+
+    student_id, photo_name, model_name = job
+    try:
+        vector = represent_photo_path(os.path.join(settings.MEDIA_ROOT, photo_name), model_name)
+    except Exception as e:
+        return student_id, photo_name, None, str(e)
+    if vector is None:
+        return student_id, photo_name, None, 'no face embedded'
+    return student_id, photo_name, to_bytes(vector), None
+
+
+def pending(model_name):
+    """(jobs still to embed for the model, enrolled photo count)."""
+    from accounts.models import Student
+    from .models import FaceEmbedding
+
+    photos = [(sid, str(photo)) for sid, photo in Student.objects.filter(face_enrolled=True)
+              .exclude(photo='').exclude(photo__isnull=True).values_list('id', 'photo')]
+    stored = dict(FaceEmbedding.objects.filter(model_name=model_name).values_list('student_id', 'photo_name'))
+    return [(sid, photo, model_name) for sid, photo in photos if stored.get(sid) != photo], len(photos)
+
+
+def _checkpoint(version, results):
+    from django.db import transaction
+    from .models import FaceEmbedding
+
+    rows = [FaceEmbedding(student_id=sid, model_name=version.model_name, photo_name=photo, vector=vector)
+            for sid, photo, vector, error in results if vector is not None]
+    with transaction.atomic():
+        FaceEmbedding.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['student', 'model_name'],
+            update_fields=['photo_name', 'vector', 'created_at'])
+        version.done += len(rows)
+        version.failed += len(results) - len(rows)
+        version.save(update_fields=['done', 'failed'])
+
+
+def build(model_name, workers=2, batch_size=50, progress=None):
+    """
+    Embed every enrolled photo with `model_name` that is not stored yet.
+    Calls progress(version, rate) after each checkpoint. Returns the EmbeddingVersion.
+    """
+    from django.db import connections
+    from django.utils import timezone
+    from .models import EmbeddingVersion
+
+    version, _ = EmbeddingVersion.objects.get_or_create(model_name=model_name)
+    jobs, total = pending(model_name)
+    if version.status == 'retired':
+        version.status = 'building'
+    # Rows already stored for current photos are the checkpoint; failures are retried.
+    version.total, version.done, version.failed, version.finished_at = total, total - len(jobs), 0, None
+    version.save()
+
+    started, buffer, processed = time.monotonic(), [], 0
+
+    def flush():
+        nonlocal buffer, processed
+        _checkpoint(version, buffer)
+        processed += len(buffer)
+        buffer = []
+        if progress:
+            progress(version, processed / max(time.monotonic() - started, 1e-6))
+
+    if jobs:
+        connections.close_all()  # forked workers must not share the parent's DB handles
+        chunksize = max(1, min(batch_size, len(jobs) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'),)) as pool:
+            for result in pool.map(_embed, jobs, chunksize=chunksize):
+                buffer.append(result)
+                if len(buffer) >= batch_size:
+                    flush()
+        if buffer:
+            flush()
+
+    version.finished_at = timezone.now()
+    if version.status == 'building':
+        version.status = 'ready'
+    version.save(update_fields=['status', 'finished_at'])
+    if version.status == 'active' and jobs:
+        _invalidate_rosters()
+    return version
+
+
+def _invalidate_rosters():
+    """Re-embedding the active model bypasses the FaceEmbedding signals; drop its cached rosters."""
+    from accounts.models import Student
+    from .roster import invalidate_roster
+
+    for department_id, section in Student.objects.values_list('department_id', 'section').distinct():
+        invalidate_roster(department_id, section)
+
+
+def activate(model_name):
+    """Make `model_name` the store recognition reads from; the previous active one is retired."""
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import transaction
+    from django.utils import timezone
+    from .embeddings import ACTIVE_KEY, get_model_name
+    from .models import EmbeddingVersion
+
+    current = get_model_name()
+    with transaction.atomic():
+        version = EmbeddingVersion.objects.select_for_update().get(model_name=model_name)
+        if version.status not in ('ready', 'retired', 'active'):
+            raise ValueError(f'{model_name} store is still {version.status}')
+        if current != model_name:
+            # Keep the store being replaced as a retired version so it can be swapped back.
+            EmbeddingVersion.objects.get_or_create(model_name=current, defaults={'status': 'retired'})
+        EmbeddingVersion.objects.filter(status='active').exclude(pk=version.pk).update(status='retired')
+        version.status = 'active'
+        version.activated_at = timezone.now()
+        version.save(update_fields=['status', 'activated_at'])
+        transaction.on_commit(lambda: cache.set(
+            ACTIVE_KEY, model_name, getattr(settings, 'EMBEDDING_VERSION_CACHE_TIMEOUT', 30)))
+    return version
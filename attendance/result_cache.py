@@ -0,0 +1,133 @@
+"""
+Content-addressed cache of recognition results.
+Webcam retries and re-uploaded group photos send byte-identical images, so
+the detected face boxes and their embeddings are kept per image hash (plus
+embedding model and tiling mode), and the matches per roster version and
+threshold. A repeat submission is answered without decoding the image or
+running the model; a changed roster only re-runs the cheap matching step.
+Entries are evicted least-recently-used once FACE_RESULT_CACHE_ENTRIES or
+FACE_RESULT_CACHE_MAX_BYTES is exceeded.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+MATCHES_PER_ENTRY = 4  # (roster version, threshold) results kept per image
+_ENTRY_OVERHEAD = 512
+
+
+class _Entry:
+    def __init__(self, areas, vectors, rejected=0):
+        self.areas = areas
+        self.vectors = vectors
+        self.rejected = rejected  # faces the quality gate kept from the model
+        self.matches = OrderedDict()
+
+    @property
+    def size(self):
+        return (_ENTRY_OVERHEAD + sum(v.nbytes for v in self.vectors)
+                + 64 * len(self.areas) + 48 * sum(len(m) for m in self.matches.values()))
+
+
+class RecognitionCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data, tiled=None):
+        from .embeddings import get_model_name
+        return hashlib.blake2b(data, digest_size=16).hexdigest(), get_model_name(), tiled
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        max_entries = getattr(settings, 'FACE_RESULT_CACHE_ENTRIES', 256)
+        max_bytes = getattr(settings, 'FACE_RESULT_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            if entry.size > max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > max_entries or self._bytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def add_matches(self, key, entry, match_key, recognized):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                self._bytes -= entry.size
+            entry.matches[match_key] = recognized
+            while len(entry.matches) > MATCHES_PER_ENTRY:
+                entry.matches.popitem(last=False)
+            if self._entries.get(key) is entry:
+                self._bytes += entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def embeddings(self, data, tiled=None, compute=None):
+        """
+        (key, entry, hit) for the image bytes, detecting and embedding the
+        faces on a miss with compute(data, tiled) -> (areas, vectors, rejected).
+        """
+        key = self.key(data, tiled)
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return key, entry, True
+        self.misses += 1
+        entry = _Entry(*(compute or detect_and_embed)(data, tiled))
+        self.put(key, entry)
+        return key, entry, False
+
+    def recognize(self, data, roster, threshold, tiled=None, compute=None):
+        """
+        {student_id: confidence} for the image bytes against the roster.
+        Returns (recognized, cached, rejected): cached means the model was not
+        run, rejected counts the faces too blurry, small, dark or turned away
+        to be recognized.
+        """
+        from .face_utils import match_face_vectors
+        from .roster import roster_version
+
+        key, entry, hit = self.embeddings(data, tiled, compute)
+        match_key = (roster_version(roster), threshold)
+        recognized = entry.matches.get(match_key)
+        if recognized is None:
+            recognized = match_face_vectors(entry.vectors, (roster['ids'], roster['matrix']), threshold)
+            self.add_matches(key, entry, match_key, recognized)
+        return dict(recognized), hit, entry.rejected
+
+
+def detect_and_embed(data, tiled=None):
+    """(facial areas, embeddings, faces rejected for quality) of the faces in the image bytes."""
+    from .preprocess import PreparedImage
+    from .face_utils import detect_face_areas, embed_areas
+
+    prepared = PreparedImage(data)
+    areas = detect_face_areas(prepared, tiled)
+    return (areas, *embed_areas(prepared, areas))
+
+
+recognition_cache = RecognitionCache()
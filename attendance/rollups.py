@@ -0,0 +1,49 @@
+"""
+Daily attendance rollups for HOD analytics.
+One DailyRollup row per (course, section, date) holds present/late/absent
+totals of its finalized sessions, so trend views never scan
+AttendanceRecord; a session still being taken counts once it is finalized.
+"""
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import AttendanceRecord, DailyRollup
+
+_COUNTS = {
+    'present': Count('id', filter=Q(status='present')),
+    'late': Count('id', filter=Q(status='late')),
+    'absent': Count('id', filter=Q(status='absent')),
+    'total': Count('id'),
+}
+
+
+def refresh_rollup(session):
+    """Recompute the rollup row a finalized session contributes to."""
+    counts = AttendanceRecord.objects.filter(
+        session__course_id=session.course_id,
+        session__section=session.section,
+        session__date=session.date,
+        session__is_active=False,
+    ).aggregate(**_COUNTS)
+    DailyRollup.objects.update_or_create(
+        course_id=session.course_id, section=session.section, date=session.date,
+        defaults={'department_id': session.course.department_id, **counts},
+    )
+
+
+def rebuild_rollups():
+    """Recompute every rollup row from the finalized sessions' records in one grouped pass."""
+    groups = AttendanceRecord.objects.filter(session__is_active=False).values(
+        'session__course_id', 'session__course__department_id', 'session__section', 'session__date'
+    ).annotate(**_COUNTS).order_by()
+    rows = [DailyRollup(
+        course_id=g['session__course_id'],
+        department_id=g['session__course__department_id'],
+        section=g['session__section'],
+        date=g['session__date'],
+        present=g['present'], late=g['late'], absent=g['absent'], total=g['total'],
+    ) for g in groups]
+    with transaction.atomic():
+        DailyRollup.objects.all().delete()
+        DailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
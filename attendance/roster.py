@@ -0,0 +1,88 @@
+"""
+Cached per-section roster for attendance pages and face recognition.
+Holds the active students of a (department, section) with the fields the
+pages display, plus the stacked embedding matrix of the enrolled ones.
+Entries are keyed by the section's RosterRevision, which the signals in
+attendance/signals.py bump, so a change made in another process (another
+web worker, the enrollment worker, the recognition server) is seen on the
+next read even with a per-process cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from accounts.thumbnails import thumbnail_urls
+
+from .embeddings import ensure_embeddings, embedding_matrix, get_model_name
+
+
+def roster_key(department_id, section, revision, model_name=None):
+    return f'roster:{model_name or get_model_name()}:{department_id}:{section}:{revision}'
+
+
+def roster_revision(department_id, section):
+    from .models import RosterRevision
+
+    return RosterRevision.objects.filter(
+        department_id=department_id, section=section).values_list('revision', flat=True).first() or 0
+
+
+def get_roster(department_id, section):
+    """
+    Returns {'students': [display dicts ordered by roll number],
+             'ids': [student ids], 'matrix': embedding matrix aligned with ids}.
+    """
+    key = roster_key(department_id, section, roster_revision(department_id, section))
+    roster = cache.get(key)
+    if roster is None:
+        roster = build_roster(department_id, section)
+        cache.set(key, roster, getattr(settings, 'ROSTER_CACHE_TIMEOUT', 3600))
+    return roster
+
+
+def build_roster(department_id, section):
+    from accounts.models import Student
+
+    students = list(Student.objects.filter(
+        department_id=department_id, section=section, is_active=True
+    ).order_by('roll_number'))
+    ids, matrix = embedding_matrix(ensure_embeddings(students))
+    return {
+        'students': [{
+            'id': s.id,
+            'name': s.name,
+            'roll_number': s.roll_number,
+            'face_enrolled': s.face_enrolled and s.face_status == 'ready',
+            'photo_url': s.photo.url if s.photo else '',
+            'thumbnails': thumbnail_urls(s.photo_hash),
+        } for s in students],
+        'ids': ids,
+        'matrix': matrix,
+        'version': _version(ids, matrix),
+    }
+
+
+def _version(ids, matrix):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr(ids).encode())
+    digest.update(matrix.tobytes())
+    return digest.hexdigest()
+
+
+def roster_version(roster):
+    """Content hash of the roster's enrolled ids and embeddings; changes whenever matching could."""
+    return roster.get('version') or _version(roster['ids'], roster['matrix'])
+
+
+def invalidate_roster(department_id, section):
+    """Bump the section's revision; every process's cached roster of it (any model) stops being read."""
+    from .models import RosterRevision
+
+    rows = RosterRevision.objects.filter(department_id=department_id, section=section)
+    if not rows.update(revision=F('revision') + 1):
+        _, created = RosterRevision.objects.get_or_create(
+            department_id=department_id, section=section, defaults={'revision': 1})
+        if not created:
+            rows.update(revision=F('revision') + 1)
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import Student
+from .enrollment import enqueue
+from .models import FaceEmbedding
+from .roster import invalidate_roster
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def drop_student_roster(sender, instance, **kwargs):
+    invalidate_roster(instance.department_id, instance.section)
+    old = getattr(instance, '_old_roster', None)
+    if old and old != (instance.department_id, instance.section):
+        invalidate_roster(*old)
+
+
+@receiver(post_save, sender=Student)
+def queue_student_jobs(sender, instance, **kwargs):
+    """Enroll the face and render the thumbnails that accounts/signals.py found out of date."""
+    enroll = getattr(instance, '_enroll_face', False)
+    thumbnails = getattr(instance, '_make_thumbnails', False)
+    if enroll or thumbnails:
+        enqueue(instance.pk, check_duplicates=not getattr(instance, '_confirmed_face', False),
+                enroll=enroll, thumbnails=thumbnails)
+
+
+@receiver(post_save, sender=FaceEmbedding)
+@receiver(post_delete, sender=FaceEmbedding)
+def drop_embedding_roster(sender, instance, **kwargs):
+    student = Student.objects.filter(pk=instance.student_id).values_list('department_id', 'section').first()
+    if student:
+        invalidate_roster(*student)
@@ -0,0 +1,77 @@
+"""
+Stand-in face embedder for load tests and development without DeepFace.
+Selected with FACE_EMBEDDER = 'standin'. A "face" is any non-dark blob on a
+dark background; its embedding is the mean-centred 16x16 grayscale thumbnail
+of the blob, so identical patterns embed identically and different random
+patterns are nearly orthogonal under cosine distance. Cheap, deterministic
+and model-free, it exercises the whole pipeline (detection, crops,
+matching, writes) without any network or model download.
+"""
+import zlib
+
+import numpy as np
+
+MODEL_NAME = 'StandIn'
+SIDE = 16
+MIN_FACE = 32        # blobs smaller than this (px) are ignored
+BACKGROUND = 12      # grayscale level counted as background
+
+
+def _gray(img):
+    import cv2
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def detect_faces(img):
+    """Bounding boxes of the non-dark blobs, in DeepFace.extract_faces' dict shape."""
+    import cv2
+    if isinstance(img, str):
+        img = cv2.imread(img)
+    if img is None:
+        return []
+    mask = (_gray(img) > BACKGROUND).astype(np.uint8)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    faces = []
+    for x, y, w, h, _ in stats[1:count]:
+        if w >= MIN_FACE and h >= MIN_FACE:
+            faces.append({'facial_area': {'x': int(x), 'y': int(y), 'w': int(w), 'h': int(h)},
+                          'confidence': 1.0})
+    return faces
+
+
+def represent_face(face_bgr):
+    """Embedding of a face crop; dark margins around the blob are trimmed first."""
+    import cv2
+    gray = _gray(face_bgr)
+    rows = np.flatnonzero((gray > BACKGROUND).any(axis=1))
+    cols = np.flatnonzero((gray > BACKGROUND).any(axis=0))
+    if not rows.size or not cols.size:
+        return None
+    gray = gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    thumb = cv2.resize(gray, (SIDE, SIDE), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    thumb -= thumb.mean()
+    norm = np.linalg.norm(thumb)
+    return thumb / norm if norm else None
+
+
+def represent_path(path):
+    """Embedding of the largest blob in an image file (enrolled photos)."""
+    import cv2
+    img = cv2.imread(path)
+    if img is None:
+        return None
+    faces = detect_faces(img)
+    if not faces:
+        return None
+    a = max((f['facial_area'] for f in faces), key=lambda a: a['w'] * a['h'])
+    return represent_face(img[a['y']:a['y'] + a['h'], a['x']:a['x'] + a['w']])
+
+
+def face_pattern(seed, size=128):
+    """A synthetic 'face' for seed (int or str): 16x16 random levels scaled up to size x size BGR."""
+    import cv2
+    if isinstance(seed, str):
+        seed = zlib.crc32(seed.encode())
+    rng = np.random.default_rng(seed)
+    cells = rng.integers(40, 256, size=(SIDE, SIDE), dtype=np.uint8)
+    return cv2.cvtColor(cv2.resize(cells, (size, size), interpolation=cv2.INTER_NEAREST), cv2.COLOR_GRAY2BGR)
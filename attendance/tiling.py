@@ -0,0 +1,136 @@
+"""
+Tiled face detection for wide classroom panoramas.
+The image is decoded at a higher resolution than the normal detection pass,
+split into overlapping tiles that are detected in parallel, and the boxes
+are merged with non-maximum suppression.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from django.conf import settings
+
+
+def use_tiling(tiled=None):
+    """True, False or 'auto': an explicit request wins over FACE_TILED_DETECTION."""
+    if tiled is not None:
+        return bool(tiled)
+    mode = getattr(settings, 'FACE_TILED_DETECTION', 'auto')
+    return 'auto' if mode == 'auto' else bool(mode)
+
+
+def needs_tiling(prepared, areas):
+    """
+    'auto' mode, after one normal detection pass found `areas`: tile only
+    when the source holds at least twice the detection resolution and the
+    pass found no face, or a smallest face under FACE_TILE_SMALL_FACE px at
+    detection size (smaller back-row faces were probably missed). A large
+    photo of a class whose faces were found at a normal size is not tiled.
+    """
+    small = getattr(settings, 'FACE_TILE_SMALL_FACE', 32)
+    max_edge = getattr(settings, 'FACE_TILE_MAX_EDGE', 4096)
+    gain = min(max_edge, max(prepared.width, prepared.height)) / max(prepared.image.shape[:2])
+    if gain < 2:
+        return False
+    return not areas or min(min(a['w'], a['h']) for a in areas) < small
+
+
+def tile_starts(length, size, overlap):
+    if length <= size:
+        return [0]
+    step = max(int(size * (1 - overlap)), 1)
+    starts = list(range(0, length - size, step))
+    return starts + [length - size]
+
+
+def _overlaps(boxes, i, rest):
+    """(IoU, intersection over the smaller box) of box i against boxes[rest]."""
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    iw = np.maximum(0, np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]))
+    ih = np.maximum(0, np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]))
+    inter = iw * ih
+    iou = inter / (areas[i] + areas[rest] - inter + 1e-6)
+    inside = inter / (np.minimum(areas[i], areas[rest]) + 1e-6)
+    return iou, inside
+
+
+def nms(boxes, scores, iou_threshold=0.3, containment=0.8, max_part_ratio=4.0, cut=None):
+    """
+    Indices of boxes (N x 4, x0 y0 x1 y1) to keep. A box lying mostly inside
+    a larger one is a face cut off at a tile edge, and is dropped first, when
+    it touches its tile's inner edge (`cut`) or the larger box is at most
+    `max_part_ratio` times its area; a much larger box around a whole face
+    is something else, so it can't swallow real faces. The rest go through
+    the usual score-ordered IoU suppression.
+    """
+    if not len(boxes):
+        return []
+    boxes = np.asarray(boxes, dtype=np.float32)
+    scores = np.asarray(scores, dtype=np.float32)
+    cut = np.zeros(len(boxes), bool) if cut is None else np.asarray(cut, bool)
+
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(areas)[::-1]
+    whole = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        whole.append(int(i))
+        _, inside = _overlaps(boxes, i, rest)
+        part = (inside > containment) & (cut[rest] | (areas[i] <= max_part_ratio * areas[rest]))
+        order = rest[~part]
+
+    whole = np.array(whole)
+    order = whole[np.argsort(scores[whole])[::-1]]
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(int(i))
+        iou, _ = _overlaps(boxes, i, rest)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+def detect_tiled(prepared, detect_fn):
+    """
+    Facial areas (in prepared.image coordinates) found by running
+    `detect_fn` on overlapping tiles of a higher-resolution decode.
+    """
+    max_edge = getattr(settings, 'FACE_TILE_MAX_EDGE', 4096)
+    size = getattr(settings, 'FACE_TILE_SIZE', 1024)
+    overlap = getattr(settings, 'FACE_TILE_OVERLAP', 0.25)
+    workers = getattr(settings, 'FACE_TILE_WORKERS', 4)
+
+    img = prepared.decode_at_most(max_edge)
+    h, w = img.shape[:2]
+    tiles = [(x, y) for y in tile_starts(h, size, overlap) for x in tile_starts(w, size, overlap)]
+
+    def run(origin):
+        x, y = origin
+        tile = np.ascontiguousarray(img[y:y + size, x:x + size])
+        th, tw = tile.shape[:2]
+        faces = detect_fn(tile)
+        hits = []
+        for f in faces:
+            a = f.get('facial_area')
+            # enforce_detection=False returns the whole tile with confidence 0 when empty
+            if not a or not f.get('confidence'):
+                continue
+            cut = ((x > 0 and a['x'] <= 1) or (x + tw < w and a['x'] + a['w'] >= tw - 1)
+                   or (y > 0 and a['y'] <= 1) or (y + th < h and a['y'] + a['h'] >= th - 1))
+            hits.append((a, f['confidence'], x, y, cut))
+        return hits
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        found = [hit for hits in pool.map(run, tiles) for hit in hits]
+    if not found:
+        return []
+
+    boxes = [(a['x'] + x, a['y'] + y, a['x'] + x + a['w'], a['y'] + y + a['h']) for a, _, x, y, _ in found]
+    scores = np.array([hit[1] for hit in found], dtype=np.float32)
+    fx = prepared.image.shape[1] / w
+    fy = prepared.image.shape[0] / h
+
+    areas = []
+    for i in nms(boxes, scores, cut=[hit[4] for hit in found]):
+        x0, y0, x1, y1 = boxes[i]
+        areas.append({'x': int(x0 * fx), 'y': int(y0 * fy),
+                      'w': max(int((x1 - x0) * fx), 1), 'h': max(int((y1 - y0) * fy), 1)})
+    return areas
@@ -12,9 +12,15 @@ urlpatterns = [
     # API
     path('api/sessions/<int:pk>/recognize/', views.api_recognize_face, name='api_recognize_face'),
     path('api/sessions/<int:pk>/upload-recognize/', views.api_upload_recognize, name='api_upload_recognize'),
+    path('api/sessions/<int:pk>/batch-recognize/', views.api_batch_recognize, name='api_batch_recognize'),
+    path('api/sessions/<int:pk>/video-recognize/', views.api_video_recognize, name='api_video_recognize'),
     path('api/sessions/<int:pk>/stats/', views.api_session_stats, name='api_session_stats'),
 
     # Reports
     path('reports/absentees/', views.absentees_report, name='absentees_report'),
+    path('reports/analytics/', views.analytics_view, name='analytics'),
+    path('sessions/<int:pk>/export/', views.export_session, name='export_session'),
+    path('reports/export/course/<int:course_id>/', views.export_course, name='export_course'),
+    path('reports/export/semester/', views.export_semester, name='export_semester'),
     path('notifications/', views.notifications_view, name='notifications'),
 ]
@@ -0,0 +1,235 @@
+"""
+Recorded-lecture ingestion.
+A video is stream-decoded with cv2.VideoCapture, one frame at a time;
+frames between probes (every FACE_VIDEO_PROBE_INTERVAL seconds of video)
+are only grab()bed, not decoded. A probe becomes a sample when its small
+grayscale thumbnail differs from the last sample's by FACE_VIDEO_SCENE_CHANGE
+grey levels on average, or when FACE_VIDEO_MAX_GAP seconds passed without
+one. Faces of a sample that overlap a face already recognized in the
+previous sample keep that identity (re-embedded every FACE_VIDEO_TRACK_REFRESH
+samples); the rest are embedded and matched against the section roster.
+Only the best confidence per student is kept, so memory does not grow with
+the video's length. Detection and embedding go through a LocalFaces (this
+process) or, with a recognition server configured, recognizer_client's
+ServerFaces, so web workers decode the video but never load the model.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .preprocess import ImageRejected, PreparedImage
+
+_THUMB = (64, 36)
+
+
+class FrameImage(PreparedImage):
+    """A decoded video frame in PreparedImage's shape (detection image + sharper crops)."""
+
+    def __init__(self, frame):
+        self.data = None
+        self.frame = frame
+        self.height, self.width = frame.shape[:2]
+        self.orientation = 1
+        self.image = self.decode_at_most(getattr(settings, 'FACE_DETECTION_MAX_EDGE', 1600))
+
+    def _decode(self, factor):
+        import cv2
+        if factor == 1:
+            return self.frame
+        return cv2.resize(self.frame, (self.width // factor, self.height // factor), interpolation=cv2.INTER_AREA)
+
+
+def scene_thumbnail(frame):
+    """Small grayscale copy of a frame; the mean absolute difference of two is the scene change."""
+    import cv2
+    return cv2.resize(_thumb_gray(frame), _THUMB, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def _patch(image, area):
+    """16x16 grayscale of a facial area, to check that a tracked box still shows the same face."""
+    import cv2
+    crop = image[area['y']:area['y'] + area['h'], area['x']:area['x'] + area['w']]
+    if not crop.size:
+        return None
+    return cv2.resize(_thumb_gray(crop), (16, 16), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def _thumb_gray(img):
+    import cv2
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def _iou(a, b):
+    x0, y0 = max(a['x'], b['x']), max(a['y'], b['y'])
+    x1 = min(a['x'] + a['w'], b['x'] + b['w'])
+    y1 = min(a['y'] + a['h'], b['y'] + b['h'])
+    inter = max(x1 - x0, 0) * max(y1 - y0, 0)
+    union = a['w'] * a['h'] + b['w'] * b['h'] - inter
+    return inter / union if union else 0.0
+
+
+class LocalFaces:
+    """Detect and embed the faces of a frame in this process."""
+
+    def __init__(self, tiled=None):
+        self.tiled = tiled
+
+    def detect(self, prepared):
+        from .face_utils import detect_face_areas
+        return detect_face_areas(prepared, self.tiled)
+
+    def embed(self, prepared, areas):
+        """Per area: its vector, or None when the quality gate or the model rejected it."""
+        from .face_utils import embed_areas
+        # one crop per area, so each vector can be tied back to its face
+        return [vectors[0] if vectors else None for vectors in (embed_areas(prepared, [area])[0] for area in areas)]
+
+
+class VideoIngest:
+    """
+    Recognize the students seen in a video. run() returns {student_id: best
+    confidence}; the counters describe the work done.
+    """
+
+    def __init__(self, roster, threshold, tiled=None, progress_every=5.0, backend=None):
+        from .recognizer_client import video_faces
+
+        self.backend = backend or video_faces(tiled)
+        self.gallery = (roster['ids'], roster['matrix'])
+        self.students = roster['students']
+        self.threshold = threshold
+        self.tiled = tiled
+        self.progress_every = progress_every
+        self.probe_interval = getattr(settings, 'FACE_VIDEO_PROBE_INTERVAL', 0.5)
+        self.scene_change = getattr(settings, 'FACE_VIDEO_SCENE_CHANGE', 8.0)
+        self.max_gap = getattr(settings, 'FACE_VIDEO_MAX_GAP', 10.0)
+        self.track_refresh = getattr(settings, 'FACE_VIDEO_TRACK_REFRESH', 5)
+
+        self.best = {}
+        self.tracks = []            # [(facial area, student id, samples since embedded, patch)]
+        self.frames = self.probed = self.sampled = self.faces = self.embedded = 0
+        self.duration = self.position = self.elapsed = 0.0
+
+    @property
+    def fps(self):
+        """Video frames consumed per wall-clock second."""
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+    def stats(self):
+        return {
+            'frames': self.frames, 'probed': self.probed, 'sampled': self.sampled,
+            'faces': self.faces, 'embedded': self.embedded, 'recognized': len(self.best),
+            'position': round(self.position, 1), 'duration': round(self.duration, 1),
+            'seconds': round(self.elapsed, 2), 'fps': round(self.fps, 1),
+        }
+
+    @classmethod
+    def for_session(cls, session, tiled=None):
+        """An ingest matching against the session's section, whose records are created (absent) first."""
+        from .calibration import get_threshold
+        from .marking import ensure_records
+        from .roster import get_roster
+
+        roster = get_roster(session.course.department_id, session.section)
+        ensure_records(session, roster['students'])
+        return cls(roster, get_threshold(session.course.department_id, session.section), tiled=tiled)
+
+    def run(self, path, progress=None):
+        """{student_id: best confidence} for the video; progress(stats) is called every few seconds."""
+        for stats in self.stream(path):
+            if progress:
+                progress(stats)
+        return dict(self.best)
+
+    def stream(self, path):
+        """Process the video, yielding stats() every `progress_every` seconds."""
+        import cv2
+
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise ImageRejected('Unreadable video')
+        try:
+            source_fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            if not 1 <= source_fps <= 240:
+                source_fps = 25.0
+            self.duration = (capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0) / source_fps
+            step = max(int(round(self.probe_interval * source_fps)), 1)
+
+            started = last_report = time.monotonic()
+            last_thumb, last_sample = None, None
+            while capture.grab():
+                self.frames += 1
+                self.position = (self.frames - 1) / source_fps
+                if (self.frames - 1) % step:
+                    continue
+                ok, frame = capture.retrieve()
+                if not ok:
+                    continue
+                self.probed += 1
+                thumb = scene_thumbnail(frame)
+                due = last_sample is None or self.position - last_sample >= self.max_gap
+                if not due and float(np.abs(thumb - last_thumb).mean()) < self.scene_change:
+                    continue
+                last_thumb, last_sample = thumb, self.position
+                self.sample(frame)
+
+                now = time.monotonic()
+                self.elapsed = now - started
+                if now - last_report >= self.progress_every:
+                    last_report = now
+                    yield self.stats()
+            self.elapsed = time.monotonic() - started
+        finally:
+            capture.release()
+        if not self.frames:
+            raise ImageRejected('Video has no readable frames')
+
+    def sample(self, frame):
+        """Recognize the faces of one BGR frame; returns the {student_id: confidence} matched in it."""
+        from .embeddings import assign_faces
+
+        self.sampled += 1
+        prepared = FrameImage(frame)
+        areas = self.backend.detect(prepared)
+        self.faces += len(areas)
+
+        tracks, untracked, recognized = [], [], {}
+        for area in areas:
+            patch = _patch(prepared.image, area)
+            track = max(self.tracks, key=lambda t: _iou(area, t[0]), default=None)
+            if (track and track[1] is not None and track[2] < self.track_refresh
+                    and _iou(area, track[0]) >= 0.5 and patch is not None
+                    and float(np.abs(patch - track[3]).mean()) < self.scene_change * 2):
+                tracks.append((area, track[1], track[2] + 1, patch))
+            else:
+                untracked.append((area, patch))
+
+        if untracked:
+            vectors = self.backend.embed(prepared, [area for area, _ in untracked])
+            faces = [(area, patch, vector) for (area, patch), vector in zip(untracked, vectors)
+                     if vector is not None]
+            self.embedded += len(faces)
+            owners = {}
+            if faces:
+                ids, gallery = self.gallery
+                for f, sid, d in assign_faces(np.vstack([v for _, _, v in faces]), ids, gallery, self.threshold):
+                    owners[f] = sid
+                    confidence = recognized[sid] = round((1 - d) * 100, 1)
+                    if confidence > self.best.get(sid, 0):
+                        self.best[sid] = confidence
+            tracks.extend((area, owners.get(f), 0, patch) for f, (area, patch, _) in enumerate(faces))
+        self.tracks = tracks
+        return recognized
+
+
+def ingest_video(path, session, tiled=None, progress=None):
+    """
+    Recognize the students in a recorded lecture and mark them present in
+    the session. Returns (newly marked students, stats dict).
+    """
+    from .marking import apply_face_matches
+
+    ingest = VideoIngest.for_session(session, tiled=tiled)
+    recognized = ingest.run(path, progress)
+    return apply_face_matches(session, recognized), ingest.stats()
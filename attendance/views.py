@@ -1,15 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from datetime import date
-import tempfile, os, base64, json
-
-from accounts.models import Student, Faculty, Course
+from django.db import transaction
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncWeek
+from datetime import date, timedelta
+import base64, binascii, json, os, tempfile, time, zipfile
+
+from accounts.models import Faculty, Course
 from accounts.views import get_role
-from .models import AttendanceSession, AttendanceRecord, Notification
+from core.pagination import keyset_paginate
+from .models import AttendanceSession, AttendanceRecord, Notification, DailyRollup
 from .forms import SessionForm
+from .preprocess import IMAGE_EXTENSIONS, ImageRejected, read_body, read_upload
+from .roster import get_roster
+from .exports import register_response
+from .rollups import refresh_rollup
+from .bitmaps import refresh_bitmaps
+from .coalescer import coalescer
+from .marking import ensure_records, apply_face_matches
+from .recognizer_client import embed_image, recognize as recognize_image
+from .admission import admission_controlled
 
 
 # ── SESSION MANAGEMENT ────────────────────────────────────────────────────────
@@ -41,36 +55,41 @@ def create_session(request):
 def mark_attendance(request, pk):
     session = get_object_or_404(AttendanceSession, pk=pk)
     role, profile = get_role(request.user)
+    coalescer.discard(session.pk)
 
-    students = Student.objects.filter(
-        department=session.course.department,
-        section=session.section,
-        is_active=True
-    ).order_by('roll_number')
+    students = get_roster(session.course.department_id, session.section)['students']
 
     # Pre-create absent records
-    for s in students:
-        AttendanceRecord.objects.get_or_create(session=session, student=s, defaults={'status': 'absent'})
+    ensure_records(session, students)
 
     if request.method == 'POST':
         present_ids = request.POST.getlist('present_students')
         late_ids = request.POST.getlist('late_students')
+        records = {r.student_id: r for r in AttendanceRecord.objects.filter(session=session)}
+        changed = []
         for s in students:
-            record = AttendanceRecord.objects.get(session=session, student=s)
-            if str(s.id) in present_ids:
+            record = records.get(s['id'])
+            if record is None:
+                continue
+            if str(s['id']) in present_ids:
                 record.status = 'present'
                 record.method = 'manual'
-            elif str(s.id) in late_ids:
+            elif str(s['id']) in late_ids:
                 record.status = 'late'
                 record.method = 'manual'
             else:
                 record.status = 'absent'
-            record.save()
+            changed.append(record)
+        with transaction.atomic():
+            AttendanceRecord.objects.bulk_update(changed, ['status', 'method'], batch_size=500)
 
-        _send_absence_notifications(session, students)
+        # inactive before notifying: buffered face marks of other processes are dropped from now on
         session.is_active = False
         session.end_time = timezone.now().time()
         session.save()
+        _send_absence_notifications(session, students)
+        refresh_rollup(session)
+        refresh_bitmaps(session)
         messages.success(request, f"✅ Attendance saved! Present: {session.present_count()}, Absent: {session.absent_count()}")
         return redirect('session_report', pk=session.pk)
 
@@ -86,97 +105,70 @@ def face_attendance(request, pk):
     session = get_object_or_404(AttendanceSession, pk=pk)
     role, profile = get_role(request.user)
 
-    students = Student.objects.filter(
-        department=session.course.department,
-        section=session.section,
-        is_active=True
-    ).order_by('roll_number')
+    students = get_roster(session.course.department_id, session.section)['students']
 
-    for s in students:
-        AttendanceRecord.objects.get_or_create(session=session, student=s, defaults={'status': 'absent'})
+    ensure_records(session, students)
 
-    enrolled_count = students.filter(face_enrolled=True).count()
+    enrolled_count = sum(1 for s in students if s['face_enrolled'])
 
     return render(request, 'attendance/face_attendance.html', {
         'session': session, 'students': students,
-        'enrolled_count': enrolled_count, 'role': role
+        'enrolled_count': enrolled_count, 'role': role,
+        'capture': _capture_profile(),
     })
 
 
 # ── FACE RECOGNITION API ENDPOINTS ───────────────────────────────────────────
 
 @login_required
+@admission_controlled
 def api_recognize_face(request, pk):
     """
-    POST: base64 image → returns list of recognized student IDs.
-    Used by the webcam face attendance page.
+    POST: one webcam frame → returns list of recognized student IDs.
+    The body is the raw JPEG/WebP (Content-Type image/*), or the older JSON
+    {"image": base64 data URL}. Used by the webcam face attendance page,
+    which encodes its next frame as the returned `capture` profile says.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'POST only'}, status=405)
 
     session = get_object_or_404(AttendanceSession, pk=pk)
-    data = json.loads(request.body)
-    image_data = data.get('image', '')
+    try:
+        img_bytes = _webcam_frame(request)
+    except ImageRejected as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
 
-    if not image_data:
+    if not img_bytes:
         return JsonResponse({'error': 'No image data'}, status=400)
 
-    students = Student.objects.filter(
-        department=session.course.department,
-        section=session.section,
-        is_active=True,
-        face_enrolled=True
-    )
+    roster = get_roster(session.course.department_id, session.section)
 
-    # Save image to temp file
-    tmp_path = None
     try:
-        if ',' in image_data:
-            _, imgstr = image_data.split(',', 1)
-        else:
-            imgstr = image_data
-
-        img_bytes = base64.b64decode(imgstr)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-            tmp.write(img_bytes)
-            tmp_path = tmp.name
-
-        from .face_utils import recognize_faces_bulk
-        recognized = recognize_faces_bulk(tmp_path, students)
-
-        # Auto-mark recognized students as present
-        newly_marked = []
-        for student_id, confidence in recognized.items():
-            try:
-                record = AttendanceRecord.objects.get(session=session, student_id=student_id)
-                if record.status != 'present':
-                    record.status = 'present'
-                    record.method = 'face'
-                    record.face_confidence = confidence
-                    record.save()
-                    newly_marked.append({
-                        'student_id': student_id,
-                        'name': record.student.name,
-                        'roll': record.student.roll_number,
-                        'confidence': confidence
-                    })
-            except AttendanceRecord.DoesNotExist:
-                pass
+        from .calibration import get_threshold
+        threshold = get_threshold(session.course.department_id, session.section)
+        recognized, cached, rejected = recognize_image(img_bytes, roster, threshold,
+                                                       session.course.department_id, session.section)
+
+        # Auto-mark recognized students as present (buffered, see coalescer.py)
+        newly_marked, total_present = coalescer.mark_present(session.pk, recognized, roster['students'])
 
         return JsonResponse({
             'success': True,
             'recognized': newly_marked,
-            'total_present': AttendanceRecord.objects.filter(session=session, status='present').count()
+            'total_present': total_present,
+            'cached': cached,
+            'rejected': rejected,  # faces too poor to recognize: worth a rescan
+            'capture': _capture_profile(),
         })
 
+    except ImageRejected as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
 
 
 @login_required
+@admission_controlled
 def api_upload_recognize(request, pk):
     """
     POST: uploaded photo file → recognize and mark attendance.
@@ -190,67 +182,139 @@ def api_upload_recognize(request, pk):
     if not photo:
         return JsonResponse({'error': 'No photo uploaded'}, status=400)
 
-    students = Student.objects.filter(
-        department=session.course.department,
-        section=session.section,
-        is_active=True,
-        face_enrolled=True
-    )
+    roster = get_roster(session.course.department_id, session.section)
 
-    tmp_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-            for chunk in photo.chunks():
-                tmp.write(chunk)
-            tmp_path = tmp.name
+        data = read_upload(photo)
+        tiled = {'1': True, '0': False}.get(request.POST.get('tiled'))
 
-        from .face_utils import recognize_faces_bulk
-        recognized = recognize_faces_bulk(tmp_path, students)
+        from .calibration import get_threshold
+        threshold = get_threshold(session.course.department_id, session.section)
+        recognized, cached, rejected = recognize_image(data, roster, threshold,
+                                                       session.course.department_id, session.section, tiled=tiled)
 
-        newly_marked = []
-        for student_id, confidence in recognized.items():
-            try:
-                record = AttendanceRecord.objects.get(session=session, student_id=student_id)
-                if record.status != 'present':
-                    record.status = 'present'
-                    record.method = 'face'
-                    record.face_confidence = confidence
-                    record.save()
-                    newly_marked.append({
-                        'student_id': student_id,
-                        'name': record.student.name,
-                        'roll': record.student.roll_number,
-                        'confidence': confidence
-                    })
-            except AttendanceRecord.DoesNotExist:
-                pass
+        newly_marked = apply_face_matches(session, recognized)
 
         return JsonResponse({
             'success': True,
             'recognized': newly_marked,
-            'total': len(newly_marked)
+            'total': len(newly_marked),
+            'cached': cached,
+            'rejected': rejected,
         })
 
+    except ImageRejected as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+
+
+@login_required
+@admission_controlled
+def api_batch_recognize(request, pk):
+    """
+    POST: several photos of one class ('photos', or a zip as 'archive') →
+    recognized as one batch and marked in a single write.
+    Streams one JSON line per processed image, then a final summary line.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+
+    session = get_object_or_404(AttendanceSession, pk=pk)
+    try:
+        images = _batch_images(request)
+    except ImageRejected as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    if not images:
+        return JsonResponse({'error': 'No photos uploaded'}, status=400)
+
+    roster = get_roster(session.course.department_id, session.section)
+    tiled = {'1': True, '0': False}.get(request.POST.get('tiled'))
+
+    def progress():
+        from .face_utils import match_face_vectors
+        from .calibration import get_threshold
+
+        face_vectors, rejected = [], 0
+        for index, (name, data) in enumerate(images, 1):
+            line = {'image': name, 'index': index, 'count': len(images)}
+            started = time.monotonic()
+            try:
+                vectors, unclear = embed_image(data, tiled)
+                face_vectors.extend(vectors)
+                rejected += unclear
+                line['faces'], line['rejected'] = len(vectors), unclear
+            except ImageRejected as e:
+                line['error'] = str(e)
+            line['ms'] = round((time.monotonic() - started) * 1000)
+            yield json.dumps(line) + '\n'
+
+        try:
+            # Matching all photos together assigns each student once, so a
+            # face seen in several photos is only counted for its best match.
+            threshold = get_threshold(session.course.department_id, session.section)
+            recognized = match_face_vectors(face_vectors, (roster['ids'], roster['matrix']), threshold)
+            newly_marked = apply_face_matches(session, recognized)
+            yield json.dumps({
+                'done': True,
+                'success': True,
+                'recognized': newly_marked,
+                'total': len(newly_marked),
+                'faces': len(face_vectors),
+                'rejected': rejected,
+            }) + '\n'
+        except Exception as e:
+            yield json.dumps({'done': True, 'error': str(e)}) + '\n'
+
+    return StreamingHttpResponse(progress(), content_type='application/x-ndjson')
+
+
+@login_required
+@admission_controlled
+def api_video_recognize(request, pk):
+    """
+    POST: a recorded lecture ('video') → students seen in it marked present.
+    Streams a JSON progress line every few seconds, then a final summary line.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+
+    session = get_object_or_404(AttendanceSession, pk=pk)
+    video = request.FILES.get('video')
+    if not video:
+        return JsonResponse({'error': 'No video uploaded'}, status=400)
+    max_bytes = getattr(settings, 'FACE_VIDEO_MAX_BYTES', 2 * 1024 ** 3)
+    if video.size > max_bytes:
+        return JsonResponse({'error': f'Video exceeds {max_bytes // (1024 * 1024)} MB'}, status=413)
+    tiled = {'1': True, '0': False}.get(request.POST.get('tiled'))
+    path, temporary = _upload_path(video)
+
+    def progress():
+        from .video import VideoIngest
+
+        try:
+            ingest = VideoIngest.for_session(session, tiled=tiled)
+            for stats in ingest.stream(path):
+                yield json.dumps(dict(stats, progress=True)) + '\n'
+            newly_marked = apply_face_matches(session, ingest.best)
+            yield json.dumps(dict(ingest.stats(), done=True, success=True,
+                                  recognized=newly_marked, total=len(newly_marked))) + '\n'
+        except Exception as e:
+            yield json.dumps({'done': True, 'error': str(e)}) + '\n'
+        finally:
+            if temporary:
+                os.unlink(path)
+
+    return StreamingHttpResponse(progress(), content_type='application/x-ndjson')
 
 
 @login_required
 def api_session_stats(request, pk):
     session = get_object_or_404(AttendanceSession, pk=pk)
-    records = AttendanceRecord.objects.filter(session=session)
-    return JsonResponse({
-        'present': session.present_count(),
-        'absent': session.absent_count(),
-        'late': session.late_count(),
-        'total': session.total_students(),
-        'percentage': session.percentage(),
-        'face_marked': records.filter(method='face').count(),
-        'manual_marked': records.filter(method='manual').count(),
-    })
+    coalescer.flush(session.pk)
+    counts = session.status_counts()
+    return JsonResponse({key: counts[key] for key in
+                         ('present', 'absent', 'late', 'total', 'percentage', 'face_marked', 'manual_marked')})
 
 
 @login_required
@@ -258,15 +322,16 @@ def finalize_face_session(request, pk):
     """Finalize session after face recognition."""
     session = get_object_or_404(AttendanceSession, pk=pk)
     if request.method == 'POST':
+        coalescer.discard(session.pk)
         # Handle any manual overrides submitted with the form
-        students = Student.objects.filter(
-            department=session.course.department,
-            section=session.section, is_active=True
-        )
-        _send_absence_notifications(session, students)
+        students = get_roster(session.course.department_id, session.section)['students']
+        # inactive before notifying: buffered face marks of other processes are dropped from now on
         session.is_active = False
         session.end_time = timezone.now().time()
         session.save()
+        _send_absence_notifications(session, students)
+        refresh_rollup(session)
+        refresh_bitmaps(session)
         messages.success(request, f"✅ Session finalized! Present: {session.present_count()}, Absent: {session.absent_count()}")
         return redirect('session_report', pk=pk)
     return redirect('face_attendance', pk=pk)
@@ -277,10 +342,11 @@ def finalize_face_session(request, pk):
 @login_required
 def session_report(request, pk):
     session = get_object_or_404(AttendanceSession, pk=pk)
+    coalescer.flush(session.pk)
     records = AttendanceRecord.objects.filter(session=session).select_related('student').order_by('student__roll_number')
     role, _ = get_role(request.user)
     return render(request, 'attendance/session_report.html', {
-        'session': session, 'records': records, 'role': role
+        'session': session, 'records': records, 'counts': session.status_counts(), 'role': role
     })
 
 
@@ -301,13 +367,113 @@ def all_sessions(request):
     if course_filter:
         sessions = sessions.filter(course__id=course_filter)
 
+    sessions = sessions.select_related('course', 'faculty').annotate(
+        num_present=Count('attendancerecord', filter=Q(attendancerecord__status='present')),
+        num_absent=Count('attendancerecord', filter=Q(attendancerecord__status='absent')),
+    )
+    page = keyset_paginate(request, sessions, ['-date', '-start_time', '-id'])
+
     courses = Course.objects.filter(department=profile.department)
     return render(request, 'attendance/all_sessions.html', {
-        'sessions': sessions, 'courses': courses,
+        'sessions': page, 'page': page, 'courses': courses,
         'date_filter': date_filter, 'course_filter': course_filter, 'role': role
     })
 
 
+@login_required
+def analytics_view(request):
+    """HOD trends by day, week and course, read from DailyRollup only."""
+    role, profile = get_role(request.user)
+    if role != 'hod':
+        return redirect('dashboard')
+
+    days = request.GET.get('days', '30')
+    days = int(days) if days.isdigit() else 30
+    since = date.today() - timedelta(days=days)
+    rollups = DailyRollup.objects.filter(department=profile.department, date__gte=since)
+    totals = {k: Sum(k) for k in ('present', 'late', 'absent', 'total')}
+
+    def with_pct(rows, label):
+        return [{
+            'label': str(r[label]), 'present': r['present'], 'late': r['late'],
+            'absent': r['absent'], 'total': r['total'],
+            'percentage': round(r['present'] / r['total'] * 100, 1) if r['total'] else 0,
+        } for r in rows]
+
+    daily = with_pct(rollups.values('date').annotate(**totals).order_by('date'), 'date')
+    weekly = with_pct(rollups.annotate(week=TruncWeek('date')).values('week')
+                      .annotate(**totals).order_by('week'), 'week')
+    by_course = with_pct(rollups.values('course__code').annotate(**totals).order_by('course__code'), 'course__code')
+
+    return render(request, 'attendance/analytics.html', {
+        'daily': daily, 'weekly': weekly, 'by_course': by_course,
+        'days': days, 'role': role,
+    })
+
+
+# ── EXPORTS ───────────────────────────────────────────────────────────────────
+
+@login_required
+def export_session(request, pk):
+    role, profile = get_role(request.user)
+    if role not in ('faculty', 'hod'):
+        return redirect('dashboard')
+    session = get_object_or_404(AttendanceSession, pk=pk)
+    coalescer.flush(session.pk)
+    return register_response(
+        AttendanceSession.objects.filter(pk=session.pk),
+        f"{session.course.code}_{session.date}_{session.section}",
+        request.GET.get('format', 'csv'))
+
+
+@login_required
+def export_course(request, course_id):
+    """
+    Register of one course, optionally limited to ?from=YYYY-MM-DD&to=YYYY-MM-DD.
+    An HOD can export only their own department's courses.
+    """
+    role, profile = get_role(request.user)
+    if role not in ('faculty', 'hod'):
+        return redirect('dashboard')
+    courses = Course.objects.filter(department=profile.department) if role == 'hod' else Course.objects.all()
+    course = get_object_or_404(courses, pk=course_id)
+    sessions = AttendanceSession.objects.filter(course=course)
+    if role == 'faculty':
+        sessions = sessions.filter(faculty=profile)
+    try:
+        sessions = _date_range(request, sessions)
+    except ValueError:
+        messages.error(request, "Dates must be in YYYY-MM-DD format.")
+        return redirect('all_sessions')
+    if request.GET.get('section'):
+        sessions = sessions.filter(section=request.GET['section'])
+    return register_response(sessions, f"{course.code}_register", request.GET.get('format', 'csv'))
+
+
+@login_required
+def export_semester(request):
+    """Whole-department register for the students of ?semester=N (HOD only)."""
+    role, profile = get_role(request.user)
+    if role != 'hod':
+        return redirect('dashboard')
+    semester = request.GET.get('semester', '')
+    if not semester.isdigit():
+        messages.error(request, "Choose a semester to export.")
+        return redirect('all_sessions')
+    records = AttendanceRecord.objects.filter(student__semester=int(semester))
+    # only the sessions the semester's students were registered in, not every course of the department
+    sessions = AttendanceSession.objects.filter(
+        Exists(records.filter(session=OuterRef('pk'))), course__department=profile.department)
+    try:
+        sessions = _date_range(request, sessions)
+    except ValueError:
+        messages.error(request, "Dates must be in YYYY-MM-DD format.")
+        return redirect('all_sessions')
+    return register_response(
+        sessions, f"{profile.department.code}_sem{semester}_register",
+        request.GET.get('format', 'csv'), records=records)
+
+
 @login_required
 def absentees_report(request):
     role, profile = get_role(request.user)
@@ -320,11 +486,12 @@ def absentees_report(request):
 
     absentees = AttendanceRecord.objects.filter(
         session__in=sessions, status='absent'
-    ).select_related('student', 'session__course').order_by('student__roll_number')
+    ).select_related('student', 'session__course')
+    page = keyset_paginate(request, absentees, ['student__roll_number', 'id'])
 
     courses = Course.objects.filter(department=profile.department)
     return render(request, 'attendance/absentees_report.html', {
-        'absentees': absentees, 'target_date': target_date,
+        'absentees': page, 'page': page, 'absent_total': absentees.count(), 'target_date': target_date,
         'courses': courses, 'course_id': course_id, 'role': role
     })
 
@@ -334,21 +501,103 @@ def notifications_view(request):
     role, profile = get_role(request.user)
     if role != 'student':
         return redirect('dashboard')
-    notifs = Notification.objects.filter(student=profile).order_by('-sent_at')
-    notifs.update(is_read=True)
-    return render(request, 'attendance/notifications.html', {'notifications': notifs})
+    notifs = Notification.objects.filter(student=profile)
+    notifs.filter(is_read=False).update(is_read=True)
+    page = keyset_paginate(request, notifs, ['-sent_at', '-id'])
+    return render(request, 'attendance/notifications.html', {'notifications': page, 'page': page})
 
 
 # ── HELPER ────────────────────────────────────────────────────────────────────
 
+def _batch_images(request):
+    """[(name, bytes)] from the 'photos' files or a zip 'archive', within the upload limits."""
+    max_images = getattr(settings, 'FACE_BATCH_MAX_IMAGES', 10)
+    max_bytes = getattr(settings, 'FACE_UPLOAD_MAX_BYTES', 25 * 1024 * 1024)
+    images = [(f.name, read_upload(f)) for f in request.FILES.getlist('photos')[:max_images + 1]]
+
+    archive = request.FILES.get('archive')
+    if archive:
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                members = [m for m in zf.infolist() if _is_image_entry(m)]
+                if len(images) + len(members) > max_images:
+                    raise ImageRejected(f'At most {max_images} photos per batch', status=413)
+                for m in members:
+                    if m.file_size > max_bytes:
+                        raise ImageRejected(f'{m.filename} exceeds {max_bytes // (1024 * 1024)} MB', status=413)
+                    images.append((m.filename, zf.read(m)))
+        except zipfile.BadZipFile:
+            raise ImageRejected('Archive is not a valid zip file')
+
+    if len(images) > max_images:
+        raise ImageRejected(f'At most {max_images} photos per batch', status=413)
+    return images
+
+
+def _date_range(request, sessions):
+    """sessions limited to ?from= and ?to=; ValueError when either is not a YYYY-MM-DD date."""
+    if request.GET.get('from'):
+        sessions = sessions.filter(date__gte=date.fromisoformat(request.GET['from']))
+    if request.GET.get('to'):
+        sessions = sessions.filter(date__lte=date.fromisoformat(request.GET['to']))
+    return sessions
+
+
+def _is_image_entry(member):
+    """A zip entry worth recognizing: an image file, not a folder, __MACOSX/ fork or hidden file."""
+    parts = member.filename.split('/')
+    return (not member.is_dir() and parts[0] != '__MACOSX' and not any(p.startswith('.') for p in parts if p != '.')
+            and parts[-1].lower().endswith(IMAGE_EXTENSIONS))
+
+
+def _webcam_frame(request):
+    """Frame bytes of a recognize request: the raw image body, or the JSON body's base64 data URL."""
+    if request.content_type.startswith('image/'):
+        return read_body(request)
+    try:
+        image_data = json.loads(request.body or b'{}').get('image') or ''
+    except (ValueError, AttributeError):
+        raise ImageRejected('Expected an image body or JSON {"image": data URL}')
+    if ',' in image_data:
+        _, image_data = image_data.split(',', 1)
+    try:
+        return base64.b64decode(image_data)
+    except binascii.Error:
+        raise ImageRejected('Unreadable image')
+
+
+def _capture_profile():
+    """How the webcam page should encode its frames: first supported type, quality, long-edge cap."""
+    from .admission import admission
+
+    max_edge = min(getattr(settings, 'FACE_CAPTURE_MAX_EDGE', 1280),
+                   getattr(settings, 'FACE_DETECTION_MAX_EDGE', 1600))
+    if admission.waiting:
+        # requests are queueing for a pipeline: smaller frames decode and detect faster
+        max_edge = min(max_edge, getattr(settings, 'FACE_CAPTURE_BUSY_MAX_EDGE', 960))
+    return {
+        'types': list(getattr(settings, 'FACE_CAPTURE_TYPES', ['image/webp', 'image/jpeg'])),
+        'quality': getattr(settings, 'FACE_CAPTURE_QUALITY', 0.8),
+        'max_edge': max_edge,
+    }
+
+
+def _upload_path(uploaded_file):
+    """(filesystem path, is temporary copy) of an upload, for readers that need a file (cv2.VideoCapture)."""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return uploaded_file.temporary_file_path(), False
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        for chunk in uploaded_file.chunks():
+            f.write(chunk)
+    return f.name, True
+
+
 def _send_absence_notifications(session, students):
-    absent_records = AttendanceRecord.objects.filter(session=session, status='absent')
-    for record in absent_records:
-        Notification.objects.create(
-            student=record.student,
-            message=(f"⚠️ Absent Alert: You were marked ABSENT in "
-                     f"{session.course.name} ({session.course.code}) "
-                     f"on {session.date}. Section: {session.section}. "
-                     f"Please maintain 75%+ attendance."),
-            notif_type='absence'
-        )
+    absent_ids = AttendanceRecord.objects.filter(session=session, status='absent').values_list('student_id', flat=True)
+    message = (f"⚠️ Absent Alert: You were marked ABSENT in "
+               f"{session.course.name} ({session.course.code}) "
+               f"on {session.date}. Section: {session.section}. "
+               f"Please maintain 75%+ attendance.")
+    Notification.objects.bulk_create(
+        [Notification(student_id=student_id, message=message, notif_type='absence') for student_id in absent_ids])
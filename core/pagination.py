@@ -0,0 +1,110 @@
+"""
+Keyset (seek) pagination for list views.
+Pages are addressed by the ordering values of the last/first row shown, so
+each page is one indexed range query no matter how deep into history it is,
+unlike OFFSET. The ordering must end in a unique field (e.g. 'id').
+"""
+import base64
+import datetime
+import json
+from functools import reduce
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """
+    Datetimes and times at full precision: DjangoJSONEncoder cuts them to
+    milliseconds, and the seek would then skip rows sharing the cursor's millisecond.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _encode(values):
+    raw = json.dumps(values, cls=_CursorEncoder).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) and len(values) == size else None
+
+
+def _value(obj, field):
+    for part in field.split('__'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _seek(ordering, values, forward):
+    """Rows strictly after (forward) or before `values` in `ordering`."""
+    clauses = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        op = 'lt' if descending == forward else 'gt'
+        equal = {f.lstrip('-'): v for f, v in zip(ordering[:i], values[:i])}
+        clauses.append(Q(**equal, **{f'{name}__{op}': values[i]}))
+    return reduce(lambda a, b: a | b, clauses)
+
+
+class KeysetPage:
+    def __init__(self, object_list, request, ordering, has_next, has_prev):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_prev
+        self._request = request
+        self._ordering = ordering
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _query(self, key, obj):
+        params = self._request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[key] = _encode([_value(obj, f.lstrip('-')) for f in self._ordering])
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query('after', self.object_list[-1]) if self.has_next and self.object_list else ''
+
+    @property
+    def previous_query(self):
+        return self._query('before', self.object_list[0]) if self.has_previous and self.object_list else ''
+
+
+def keyset_paginate(request, queryset, ordering, per_page=None):
+    """
+    Page of `queryset` ordered by `ordering`, positioned by the 'after' or
+    'before' cursor in the query string.
+    """
+    per_page = per_page or getattr(settings, 'KEYSET_PAGE_SIZE', 50)
+    ordering = list(ordering)
+    after = _decode(request.GET.get('after', ''), len(ordering))
+    before = _decode(request.GET.get('before', ''), len(ordering)) if after is None else None
+
+    if before is not None:
+        reverse = [f[1:] if f.startswith('-') else f'-{f}' for f in ordering]
+        rows = list(queryset.filter(_seek(ordering, before, False)).order_by(*reverse)[:per_page + 1])
+        has_prev = len(rows) > per_page
+        return KeysetPage(rows[:per_page][::-1], request, ordering, True, has_prev)
+
+    qs = queryset.order_by(*ordering)
+    if after is not None:
+        qs = qs.filter(_seek(ordering, after, True))
+    rows = list(qs[:per_page + 1])
+    return KeysetPage(rows[:per_page], request, ordering, len(rows) > per_page, after is not None)
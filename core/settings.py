@@ -25,6 +25,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,9 +54,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL lets readers run alongside the single writer; writers wait up to
+        # `timeout` seconds for the lock instead of failing with "database is locked".
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smartattend',
     }
 }
 
+# Outgoing email (parent absence digests, `manage.py send_digests`). Locally:
+# python -m aiosmtpd -n -l localhost:1025   (pip install aiosmtpd)
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 1025
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = 'LPU SmartAttend <attendance@lpu.in>'
+NOTIFY_DIGEST_TIME = '18:00'       # local time of the daily digest; later absences wait for the next one
+NOTIFY_DIGEST_INTERVAL = 300       # seconds between `send_digests --loop` runs
+NOTIFY_EMAIL_RETRIES = 3           # reconnect-and-retry attempts per digest
+NOTIFY_EMAIL_RETRY_DELAY = 1.0     # seconds before the first retry, doubled after each
+
+ROSTER_CACHE_TIMEOUT = 3600  # seconds; student/embedding changes bump the section's revision, retiring entries in every process
+ROLE_CACHE_TIMEOUT = 300     # seconds; profile create/delete drops entries immediately
+EMBEDDING_VERSION_CACHE_TIMEOUT = 30  # seconds other workers may keep using the store `reembed` swapped out
+THRESHOLD_CACHE_TIMEOUT = 30  # seconds other workers may keep using thresholds `calibrate_thresholds` replaced
+
 AUTH_PASSWORD_VALIDATORS = []  # Disabled for easy dev
 
 LANGUAGE_CODE = 'en-us'
@@ -69,16 +101,96 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Student photo thumbnails for list views (accounts/thumbnails.py), WebP + JPEG under MEDIA_ROOT/thumbs
+STUDENT_THUMBNAIL_SIZES = {'avatar': 80, 'card': 480}  # name -> square edge in px
+STUDENT_THUMBNAIL_QUALITY = 80                         # WebP/JPEG encoder quality
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+KEYSET_PAGE_SIZE = 50  # rows per page on session/student/absentee/notification lists
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
 # Face Recognition Settings
-FACE_RECOGNITION_MODEL = 'VGG-Face'
+FACE_RECOGNITION_MODEL = 'VGG-Face'  # initial store; switch models with `manage.py reembed --model ...`
 FACE_RECOGNITION_DISTANCE = 'cosine'
-FACE_RECOGNITION_THRESHOLD = 0.4
+FACE_RECOGNITION_THRESHOLD = 0.4  # fallback until `manage.py calibrate_thresholds` has run
+FACE_EMBEDDER = 'deepface'        # 'standin': cheap deterministic embedder for load tests (attendance/standin.py)
+FACE_DUPLICATE_THRESHOLD = None   # distance below which two enrolled faces count as one person; None = ratio below
+FACE_DUPLICATE_RATIO = 0.5        # of the model-wide recognition threshold
+FACE_ENROLL_BACKGROUND = True     # embed new photos and render their thumbnails in a worker thread; False = leave them to `manage.py process_enrollments`
+FACE_ENROLL_WORKERS = 1           # enrollment threads per web process
+
+# Upload ingestion limits for face recognition
+FACE_UPLOAD_MAX_BYTES = 25 * 1024 * 1024  # reject larger uploads with 413
+FACE_UPLOAD_MAX_PIXELS = 60_000_000       # decompression-bomb guard
+FACE_DETECTION_MAX_EDGE = 1600            # long edge of the image detection runs on
+FACE_CROP_MIN_SIDE = 160                  # face crops are re-decoded up to this size
+FACE_BATCH_MAX_IMAGES = 10                # photos per batch-recognize request
+FACE_VIDEO_MAX_BYTES = 2 * 1024 ** 3      # recorded-lecture uploads
+
+# Webcam frame encoding, sent to the page with every recognition answer
+FACE_CAPTURE_TYPES = ['image/webp', 'image/jpeg']  # the first one the browser can encode is used
+FACE_CAPTURE_QUALITY = 0.8
+FACE_CAPTURE_MAX_EDGE = 1280       # long edge of uploaded frames (capped at FACE_DETECTION_MAX_EDGE)
+FACE_CAPTURE_BUSY_MAX_EDGE = 960   # while recognition requests are queueing
+
+# Face quality gate (attendance/quality.py): recognition skips failing crops, enrollment rejects failing photos
+FACE_QUALITY_GATE = True
+FACE_QUALITY_MIN_SIDE = 40            # px of a face worth embedding at recognition
+FACE_QUALITY_ENROLL_MIN_SIDE = 112    # px of an enrollment photo's face
+FACE_QUALITY_MIN_SHARPNESS = 25.0     # variance of the Laplacian of the face at 112x112
+FACE_QUALITY_BRIGHTNESS = (40, 220)   # allowed mean grey level of the face
+FACE_QUALITY_MAX_YAW = 0.35           # nose offset from the eye midpoint / eye distance (needs landmarks)
+FACE_QUALITY_MAX_ROLL = 25            # degrees of eye-line tilt (needs landmarks)
+
+# Tiled detection for wide lecture-hall photos
+FACE_TILED_DETECTION = 'auto'  # True / False / 'auto' (tile when a first pass only finds small faces)
+FACE_TILE_SMALL_FACE = 32      # px at detection size; 'auto' tiles when the smallest face found is below this
+FACE_TILE_MAX_EDGE = 4096      # long edge of the image the tiles are cut from
+FACE_TILE_SIZE = 1024
+FACE_TILE_OVERLAP = 0.25
+FACE_TILE_WORKERS = 4
+
+# Buffered attendance writes from webcam sessions (attendance/coalescer.py)
+FACE_WRITE_FLUSH_INTERVAL = 1.0  # seconds a recognized mark may wait before it is written
+FACE_WRITE_BATCH_SIZE = 200      # pending marks that trigger an immediate flush
+FACE_WRITE_STATE_TTL = 600       # seconds an idle session's in-memory state is kept
+
+# Recognition results of byte-identical images (attendance/result_cache.py)
+FACE_RESULT_CACHE_ENTRIES = 256
+FACE_RESULT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Admission control for the recognition endpoints (attendance/admission.py)
+FACE_RECOGNITION_CONCURRENCY = 2     # model pipelines per worker process
+FACE_RECOGNITION_QUEUE_DEPTH = 8     # requests allowed to wait for a pipeline; more get 503
+FACE_RECOGNITION_QUEUE_TIMEOUT = 10  # seconds a request waits before giving up with 503
+FACE_RECOGNITION_RETRY_AFTER = 5     # Retry-After seconds sent with 503
+FACE_SESSION_MIN_INTERVAL = 2.0      # seconds between recognitions of one session per endpoint; faster gets 429
+
+# Recorded-lecture ingestion (attendance/video.py)
+FACE_VIDEO_PROBE_INTERVAL = 0.5  # seconds of video between frames checked for a scene change
+FACE_VIDEO_SCENE_CHANGE = 8.0    # mean grey-level difference that makes a checked frame a sample
+FACE_VIDEO_MAX_GAP = 10.0        # seconds of video after which a frame is sampled regardless
+FACE_VIDEO_TRACK_REFRESH = 5     # samples a tracked face keeps its identity before being re-embedded
+
+# Fixed classroom cameras (`manage.py camera_ingest`, attendance/cameras.py)
+FACE_CAMERAS = {}                 # room -> device index, stream URL or video file, e.g. {'34-201': 0}
+FACE_CAMERA_INTERVAL = 2.0        # seconds between frames offered per camera
+FACE_CAMERA_QUEUE_SIZE = 8        # frames waiting for recognition; the oldest is dropped beyond this
+FACE_CAMERA_WORKERS = 2           # recognition threads shared by all cameras
+FACE_CAMERA_MAX_AGE = 10.0        # seconds after which a queued frame is discarded as stale
+FACE_CAMERA_SESSION_REFRESH = 30  # seconds between lookups of a room's active session
+
+# Shared recognition server (`manage.py recognition_server`, attendance/recognizer.py)
+FACE_RECOGNIZER_ADDRESS = ''          # 'unix:/run/smartattend/recognizer.sock' or '127.0.0.1:8765'; '' = in-process (unauthenticated: keep it local)
+FACE_RECOGNIZER_TIMEOUT = 5.0         # socket timeout in seconds
+FACE_RECOGNIZER_JOB_TIMEOUT = 60.0    # seconds to wait for one batch photo, video frame or enrollment hand-off
+FACE_RECOGNIZER_BATCH_WINDOW = 0.005  # seconds a request waits for others to share its frame
+FACE_RECOGNIZER_BATCH_SIZE = 16       # images per frame
+FACE_RECOGNIZER_FALLBACK = True       # recognize in-process when the server is down or times out
+FACE_RECOGNIZER_RETRY_INTERVAL = 10   # seconds to skip an unreachable server before trying again
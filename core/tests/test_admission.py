@@ -0,0 +1,101 @@
+"""
+Admission control (attendance/admission.py): a session scanning faster than
+FACE_SESSION_MIN_INTERVAL gets 429 per endpoint, a full or stalled queue
+gets 503, both with Retry-After, and a streamed response holds its pipeline
+slot until the stream is consumed or closed.
+"""
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from attendance.admission import admission, admission_controlled
+
+
+@admission_controlled
+def recognize(request, pk):
+    return JsonResponse({'success': True})
+
+
+@admission_controlled
+def upload(request, pk):
+    return JsonResponse({'success': True})
+
+
+@admission_controlled
+def stream(request, pk):
+    return StreamingHttpResponse(iter([b'{"image": 1}\n', b'{"done": true}\n']))
+
+
+@admission_controlled
+def broken(request, pk):
+    raise RuntimeError('pipeline failed')
+
+
+@override_settings(FACE_RECOGNITION_CONCURRENCY=1, FACE_RECOGNITION_QUEUE_DEPTH=0,
+                   FACE_RECOGNITION_QUEUE_TIMEOUT=0.05, FACE_RECOGNITION_RETRY_AFTER=7,
+                   FACE_SESSION_MIN_INTERVAL=0)
+class AdmissionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        admission._slots = None
+        self.request = RequestFactory().post('/')
+
+    def tearDown(self):
+        self.assertEqual(admission.running, 0)
+        self.assertEqual(admission.waiting, 0)
+
+    @override_settings(FACE_SESSION_MIN_INTERVAL=2)
+    def test_scanning_too_fast_is_429_per_endpoint(self):
+        self.assertEqual(recognize(self.request, 1).status_code, 200)
+        response = recognize(self.request, 1)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(response['Retry-After'], ('1', '2'))
+        self.assertEqual(upload(self.request, 1).status_code, 200)
+        self.assertEqual(recognize(self.request, 2).status_code, 200)
+
+    def test_full_queue_is_503(self):
+        slots = admission.acquire(99, scope='webcam')
+        try:
+            response = recognize(self.request, 1)
+        finally:
+            admission.release(slots)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(recognize(self.request, 1).status_code, 200)
+
+    @override_settings(FACE_RECOGNITION_QUEUE_DEPTH=1)
+    def test_queue_timeout_is_503(self):
+        slots = admission.acquire(99, scope='webcam')
+        try:
+            response = recognize(self.request, 1)
+        finally:
+            admission.release(slots)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(b'busy', response.content)
+
+    def test_streamed_response_holds_its_slot_until_consumed(self):
+        response = stream(self.request, 1)
+        self.assertEqual(admission.running, 1)
+        self.assertEqual(recognize(self.request, 2).status_code, 503)
+        self.assertEqual(b''.join(response.streaming_content), b'{"image": 1}\n{"done": true}\n')
+        self.assertEqual(admission.running, 0)
+        response.close()
+
+    def test_unread_stream_releases_its_slot_on_close(self):
+        response = stream(self.request, 1)
+        self.assertEqual(admission.running, 1)
+        response.close()
+        self.assertEqual(admission.running, 0)
+        self.assertEqual(recognize(self.request, 2).status_code, 200)
+
+    def test_failing_view_releases_its_slot(self):
+        with self.assertRaises(RuntimeError):
+            broken(self.request, 1)
+        self.assertEqual(recognize(self.request, 2).status_code, 200)
+
+    def test_get_is_not_admission_controlled(self):
+        slots = admission.acquire(99, scope='webcam')
+        try:
+            self.assertEqual(recognize(RequestFactory().get('/'), 1).status_code, 200)
+        finally:
+            admission.release(slots)
@@ -0,0 +1,70 @@
+"""
+Buffered webcam marks (attendance/coalescer.py): marks stay in memory until
+a flush, finalize writes the web process's own buffer before notifying, and
+a second process's buffer (the camera_ingest daemon) that flushes after the
+finalize is dropped instead of turning notified absences into presences.
+"""
+from datetime import date, time
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import Department, Faculty, Student, Course
+from attendance.coalescer import WriteCoalescer, coalescer
+from attendance.models import AttendanceSession, AttendanceRecord, Notification
+
+
+@override_settings(FACE_WRITE_FLUSH_INTERVAL=3600, FACE_WRITE_BATCH_SIZE=1000,
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CoalescerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dept = Department.objects.create(name='Computer Science', code='CSE')
+        faculty = Faculty.objects.create(user=User.objects.create_user('fac', password='x'), name='F',
+                                         employee_id='F1', email='f@x.c', department=dept)
+        course = Course.objects.create(name='Data Structures', code='CSE301', department=dept)
+        cls.session = AttendanceSession.objects.create(course=course, faculty=faculty, date=date(2026, 9, 1),
+                                                       start_time=time(9), section='A', mode='face')
+        students = [Student.objects.create(name=f'S{i}', roll_number=f'R{i:02d}', email='s@x.c',
+                                           department=dept, section='A') for i in range(4)]
+        AttendanceRecord.objects.bulk_create(
+            [AttendanceRecord(session=cls.session, student=s, status='absent') for s in students])
+        cls.roster = [{'id': s.pk, 'name': s.name, 'roll_number': s.roll_number} for s in students]
+
+    def setUp(self):
+        self.client.login(username='fac', password='x')
+        self.addCleanup(coalescer.discard, self.session.pk)
+
+    def _mark(self, buffer, *indexes):
+        return buffer.mark_present(self.session.pk, {self.roster[i]['id']: 90.0 for i in indexes}, self.roster)
+
+    def _present(self):
+        return set(AttendanceRecord.objects.filter(session=self.session, status='present')
+                   .values_list('student_id', flat=True))
+
+    def test_marks_wait_for_flush(self):
+        newly_marked, total = self._mark(coalescer, 0, 1)
+        self.assertEqual((len(newly_marked), total), (2, 2))
+        self.assertEqual(self._mark(coalescer, 1)[0], [])
+        self.assertEqual(self._present(), set())
+        self.assertEqual(coalescer.flush(self.session.pk), 2)
+        self.assertEqual(self._present(), {self.roster[0]['id'], self.roster[1]['id']})
+
+    def test_finalize_writes_own_buffer_and_drops_late_daemon_marks(self):
+        daemon = WriteCoalescer()
+        self._mark(coalescer, 0)
+        self._mark(daemon, 1)
+
+        response = self.client.post(reverse('finalize_face_session', args=[self.session.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self._present(), {self.roster[0]['id']})
+        notified = Notification.objects.filter(notif_type='absence')
+        self.assertEqual(set(notified.values_list('student_id', flat=True)),
+                         {s['id'] for s in self.roster[1:]})
+
+        with self.assertLogs('attendance.coalescer', 'WARNING'):
+            self.assertEqual(daemon.flush(), 0)
+        self.assertEqual(self._present(), {self.roster[0]['id']})
+        self.assertNotIn(self.session.pk, daemon._sessions)
+        self.assertEqual(daemon._pending, 0)
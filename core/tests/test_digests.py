@@ -0,0 +1,153 @@
+"""
+Parent email digests (attendance/digests.py): a digest is due at the first
+NOTIFY_DIGEST_TIME after its absences were recorded, so a parent gets at
+most one email per day; a dropped SMTP connection is reopened and the
+message retried; sent notifications are stamped in batches, and a crash
+mid-run keeps the unsent ones queued.
+"""
+import smtplib
+from datetime import datetime, date
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Department, Student
+from attendance import digests
+from attendance.models import Notification
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2026, 9, day, hour, minute))
+
+
+class FlakyBackend(EmailBackend):
+    """locmem backend whose server drops the next `drops` sends, refuses `refused` and can run a hook per send."""
+    drops = 0
+    refused = ()
+    on_send = None
+
+    def open(self):
+        if getattr(self, 'connected', False):
+            return False
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        cls = type(self)
+        if cls.drops:
+            cls.drops -= 1
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        for message in messages:
+            if set(message.to) & set(cls.refused):
+                raise smtplib.SMTPRecipientsRefused({to: (550, b'No such user') for to in message.to})
+        if cls.on_send:
+            cls.on_send(messages)
+        return super().send_messages(messages)
+
+
+@override_settings(NOTIFY_DIGEST_TIME='18:00')
+class DigestDayTests(SimpleTestCase):
+    def test_cutoff_is_the_last_digest_time_passed(self):
+        self.assertEqual(digests.digest_cutoff(_at(2, 19)), _at(2, 18))
+        self.assertEqual(digests.digest_cutoff(_at(2, 17, 59)), _at(1, 18))
+        self.assertEqual(digests.digest_cutoff(_at(2, 17), include_today=True), _at(2, 17))
+
+    def test_evening_absences_roll_into_the_next_day(self):
+        self.assertEqual(digests.digest_day(_at(2, 9)), date(2026, 9, 2))
+        self.assertEqual(digests.digest_day(_at(2, 17, 59)), date(2026, 9, 2))
+        self.assertEqual(digests.digest_day(_at(2, 18)), date(2026, 9, 3))
+
+
+@override_settings(EMAIL_BACKEND='core.tests.test_digests.FlakyBackend', NOTIFY_DIGEST_TIME='18:00',
+                   NOTIFY_EMAIL_RETRIES=3, NOTIFY_EMAIL_RETRY_DELAY=0)
+class DispatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dept = Department.objects.create(name='Computer Science', code='CSE')
+        cls.students = [Student.objects.create(name=f'S{i}', roll_number=f'R{i:02d}', email='s@x.c',
+                                               parent_email=f'p{i // 2}@x.c', department=dept)
+                        for i in range(10)]
+
+    def setUp(self):
+        FlakyBackend.drops, FlakyBackend.refused, FlakyBackend.on_send = 0, (), None
+
+    def _absent(self, student, when):
+        notification = Notification.objects.create(student=student, message=f'Absent {when:%H:%M}')
+        Notification.objects.filter(pk=notification.pk).update(sent_at=when)
+        return notification.pk
+
+    def _unsent(self):
+        return Notification.objects.filter(emailed_at__isnull=True, email_error='').count()
+
+    def test_one_digest_per_parent_per_day(self):
+        siblings = self.students[:2]
+        self._absent(siblings[0], _at(2, 10))
+        self._absent(siblings[1], _at(2, 12))
+        evening = self._absent(siblings[0], _at(2, 18, 30))
+
+        stats = digests.dispatch(now=_at(2, 19))
+        self.assertEqual((stats['sent'], stats['notifications']), (1, 2))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['p0@x.c'])
+        self.assertIn('02 Sep 2026: 2 absences', mail.outbox[0].subject)
+        self.assertEqual(digests.dispatch(now=_at(2, 23))['sent'], 0)
+
+        self.assertEqual(digests.dispatch(now=_at(3, 18, 5))['sent'], 1)
+        self.assertIn('03 Sep 2026: 1 absence', mail.outbox[1].subject)
+        self.assertIsNotNone(Notification.objects.get(pk=evening).emailed_at)
+
+    def test_dropped_connection_is_reopened_and_retried(self):
+        self._absent(self.students[0], _at(2, 10))
+        FlakyBackend.drops = 2
+        stats = digests.dispatch(now=_at(2, 19))
+        self.assertEqual((stats['sent'], stats['failed'], stats['reconnects']), (1, 0, 2))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self._unsent(), 0)
+
+    def test_digest_stays_queued_when_retries_run_out(self):
+        self._absent(self.students[0], _at(2, 10))
+        FlakyBackend.drops = 4
+        stats = digests.dispatch(now=_at(2, 19))
+        self.assertEqual((stats['sent'], stats['failed']), (0, 1))
+        self.assertEqual(self._unsent(), 1)
+        self.assertEqual(digests.dispatch(now=_at(2, 19))['sent'], 1)
+
+    def test_refused_address_is_recorded_not_retried(self):
+        refused = self._absent(self.students[0], _at(2, 10))
+        self._absent(self.students[2], _at(2, 10))
+        FlakyBackend.refused = ('p0@x.c',)
+        stats = digests.dispatch(now=_at(2, 19))
+        self.assertEqual((stats['sent'], stats['refused'], stats['reconnects']), (1, 1, 0))
+        self.assertEqual(Notification.objects.get(pk=refused).email_error, 'Refused: p0@x.c')
+        self.assertEqual(digests.pending().count(), 0)
+
+    def test_sent_notifications_are_stamped_in_batches(self):
+        for student in self.students[::2]:
+            self._absent(student, _at(2, 10))
+        stamped = []
+        FlakyBackend.on_send = lambda messages: stamped.append(
+            Notification.objects.filter(emailed_at__isnull=False).count())
+        with mock.patch.object(digests, 'MARK_EVERY', 2):
+            self.assertEqual(digests.dispatch(now=_at(2, 19))['sent'], 5)
+        self.assertEqual(stamped, [0, 0, 2, 2, 4])
+        self.assertEqual(self._unsent(), 0)
+
+    def test_crash_keeps_unsent_digests_queued(self):
+        for student in self.students[::2]:
+            self._absent(student, _at(2, 10))
+
+        def crash(messages):
+            if len(mail.outbox) == 3:
+                raise RuntimeError('worker killed')
+        FlakyBackend.on_send = crash
+        with mock.patch.object(digests, 'MARK_EVERY', 100), self.assertRaises(RuntimeError):
+            digests.dispatch(now=_at(2, 19))
+        self.assertEqual(self._unsent(), 2)
+        FlakyBackend.on_send = None
+        self.assertEqual(digests.dispatch(now=_at(2, 19))['sent'], 2)
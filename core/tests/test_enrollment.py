@@ -0,0 +1,59 @@
+"""
+Face enrollment reaching the roster: a student enrolled by another process
+(`manage.py process_enrollments` with FACE_ENROLL_BACKGROUND off, which has
+its own cache) shows up in the roster this process had already cached.
+"""
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.models import Department, Student
+from attendance.roster import get_roster
+
+from .test_query_budgets import _photo
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='smartattend-test-media-')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, FACE_EMBEDDER='standin', FACE_ENROLL_BACKGROUND=False,
+                   FACE_RECOGNIZER_ADDRESS='')
+class EnrollmentRosterTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.dept = Department.objects.create(name='Computer Science', code='CSE')
+        Student.objects.create(name='Enrolled', roll_number='R001', email='s@x.c', department=self.dept,
+                               section='A')
+
+    def _add_student(self):
+        student = Student(name='New', roll_number='R002', email='n@x.c', department=self.dept, section='A',
+                          face_enrolled=True)
+        student.photo.save('R002.png', _photo('R002'), save=False)
+        student.save()
+        return student
+
+    def test_enrollment_in_another_process_reaches_the_cached_roster(self):
+        student = self._add_student()
+        before = get_roster(self.dept.pk, 'A')
+        self.assertNotIn(student.pk, before['ids'])
+
+        with mock.patch('attendance.roster.cache', LocMemCache('process-enrollments', {})):
+            call_command('process_enrollments', stdout=mock.Mock())
+
+        student.refresh_from_db()
+        self.assertEqual(student.face_status, 'ready')
+        roster = get_roster(self.dept.pk, 'A')
+        self.assertIn(student.pk, roster['ids'])
+        self.assertTrue(next(s for s in roster['students'] if s['id'] == student.pk)['face_enrolled'])
+
+    def test_roster_is_cached_between_changes(self):
+        get_roster(self.dept.pk, 'A')
+        with self.assertNumQueries(1):
+            get_roster(self.dept.pk, 'A')
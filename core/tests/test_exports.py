@@ -0,0 +1,124 @@
+"""
+Attendance register exports: the XLSX built by hand in attendance/exports.py
+must open as a real workbook with the same cells as the CSV, and the
+semester register must only have columns for that semester's sessions.
+"""
+import csv
+import io
+import unittest
+import zipfile
+from datetime import date, time
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import Department, HOD, Faculty, Student, Course
+from attendance.models import AttendanceSession, AttendanceRecord
+
+NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+def _sheet_rows(data):
+    """Rows of the first worksheet, read through the package's own relationships."""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        types = ElementTree.fromstring(zf.read('[Content_Types].xml'))
+        parts = {o.get('PartName') for o in types}
+        root_rel = ElementTree.fromstring(zf.read('_rels/.rels'))[0].get('Target')
+        workbook = ElementTree.fromstring(zf.read(root_rel))
+        assert workbook.find('m:sheets/m:sheet', NS) is not None
+        sheet_target = ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))[0].get('Target')
+        sheet_name = f'xl/{sheet_target}'
+        assert f'/{root_rel}' in parts and f'/{sheet_name}' in parts
+        sheet = ElementTree.fromstring(zf.read(sheet_name))
+    rows = []
+    for row in sheet.findall('m:sheetData/m:row', NS):
+        cells = []
+        for c in row.findall('m:c', NS):
+            if c.get('t') == 'inlineStr':
+                cells.append(c.find('m:is/m:t', NS).text or '')
+            else:
+                value = c.find('m:v', NS).text
+                cells.append(float(value) if '.' in value else int(value))
+        rows.append(cells)
+    return rows
+
+
+def _csv_rows(data):
+    rows = list(csv.reader(io.StringIO(data.decode())))
+    return [rows[0]] + [r[:-3] + [int(r[-3]), int(r[-2]), float(r[-1]) if '.' in r[-1] else int(r[-1])]
+                        for r in rows[1:]]
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RegisterExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dept = Department.objects.create(name='Computer Science', code='CSE')
+        user = User.objects.create_user('hod', password='x')
+        HOD.objects.create(user=user, name='HOD', employee_id='H1', email='h@x.c', department=dept)
+        faculty = Faculty.objects.create(user=User.objects.create_user('fac', password='x'), name='F',
+                                         employee_id='F1', email='f@x.c', department=dept)
+        cls.third = Course.objects.create(name='Data Structures', code='CSE301', department=dept)
+        fifth = Course.objects.create(name='Compilers & <Parsers>', code='CSE501', department=dept)
+
+        students = {3: [], 5: []}
+        for i in range(4):
+            for semester, section in ((3, 'A'), (5, 'B')):
+                students[semester].append(Student.objects.create(
+                    name=f'Student "{semester}-{i}" & co', roll_number=f'S{semester}{i:02d}', email='s@x.c',
+                    department=dept, section=section, semester=semester))
+        statuses = ('present', 'absent', 'late', 'present')
+        for n in range(3):
+            for course, semester, section in ((cls.third, 3, 'A'), (fifth, 5, 'B')):
+                session = AttendanceSession.objects.create(
+                    course=course, faculty=faculty, date=date(2026, 9, 1 + n), start_time=time(9 + n),
+                    section=section, is_active=False)
+                AttendanceRecord.objects.bulk_create(
+                    [AttendanceRecord(session=session, student=s, status=statuses[(i + n) % 4])
+                     for i, s in enumerate(students[semester])])
+
+    def setUp(self):
+        self.client.login(username='hod', password='x')
+
+    def _export(self, fmt):
+        response = self.client.get(reverse('export_semester'), {'semester': 3, 'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_semester_columns_are_its_own_sessions(self):
+        header = _sheet_rows(self._export('xlsx'))[0]
+        sessions = header[2:-3]
+        self.assertEqual(len(sessions), 3)
+        self.assertTrue(all(column.startswith(self.third.code) for column in sessions))
+
+    def test_xlsx_matches_csv(self):
+        rows = _sheet_rows(self._export('xlsx'))
+        self.assertEqual(rows, _csv_rows(self._export('csv')))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][:2], ['S300', 'Student "3-0" & co'])
+
+    @unittest.skipIf(openpyxl is None, 'openpyxl is not installed')
+    def test_xlsx_opens_in_openpyxl(self):
+        sheet = openpyxl.load_workbook(io.BytesIO(self._export('xlsx')), read_only=True).worksheets[0]
+        rows = [[cell if cell is not None else '' for cell in row] for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(rows, _sheet_rows(self._export('xlsx')))
+
+    def test_course_of_another_department_is_not_found(self):
+        other = Course.objects.create(name='Thermodynamics', code='ME201',
+                                      department=Department.objects.create(name='Mechanical', code='ME'))
+        self.assertEqual(self.client.get(reverse('export_course', args=[other.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_course', args=[self.third.pk])).status_code, 200)
+
+    def test_malformed_date_redirects(self):
+        for url, params in ((reverse('export_course', args=[self.third.pk]), {'from': '2026-13-01'}),
+                            (reverse('export_semester'), {'semester': 3, 'to': 'yesterday'})):
+            response = self.client.get(url, params)
+            self.assertRedirects(response, reverse('all_sessions'), fetch_redirect_response=False)
@@ -0,0 +1,57 @@
+"""
+Keyset pagination must reach every row exactly once, in both directions,
+including rows whose ordering timestamps differ only below a millisecond.
+"""
+from datetime import timedelta
+from urllib.parse import parse_qsl
+
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from accounts.models import Department, Student
+from attendance.models import Notification
+from core.pagination import keyset_paginate
+
+ROWS = 120
+PER_PAGE = 7
+MAX_PAGES = ROWS  # a cursor that stops advancing fails the test instead of looping
+ORDERING = ['-sent_at', '-id']
+
+
+def _page(query=''):
+    request = RequestFactory().get('/notifications/', dict(parse_qsl(query)))
+    return keyset_paginate(request, Notification.objects.all(), ORDERING, per_page=PER_PAGE)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dept = Department.objects.create(name='Computer Science', code='CSE')
+        student = Student.objects.create(name='S', roll_number='R1', email='s@x.c', department=dept)
+        Notification.objects.bulk_create([Notification(student=student, message=f'Absent {i}') for i in range(ROWS)])
+        # ten rows per millisecond, in pairs with identical timestamps (ties broken by id)
+        base = timezone.now().replace(microsecond=0)
+        for i, pk in enumerate(Notification.objects.order_by('id').values_list('id', flat=True)):
+            Notification.objects.filter(pk=pk).update(sent_at=base + timedelta(microseconds=i // 2 * 100))
+        cls.expected = list(Notification.objects.order_by(*ORDERING).values_list('id', flat=True))
+
+    def test_next_links_reach_every_row_once(self):
+        page, ids = _page(), []
+        for _ in range(MAX_PAGES):
+            ids += [n.pk for n in page]
+            if not page.next_query:
+                break
+            page = _page(page.next_query)
+        self.assertEqual(ids, self.expected)
+
+    def test_previous_links_reach_every_row_once(self):
+        page = _page()
+        for _ in range(MAX_PAGES):
+            if not page.next_query:
+                break
+            page = _page(page.next_query)
+        pages = [[n.pk for n in page]]
+        while page.previous_query and len(pages) < MAX_PAGES:
+            page = _page(page.previous_query)
+            pages.insert(0, [n.pk for n in page])
+        self.assertEqual([pk for ids in pages for pk in ids], self.expected)
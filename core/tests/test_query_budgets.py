@@ -0,0 +1,270 @@
+"""
+Query-count and wall-time budgets for every URL in accounts/urls.py and
+attendance/urls.py, measured against a realistically sized department
+(500 students in 10 sections, 200 sessions). An N+1 pattern shows up as a
+budget overrun; the failure prints a per-view query report with the most
+repeated statements.
+"""
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import date, time as clock, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts import urls as account_urls
+from accounts.models import Department, HOD, Faculty, Student, Course
+from attendance import urls as attendance_urls
+from attendance.models import AttendanceSession, AttendanceRecord, Notification
+
+STUDENTS = 500
+SECTIONS = 10
+SESSIONS = 200
+MEDIA_ROOT = tempfile.mkdtemp(prefix='smartattend-test-media-')
+
+# url name -> (role, method, max queries, max seconds)
+BUDGETS = {
+    'dashboard': ('hod', 'get', 14, 2.0),
+    'login': (None, 'get', 5, 1.0),
+    'logout': ('faculty', 'get', 7, 1.0),
+    'faculty_list': ('hod', 'get', 11, 1.0),
+    'add_faculty': ('hod', 'get', 7, 1.0),
+    'edit_faculty': ('hod', 'get', 9, 1.0),
+    'student_list': ('hod', 'get', 8, 1.0),
+    'add_student': ('hod', 'get', 6, 1.0),
+    'edit_student': ('hod', 'get', 7, 1.0),
+    'student_detail': ('hod', 'get', 9, 1.0),
+    'manage_departments': ('hod', 'get', 11, 1.0),
+    'manage_courses': ('hod', 'get', 12, 1.0),
+    'all_sessions': ('faculty', 'get', 9, 1.0),
+    'create_session': ('faculty', 'get', 8, 1.0),
+    'mark_attendance': ('faculty', 'get', 13, 1.0),
+    'face_attendance': ('faculty', 'get', 12, 1.0),
+    'finalize_face_session': ('faculty', 'post', 24, 2.0),
+    'session_report': ('faculty', 'get', 11, 1.0),
+    'api_recognize_face': ('faculty', 'post', 12, 2.0),
+    'api_upload_recognize': ('faculty', 'post', 14, 2.0),
+    'api_batch_recognize': ('faculty', 'post', 14, 2.0),
+    'api_video_recognize': ('faculty', 'post', 14, 2.0),
+    'api_session_stats': ('faculty', 'get', 7, 1.0),
+    'absentees_report': ('hod', 'get', 9, 1.0),
+    'analytics': ('hod', 'get', 9, 1.0),
+    'export_session': ('faculty', 'get', 11, 1.0),
+    'export_course': ('faculty', 'get', 10, 2.0),
+    'export_semester': ('hod', 'get', 8, 2.0),
+    'notifications': ('student', 'get', 10, 1.0),
+}
+
+# Extra role/method variants of the same URL: (url name, role, method, max queries, max seconds)
+VARIANTS = [
+    ('dashboard', 'faculty', 'get', 11, 1.0),
+    ('dashboard', 'student', 'get', 12, 1.0),
+    ('mark_attendance', 'faculty', 'post', 31, 2.0),
+]
+
+_NUMBERS = re.compile(r"\b\d+\b|'[^']*'")
+
+
+def _shape(sql):
+    """SQL with literals stripped, so repeats of one statement group together."""
+    return _NUMBERS.sub('?', sql)
+
+
+def query_report(name, queries, limit=10):
+    lines = [f'{name}: {len(queries)} queries']
+    for sql, n in Counter(_shape(q['sql']) for q in queries).most_common(limit):
+        lines.append(f'  {n:>5} × {sql[:160]}')
+    return '\n'.join(lines)
+
+
+def _photo(seed):
+    import cv2
+    from attendance.standin import face_pattern
+    _, png = cv2.imencode('.png', face_pattern(seed))
+    return ContentFile(png.tobytes())
+
+
+def _frame(rolls):
+    import cv2
+    import numpy as np
+    from attendance.standin import face_pattern
+    canvas = np.zeros((256, 192 * len(rolls) + 64, 3), np.uint8)
+    for i, roll in enumerate(rolls):
+        canvas[64:192, 64 + i * 192:192 + i * 192] = face_pattern(roll)
+    return cv2.imencode('.jpg', canvas)[1].tobytes()
+
+
+def _video(frame, seconds=4, fps=10):
+    """MJPG .avi bytes showing the JPEG frame for `seconds`."""
+    import cv2
+    import numpy as np
+    image = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
+    with tempfile.NamedTemporaryFile(suffix='.avi', dir=MEDIA_ROOT, delete=False) as f:
+        path = f.name
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (image.shape[1], image.shape[0]))
+    for _ in range(seconds * fps):
+        writer.write(image)
+    writer.release()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, FACE_EMBEDDER='standin', FACE_SESSION_MIN_INTERVAL=0,
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        from attendance.bitmaps import rebuild_bitmaps
+        from attendance.embeddings import ensure_embeddings
+        from attendance.rollups import rebuild_rollups
+
+        dept = Department.objects.create(name='Computer Science', code='CSE')
+        Department.objects.create(name='Electronics', code='ECE')
+        courses = [Course.objects.create(name=f'Course {i}', code=f'CSE{300 + i}', department=dept)
+                   for i in range(4)]
+
+        cls.hod_user = User.objects.create_user('hod', password='x')
+        HOD.objects.create(user=cls.hod_user, name='HOD', employee_id='H1', email='h@x.c', department=dept)
+
+        faculty = []
+        for i in range(4):
+            user = User.objects.create_user(f'fac{i}', password='x')
+            f = Faculty.objects.create(user=user, name=f'Faculty {i}', employee_id=f'F{i}',
+                                       email=f'f{i}@x.c', department=dept)
+            f.courses.add(*courses)
+            faculty.append(f)
+        cls.faculty_user = faculty[0].user
+
+        students = []
+        for i in range(STUDENTS):
+            roll = f'R{i:05d}'
+            s = Student(name=f'Student {i}', roll_number=roll, email=f's{i}@x.c', parent_email=f'p{i}@x.c',
+                        department=dept, section=chr(ord('A') + i % SECTIONS), semester=3,
+                        face_enrolled=i % SECTIONS == 0)
+            if s.face_enrolled:
+                s.face_status = 'ready'
+                s.photo.save(f'{roll}.png', _photo(roll), save=False)
+            students.append(s)
+        Student.objects.bulk_create(students)
+        students = list(Student.objects.order_by('roll_number'))
+        cls.student_user = User.objects.create_user('student', password='x')
+        Student.objects.filter(pk=students[0].pk).update(user=cls.student_user)
+        cls.student = students[0]
+
+        by_section = {}
+        for s in students:
+            by_section.setdefault(s.section, []).append(s)
+
+        today = date.today()
+        statuses = ('present', 'present', 'present', 'absent', 'late')
+        records = []
+        for n in range(SESSIONS):
+            section = chr(ord('A') + n % SECTIONS)
+            session = AttendanceSession.objects.create(
+                course=courses[n % len(courses)], faculty=faculty[n % len(faculty)],
+                date=today - timedelta(days=n // 4), start_time=clock(9 + n % 4), section=section,
+                mode='face', is_active=False)
+            records += [AttendanceRecord(session=session, student=s, status=statuses[(n + j) % len(statuses)],
+                                         method='manual') for j, s in enumerate(by_section[section])]
+        AttendanceRecord.objects.bulk_create(records, batch_size=2000)
+        Notification.objects.bulk_create(
+            [Notification(student=cls.student, message=f'Absent {i}', notif_type='absence') for i in range(60)])
+
+        cls.session = AttendanceSession.objects.filter(faculty=faculty[0], section='A').order_by('-date').first()
+        cls.course = courses[0]
+        cls.faculty = faculty[0]
+        rebuild_rollups()
+        rebuild_bitmaps()
+        ensure_embeddings(Student.objects.filter(face_enrolled=True))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        if any(r['over'] for r in cls.results):
+            print('\n\nQuery budget report (over budget marked with !)')
+            for r in cls.results:
+                print(f"{'!' if r['over'] else ' '} {r['label']:<40} {r['queries']:>5}/{r['budget']:<5} "
+                      f"{r['seconds'] * 1000:>8.1f} ms / {r['max_seconds'] * 1000:.0f} ms")
+
+    def _users(self):
+        return {'hod': self.hod_user, 'faculty': self.faculty_user, 'student': self.student_user}
+
+    def _request(self, name, method):
+        """(url, data, kwargs for the client call) for a URL name."""
+        s = self.session
+        enrolled = list(Student.objects.filter(section=s.section, face_enrolled=True)
+                        .values_list('roll_number', flat=True)[:3])
+        frame = _frame(enrolled)
+        args = {
+            'edit_faculty': [self.faculty.pk], 'edit_student': [self.student.pk],
+            'student_detail': [self.student.pk], 'export_course': [self.course.pk],
+        }.get(name)
+        if args is None and name in ('mark_attendance', 'face_attendance', 'finalize_face_session',
+                                     'session_report', 'api_recognize_face', 'api_upload_recognize',
+                                     'api_batch_recognize', 'api_video_recognize', 'api_session_stats',
+                                     'export_session'):
+            args = [s.pk]
+        url = reverse(name, args=args)
+        if name == 'export_semester':
+            url += '?semester=3'
+        if method == 'get':
+            return url, None, {}
+        if name == 'api_recognize_face':
+            return url, frame, {'content_type': 'image/jpeg'}
+        if name == 'api_upload_recognize':
+            return url, {'photo': ContentFile(frame, name='class.jpg')}, {}
+        if name == 'api_batch_recognize':
+            return url, {'photos': [ContentFile(frame, name=f'{i}.jpg') for i in range(3)]}, {}
+        if name == 'api_video_recognize':
+            return url, {'video': ContentFile(_video(frame), name='lecture.avi')}, {}
+        if name == 'mark_attendance':
+            ids = Student.objects.filter(section=s.section).values_list('id', flat=True)
+            return url, {'present_students': [str(i) for i in ids[::2]]}, {}
+        return url, {}, {}
+
+    def _measure(self, name, role, method, budget, max_seconds):
+        if role:
+            self.client.force_login(self._users()[role])
+        url, data, extra = self._request(name, method)
+        cache.clear()  # budgets are for a cold roster/role cache
+        call = getattr(self.client, method)
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = call(url, data, **extra) if data is not None else call(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            seconds = time.perf_counter() - started
+        label = f'{name} [{role or "anonymous"} {method.upper()}]'
+        over = len(ctx.captured_queries) > budget or seconds > max_seconds
+        self.results.append({'label': label, 'queries': len(ctx.captured_queries), 'budget': budget,
+                             'seconds': seconds, 'max_seconds': max_seconds, 'over': over})
+        self.assertLess(response.status_code, 400, f'{label} returned {response.status_code}')
+        self.assertLessEqual(len(ctx.captured_queries), budget,
+                             f'{label} over query budget\n' + query_report(label, ctx.captured_queries))
+        self.assertLessEqual(seconds, max_seconds, f'{label} took {seconds:.2f}s (budget {max_seconds}s)\n'
+                             + query_report(label, ctx.captured_queries))
+
+    def test_every_url_has_a_budget(self):
+        names = {p.name for p in account_urls.urlpatterns + attendance_urls.urlpatterns}
+        self.assertEqual(names - set(BUDGETS), set(), 'URLs without a query budget')
+
+    def test_view_budgets(self):
+        for name, (role, method, budget, max_seconds) in BUDGETS.items():
+            with self.subTest(view=name, role=role, method=method):
+                self._measure(name, role, method, budget, max_seconds)
+
+    def test_variant_budgets(self):
+        for name, role, method, budget, max_seconds in VARIANTS:
+            with self.subTest(view=name, role=role, method=method):
+                self._measure(name, role, method, budget, max_seconds)
@@ -0,0 +1,88 @@
+"""
+Recognition server wire format (attendance/recognizer.py): 'SA' frames carry
+JSON meta and a raw payload intact in both directions, malformed or foreign
+frames are refused, and matches survive the (u32, f32) record packing.
+"""
+import socket
+import struct
+import threading
+
+from django.test import SimpleTestCase
+
+from attendance.recognizer import (HEADER, MAGIC, MATCH, MAX_PAYLOAD, OP_EMBED, OP_PING, OP_RECOGNIZE,
+                                   PROTOCOL_VERSION, ProtocolError, is_local, pack_matches, parse_address,
+                                   recv_frame, send_frame, unpack_matches)
+
+
+class FrameTests(SimpleTestCase):
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+        self.addCleanup(self.a.close)
+        self.addCleanup(self.b.close)
+
+    def test_frame_round_trip(self):
+        meta = {'items': [{'dept': 1, 'section': 'A', 'size': 5}], 'model': 'StandIn'}
+        send_frame(self.a, OP_RECOGNIZE, 7, meta, b'\xff\xd8abc')
+        send_frame(self.a, OP_PING, 8, {})
+        self.assertEqual(recv_frame(self.b), (OP_RECOGNIZE, 7, meta, b'\xff\xd8abc'))
+        self.assertEqual(recv_frame(self.b), (OP_PING, 8, {}, b''))
+
+    def test_header_layout(self):
+        send_frame(self.a, OP_EMBED, 2 ** 32 - 1, {'n': 1}, b'xy')
+        head = self.b.recv(HEADER.size)
+        self.assertEqual(HEADER.unpack(head), (MAGIC, PROTOCOL_VERSION, OP_EMBED, 2 ** 32 - 1, 7, 2))
+        self.assertEqual(self.b.recv(9), b'{"n":1}xy')
+
+    def test_payload_larger_than_a_socket_buffer(self):
+        payload = bytes(range(256)) * 4096
+        thread = threading.Thread(target=send_frame, args=(self.a, OP_EMBED, 1, {}, payload))
+        thread.start()
+        self.assertEqual(recv_frame(self.b)[3], payload)
+        thread.join()
+
+    def test_peer_closed_between_frames(self):
+        self.a.close()
+        self.assertIsNone(recv_frame(self.b))
+
+    def test_peer_closed_mid_frame(self):
+        send_frame(self.a, OP_EMBED, 1, {'n': 1}, b'payload')
+        self.b.recv(HEADER.size - 3)
+        self.a.close()
+        with self.assertRaises(ConnectionError):
+            recv_frame(self.b)
+
+    def test_foreign_frames_are_refused(self):
+        for head in (HEADER.pack(b'GE', PROTOCOL_VERSION, OP_PING, 1, 0, 0),
+                     HEADER.pack(MAGIC, PROTOCOL_VERSION + 1, OP_PING, 1, 0, 0),
+                     HEADER.pack(MAGIC, PROTOCOL_VERSION, OP_EMBED, 1, 0, MAX_PAYLOAD + 1)):
+            self.a.sendall(head)
+            with self.assertRaises(ProtocolError):
+                recv_frame(self.b)
+
+
+class MatchRecordTests(SimpleTestCase):
+    def test_matches_round_trip_after_a_prefix(self):
+        recognized = {1: 91.25, 4_000_000_000: 78.04}
+        data = b'prefix' + pack_matches(recognized)
+        self.assertEqual(len(data), 6 + 2 * MATCH.size)
+        self.assertEqual(unpack_matches(data, 6, 2), {1: 91.2, 4_000_000_000: 78.0})
+        self.assertEqual(unpack_matches(data, 6 + MATCH.size, 1), {4_000_000_000: 78.0})
+        self.assertEqual(pack_matches({}), b'')
+
+    def test_student_id_must_fit_u32(self):
+        with self.assertRaises(struct.error):
+            pack_matches({2 ** 32: 90.0})
+
+
+class AddressTests(SimpleTestCase):
+    def test_parse_address(self):
+        self.assertEqual(parse_address('unix:/run/sa.sock'), (socket.AF_UNIX, '/run/sa.sock'))
+        self.assertEqual(parse_address('127.0.0.1:8765'), (socket.AF_INET, ('127.0.0.1', 8765)))
+        for bad in ('localhost', ':8765', 'host:port'):
+            with self.assertRaises(ValueError):
+                parse_address(bad)
+
+    def test_is_local(self):
+        self.assertTrue(is_local('unix:/run/sa.sock'))
+        self.assertTrue(is_local('127.0.0.1:8765'))
+        self.assertFalse(is_local('10.0.0.5:8765'))
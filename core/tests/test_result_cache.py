@@ -0,0 +1,81 @@
+"""
+Recognition result cache (attendance/result_cache.py): a repeated image is
+not embedded again, entries are evicted least-recently-used by count and by
+bytes, and matches are kept per roster version, so a roster change re-runs
+only the matching.
+"""
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from attendance import face_utils
+from attendance.result_cache import RecognitionCache, _Entry
+
+
+def _unit(*values):
+    v = np.zeros(8, np.float32)
+    v[:len(values)] = values
+    return v / np.linalg.norm(v)
+
+
+def _roster(ids, vectors):
+    return {'ids': ids, 'matrix': np.vstack(vectors).astype(np.float32)}
+
+
+@override_settings(FACE_EMBEDDER='standin', FACE_RECOGNITION_DISTANCE='cosine',
+                   FACE_RESULT_CACHE_ENTRIES=2, FACE_RESULT_CACHE_MAX_BYTES=16 * 1024 * 1024)
+class RecognitionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = RecognitionCache()
+        self.computed = []
+
+    def _compute(self, data, tiled):
+        self.computed.append(data)
+        return [{'x': 0, 'y': 0, 'w': 10, 'h': 10}], [_unit(1)], 0
+
+    def _embed(self, data):
+        return self.cache.embeddings(data, compute=self._compute)[2]
+
+    def test_repeat_image_is_not_embedded_again(self):
+        self.assertFalse(self._embed(b'a'))
+        self.assertTrue(self._embed(b'a'))
+        self.assertEqual(self.computed, [b'a'])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self._embed(b'a')
+        self._embed(b'b')
+        self._embed(b'a')
+        self._embed(b'c')
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        self.assertTrue(self._embed(b'a'))
+        self.assertFalse(self._embed(b'b'))
+
+    def test_byte_limit_evicts_and_skips_oversized_entries(self):
+        size = _Entry(*self._compute(b'', None)).size
+        with override_settings(FACE_RESULT_CACHE_ENTRIES=100, FACE_RESULT_CACHE_MAX_BYTES=2 * size + size // 2):
+            for data in (b'a', b'b', b'c'):
+                self._embed(data)
+            stats = self.cache.stats()
+            self.assertEqual((stats['entries'], stats['bytes']), (2, 2 * size))
+            self.assertFalse(self._embed(b'a'))
+
+        with override_settings(FACE_RESULT_CACHE_MAX_BYTES=size - 1):
+            self.cache.clear()
+            self._embed(b'a')
+            self.assertEqual(self.cache.stats()['entries'], 0)
+
+    def test_matches_are_kept_per_roster_version(self):
+        first = _roster([1, 2], [_unit(1), _unit(0, 1)])
+        changed = _roster([2, 3], [_unit(0, 1), _unit(1)])
+        with mock.patch.object(face_utils, 'match_face_vectors', wraps=face_utils.match_face_vectors) as match:
+            recognized, cached, _ = self.cache.recognize(b'a', first, 0.4, compute=self._compute)
+            self.assertEqual((list(recognized), cached), ([1], False))
+            self.assertEqual(self.cache.recognize(b'a', first, 0.4, compute=self._compute)[:2], (recognized, True))
+            self.assertEqual(match.call_count, 1)
+
+            recognized, cached, _ = self.cache.recognize(b'a', changed, 0.4, compute=self._compute)
+            self.assertEqual((list(recognized), cached), ([3], True))
+            self.assertEqual(match.call_count, 2)
+        self.assertEqual(self.computed, [b'a'])
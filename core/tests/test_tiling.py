@@ -0,0 +1,70 @@
+"""
+Tiled detection (attendance/tiling.py): NMS drops the part of a face cut
+off at a tile edge without letting a large box swallow real faces, and the
+whole-image stand-in DeepFace returns for an empty image or tile never
+becomes a face.
+"""
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from attendance.face_utils import detect_face_areas
+from attendance.tiling import nms, detect_tiled
+
+
+class _Prepared:
+    """Just the parts of a PreparedImage detection reads; no downsizing."""
+    def __init__(self, img):
+        self.image = img
+        self.height, self.width = img.shape[:2]
+
+    def decode_at_most(self, max_edge):
+        return self.image
+
+
+def _detect(tile):
+    """One face: the bounding box of the tile's lit pixels, or DeepFace's empty-result stand-in."""
+    ys, xs = np.nonzero(tile[..., 0])
+    if not len(xs):
+        return [{'facial_area': {'x': 0, 'y': 0, 'w': tile.shape[1], 'h': tile.shape[0]}, 'confidence': 0}]
+    return [{'facial_area': {'x': int(xs.min()), 'y': int(ys.min()),
+                             'w': int(xs.max() - xs.min() + 1), 'h': int(ys.max() - ys.min() + 1)},
+             'confidence': 0.9}]
+
+
+class NmsTests(SimpleTestCase):
+    def test_part_inside_a_similar_box_is_dropped(self):
+        boxes = [(0, 0, 100, 100), (0, 0, 60, 100)]
+        self.assertEqual(nms(boxes, [0.5, 0.9]), [0])
+
+    def test_small_face_inside_a_much_larger_box_is_kept(self):
+        boxes = [(0, 0, 400, 400), (10, 10, 60, 60)]
+        self.assertEqual(sorted(nms(boxes, [0.9, 0.9])), [0, 1])
+
+    def test_cut_part_is_dropped_whatever_its_size(self):
+        boxes = [(0, 0, 400, 400), (10, 10, 60, 60)]
+        self.assertEqual(nms(boxes, [0.9, 0.9], cut=[False, True]), [0])
+
+    def test_overlapping_boxes_keep_the_higher_score(self):
+        boxes = [(0, 0, 100, 100), (10, 0, 110, 100), (300, 0, 400, 100)]
+        self.assertEqual(nms(boxes, [0.6, 0.8, 0.7]), [1, 2])
+
+    def test_no_boxes(self):
+        self.assertEqual(nms([], []), [])
+
+
+@override_settings(FACE_TILE_SIZE=1024, FACE_TILE_OVERLAP=0.25, FACE_TILE_MAX_EDGE=4096, FACE_TILE_WORKERS=2)
+class DetectTiledTests(SimpleTestCase):
+    def test_face_across_a_tile_edge_is_found_once(self):
+        img = np.zeros((1000, 2000, 3), np.uint8)
+        img[400:500, 1000:1100] = 255   # cut by the first tile's right edge at x=1024
+        self.assertEqual(detect_tiled(_Prepared(img), _detect), [{'x': 1000, 'y': 400, 'w': 100, 'h': 100}])
+
+    def test_empty_tiles_find_nothing(self):
+        self.assertEqual(detect_tiled(_Prepared(np.zeros((1000, 2000, 3), np.uint8)), _detect), [])
+
+    def test_single_pass_drops_the_whole_frame_stand_in(self):
+        prepared = _Prepared(np.zeros((480, 640, 3), np.uint8))
+        with mock.patch('attendance.face_utils.detect_faces', _detect):
+            self.assertEqual(detect_face_areas(prepared, tiled=False), [])
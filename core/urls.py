@@ -1,10 +1,18 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from accounts.views import serve_thumbnail
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('accounts.urls')),
     path('', include('attendance.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+if settings.DEBUG:
+    # ahead of static() so thumbnails get their long-lived Cache-Control
+    urlpatterns.append(re_path(rf"^{settings.MEDIA_URL.lstrip('/')}thumbs/(?P<path>.*)$", serve_thumbnail))
+
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)